@@ -48,6 +48,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "usermanager.db_routers.PrimaryPinMiddleware",
 ]
 
 AUTH_USER_MODEL = 'usermanager.User'
@@ -80,12 +81,69 @@ TEMPLATES = [
 WSGI_APPLICATION = "mpi.wsgi.application"
 
 # Database configuration
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Database profile: DB_ENGINE=sqlite (default) or DB_ENGINE=postgresql
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.getenv('DB_POOL', 'False') == 'True'  # psycopg pool; needs psycopg[pool]
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv('DB_NAME', 'mpi'),
+            "USER": os.getenv('DB_USER', 'mpi'),
+            "PASSWORD": os.getenv('DB_PASSWORD', ''),
+            "HOST": os.getenv('DB_HOST', 'localhost'),
+            "PORT": os.getenv('DB_PORT', '5432'),
+            # Persistent connections; a pool owns connection lifetime itself
+            "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            "CONN_HEALTH_CHECKS": True,
+            # Server-side cursors let .iterator() stream large sync reads; they must be
+            # disabled behind a transaction-pooling PgBouncer.
+            "DISABLE_SERVER_SIDE_CURSORS": os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+            "OPTIONS": {"pool": True} if DB_POOL else {},
+        }
     }
-}
+else:
+    SQLITE_WAL = os.getenv('SQLITE_WAL', 'True') == 'True'
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv('SQLITE_PATH', BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # WAL lets dashboards read while a sync batch writes; NORMAL is durable
+                # across crashes in WAL mode and skips an fsync per commit.
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))};"
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 134217728))};"
+                ) if SQLITE_WAL else "PRAGMA journal_mode=DELETE;",
+                # Take the write lock at BEGIN so writers queue on busy_timeout instead of
+                # failing with "database is locked" when upgrading a read transaction.
+                "transaction_mode": "IMMEDIATE" if SQLITE_WAL else None,
+            },
+        }
+    }
+
+# Optional read replica for dashboard/list/reporting reads (see usermanager/db_routers.py).
+# Under test it mirrors default, so the routing is exercised against a single database.
+if os.getenv('DB_REPLICA_HOST') and DB_ENGINE == 'postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        "HOST": os.getenv('DB_REPLICA_HOST'),
+        "PORT": os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        "TEST": {"MIRROR": "default"},
+    }
+elif os.getenv('SQLITE_REPLICA_PATH') and DB_ENGINE != 'postgresql':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        "NAME": os.getenv('SQLITE_REPLICA_PATH'),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ['usermanager.db_routers.ReplicaRouter']
+# After a request writes, that browser reads from the primary for this many seconds
+# (should exceed the replica's usual lag; 0 disables pinning)
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -114,6 +172,26 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ other settings
 
+# Cache (Redis): push deduplication, router indexes, dashboard snapshots, plan catalogue
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    }
+}
+
+# Upper bound on how stale a cached dashboard can get when a change bypasses the sync/payment refresh
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 600))
+
+# Lifetime of one cached plan catalogue version; profile changes start a new version anyway
+PLAN_CATALOGUE_TIMEOUT = int(os.getenv('PLAN_CATALOGUE_TIMEOUT', 86400))
+
+# Payments listed by the JSON API (api/payments/)
+API_RECENT_PAYMENTS = int(os.getenv('API_RECENT_PAYMENTS', 10))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -152,6 +230,16 @@ PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY')
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY')
 # PAYSTACK_CALLBACK_URL = 'https://yourdomain.com/payment/verify/'
 PAYSTACK_CALLBACK_URL = 'http://127.0.0.1/payment/verify/'
+# Point at a stand-in gateway for testing; payment requests fail fast instead of holding a worker
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_CONNECT_TIMEOUT = float(os.getenv('PAYSTACK_CONNECT_TIMEOUT', 3))
+PAYSTACK_READ_TIMEOUT = float(os.getenv('PAYSTACK_READ_TIMEOUT', 10))
+PAYSTACK_POOL_SIZE = int(os.getenv('PAYSTACK_POOL_SIZE', 10))
+# Hourly reconciliation against the gateway's transaction listing: window, page size and
+# pause between pages (seconds)
+PAYSTACK_RECONCILE_DAYS = int(os.getenv('PAYSTACK_RECONCILE_DAYS', 3))
+PAYSTACK_RECONCILE_PAGE_SIZE = int(os.getenv('PAYSTACK_RECONCILE_PAGE_SIZE', 100))
+PAYSTACK_RECONCILE_PAUSE = float(os.getenv('PAYSTACK_RECONCILE_PAUSE', 0.5))
 
 
 from celery.schedules import crontab
@@ -170,7 +258,70 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'usermanager.tasks.sync_mikrotik_data',
         'schedule': timedelta(seconds=30),  # Run every 30 seconds
     },
+    'replay_mikrotik_backlog_every_minute': {
+        'task': 'usermanager.tasks.replay_mikrotik_backlog',
+        'schedule': timedelta(minutes=1),  # health probe + replay of parked pushes
+    },
+    'archive_old_sessions_nightly': {
+        'task': 'usermanager.tasks.archive_old_sessions',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'downsample_traffic_history_hourly': {
+        'task': 'usermanager.tasks.downsample_traffic_history',
+        'schedule': crontab(minute=10),
+    },
+    'recompute_user_stats_nightly': {
+        'task': 'usermanager.tasks.recompute_all_user_stats',
+        'schedule': crontab(hour=3, minute=30),  # after the session archival
+    },
+    'prune_usermanager_nightly': {
+        'task': 'usermanager.tasks.prune_usermanager_data',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'close_report_periods_nightly': {
+        'task': 'usermanager.tasks.close_report_periods',
+        'schedule': crontab(hour=4, minute=30),
+    },
+    'reconcile_paystack_payments_hourly': {
+        'task': 'usermanager.tasks.reconcile_paystack_payments',
+        'schedule': crontab(minute=20),
+    },
+}
+
+# Pushes parked while the router was unreachable are dropped after this many failed replays
+MIKROTIK_BACKLOG_MAX_ATTEMPTS = int(os.getenv('MIKROTIK_BACKLOG_MAX_ATTEMPTS', 5))
+# Redeliveries of a push (same object and version) within this many seconds are skipped
+MIKROTIK_PUSH_DEDUP_WINDOW = int(os.getenv('MIKROTIK_PUSH_DEDUP_WINDOW', 3600))
+# Closed sessions older than this are rolled up into daily usage and deleted
+SESSION_RETENTION_DAYS = int(os.getenv('SESSION_RETENTION_DAYS', 90))
+# The sessions page sums daily usage over this many days unless its filter gives a range
+SESSION_USAGE_DAYS = int(os.getenv('SESSION_USAGE_DAYS', 30))
+# Per-session traffic samples are kept raw this long, then at 5-minute resolution this
+# long, then hourly
+TRAFFIC_RAW_RETENTION_HOURS = int(os.getenv('TRAFFIC_RAW_RETENTION_HOURS', 24))
+TRAFFIC_5M_RETENTION_DAYS = int(os.getenv('TRAFFIC_5M_RETENTION_DAYS', 7))
+
+# Retention for manage.py prune_usermanager / the nightly prune task, in days
+# (an empty env value disables pruning of that target). Old sessions are archived under
+# SESSION_RETENTION_DAYS instead.
+PRUNE_RETENTION_DAYS = {
+    name: int(os.getenv(env, default)) if os.getenv(env, default) != '' else None
+    for name, env, default in (
+        ('traffic', 'TRAFFIC_RETENTION_DAYS', 365),
+        ('daily_usage', 'DAILY_USAGE_RETENTION_DAYS', 730),
+        ('payments', 'UNPAID_PAYMENT_RETENTION_DAYS', 180),  # pending/failed payments only
+    )
 }
+PRUNE_CHUNK_SIZE = int(os.getenv('PRUNE_CHUNK_SIZE', 500))  # rows per delete transaction
+PRUNE_CHUNK_SLEEP = float(os.getenv('PRUNE_CHUNK_SLEEP', 0.05))  # seconds between chunks
+
+# Reporting: days older than this are materialised into rollups and never recomputed (leave room
+# for reconciliation to settle late payments); cached report results live this many seconds
+REPORT_CLOSE_AFTER_DAYS = int(os.getenv('REPORT_CLOSE_AFTER_DAYS', PAYSTACK_RECONCILE_DAYS))
+REPORT_CACHE_TIMEOUT = int(os.getenv('REPORT_CACHE_TIMEOUT', 300))
+
+# Rows fetched per round trip by the streaming CSV/JSONL exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
 
 # running tasks in celery at the same time
 # CELERY_BEAT_SCHEDULE = {
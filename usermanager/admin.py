@@ -11,15 +11,24 @@ from django.urls import path
 from django.shortcuts import redirect
 from django.utils.timezone import now
 
-from .models import User, UserProfile, Profile, Payment, Session
-from .mikrotik_userman import init_mikrotik_manager
+from .models import User, UserProfile, Profile, Payment, Session, PendingPush, DailyUsage, UserStats
+from .mikrotik_userman import get_mikrotik_manager
+from .routeros import parse_datetime
+from .catalogue import plan_catalogue
 
 logger = logging.getLogger(__name__)
 
-# Initialize the MikroTikUserManager instance using the factory function
-mikrotik_manager = init_mikrotik_manager()
+class PlanCatalogueMixin:
+    """Plan dropdowns list the cached plan catalogue instead of querying every form."""
 
-class UserProfileInline(admin.TabularInline):
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.remote_field.model is Profile and field is not None:
+            field.choices = [('', field.empty_label)] + [(plan.pk, str(plan)) for plan in plan_catalogue()]
+        return field
+
+
+class UserProfileInline(PlanCatalogueMixin, admin.TabularInline):
     model = UserProfile
     extra   = 1
     can_delete = False
@@ -114,6 +123,7 @@ class UserAdmin(BaseUserAdmin):
         """
         This action deletes selected users from MikroTik but not from Django.
         """
+        mikrotik_manager = get_mikrotik_manager()
         for obj in queryset:
             try:
                 users = mikrotik_manager.get_users()
@@ -133,6 +143,7 @@ class UserAdmin(BaseUserAdmin):
         """
         This action syncs selected users with MikroTik.
         """
+        mikrotik_manager = get_mikrotik_manager()
         for obj in queryset:
             try:
                 profile_name = obj.group or 'default'
@@ -169,7 +180,7 @@ class UserAdmin(BaseUserAdmin):
         This action syncs users from MikroTik to Django.
         """
         try:
-            users = mikrotik_manager.get_users()
+            users = get_mikrotik_manager().get_users()
             for user_data in users:
                 username = user_data.get('name')
                 defaults = {
@@ -205,7 +216,7 @@ class ProfileAdmin(admin.ModelAdmin):
         This action syncs profiles from MikroTik to Django.
         """
         try:
-            mikrotik_manager = init_mikrotik_manager()
+            mikrotik_manager = get_mikrotik_manager()
             profiles = mikrotik_manager.get_profiles()
             for profile_data in profiles:
                 Profile.objects.update_or_create(
@@ -227,7 +238,7 @@ class ProfileAdmin(admin.ModelAdmin):
         This action syncs profiles from Django to MikroTik.
         """
         try:
-            mikrotik_manager = init_mikrotik_manager()
+            mikrotik_manager = get_mikrotik_manager()
             for profile in queryset:
                 mikrotik_manager.create_profile(
                     name=profile.name,
@@ -246,8 +257,10 @@ class ProfileAdmin(admin.ModelAdmin):
 
 
 # ------------------------------------------------ user profile
-class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('mikrotik_id', 'user', 'profile', 'state', 'end_time')
+class UserProfileAdmin(PlanCatalogueMixin, admin.ModelAdmin):
+    list_display = ('mikrotik_id', 'user', 'profile', 'state', 'lifecycle', 'end_time')
+    list_select_related = ('user', 'profile')
+    list_filter = ('lifecycle',)
     actions = ['sync_user_profiles_from_mikrotik', 'sync_user_profiles_to_mikrotik']
     readonly_fields = ['end_time', 'state']
 
@@ -256,7 +269,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         This action syncs user profiles from MikroTik to Django.
         """
         try:
-            mikrotik_manager = init_mikrotik_manager()
+            mikrotik_manager = get_mikrotik_manager()
             user_profiles = mikrotik_manager.get_user_profiles()
             for user_profile_data in user_profiles:
                 try:
@@ -267,7 +280,7 @@ class UserProfileAdmin(admin.ModelAdmin):
                         profile=profile,
                         defaults={
                             'state': user_profile_data['state'],
-                            'end_time': user_profile_data.get('end-time', 'unlimited')
+                            'end_time': parse_datetime(user_profile_data.get('end-time'))
                         }
                     )
                 except User.DoesNotExist:
@@ -283,7 +296,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         This action syncs user profiles from Django to MikroTik.
         """
         try:
-            mikrotik_manager = init_mikrotik_manager()
+            mikrotik_manager = get_mikrotik_manager()
             for user_profile in queryset:
                 mikrotik_manager.create_user_profile(
                     user=user_profile.user.username,
@@ -298,8 +311,9 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 
 # ------------------------------------------------ payment
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(PlanCatalogueMixin, admin.ModelAdmin):
     list_display = ('user_profile', 'method', 'price', 'trans_start', 'trans_end', 'trans_status')
+    list_select_related = ('user_profile__user', 'user_profile__profile')  # UserProfile.__str__
     search_fields = ('user_profile__user__username', 'method', 'price')
     list_filter = ('method', 'trans_status')
 
@@ -310,7 +324,7 @@ class PaymentAdmin(admin.ModelAdmin):
         Sync selected payments from Django to MikroTik.
         """
         try:
-            mikrotik_manager = init_mikrotik_manager()
+            mikrotik_manager = get_mikrotik_manager()
             for payment in queryset:
                 # Create or update payment in MikroTik
                 mikrotik_manager.create_payment(
@@ -335,9 +349,10 @@ class PaymentAdmin(admin.ModelAdmin):
 
 # ------------------------------------------------ session
 class SessionAdmin(admin.ModelAdmin):
-    list_display = ('mikrotik_id', 'session_id', 'user', 'nas_ip_address', 'started', 'ended', 'terminate_cause')
+    list_display = ('mikrotik_id', 'session_id', 'user', 'nas_ip_address', 'is_open', 'started', 'ended', 'terminate_cause')
+    list_select_related = ('user',)
     search_fields = ('session_id', 'user__username', 'nas_ip_address')
-    list_filter = ('nas_ip_address', 'nas_port_type', 'status', 'terminate_cause')
+    list_filter = ('is_open', 'nas_ip_address', 'nas_port_type', 'status', 'terminate_cause')
     readonly_fields = [
         'mikrotik_id',
         'session_id',
@@ -353,13 +368,42 @@ class SessionAdmin(admin.ModelAdmin):
         'started',
         'ended',
         'terminate_cause',
+        'is_open',
         'user_address',
         'last_accounting_packet'
     ]
 
+# ------------------------------------------------ offline backlog
+class PendingPushAdmin(admin.ModelAdmin):
+    list_display = ('router', 'model', 'object_id', 'action', 'attempts', 'created', 'modified')
+    list_filter = ('router', 'model', 'action')
+    readonly_fields = ['router', 'model', 'object_id', 'action', 'attempts', 'last_error', 'created', 'modified']
+
+
+# ------------------------------------------------ archived usage
+class DailyUsageAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'nas_ip_address', 'download', 'upload', 'sessions', 'uptime')
+    list_select_related = ('user',)
+    list_filter = ('nas_ip_address',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+    readonly_fields = ['user', 'date', 'nas_ip_address', 'download', 'upload', 'sessions', 'uptime']
+
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'cycle_bytes', 'lifetime_bytes', 'active_sessions', 'total_paid', 'last_payment_at', 'recomputed')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    readonly_fields = [
+        'user', 'cycle_start', 'cycle_bytes', 'lifetime_bytes', 'active_sessions',
+        'last_payment_at', 'last_payment_amount', 'total_paid', 'recomputed', 'modified',
+    ]
+
 # Register your models here.
 admin.site.register(User, UserAdmin)
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(Payment, PaymentAdmin)
 admin.site.register(Session, SessionAdmin)
+admin.site.register(PendingPush, PendingPushAdmin)
+admin.site.register(DailyUsage, DailyUsageAdmin)
+admin.site.register(UserStats, UserStatsAdmin)
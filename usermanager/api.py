@@ -0,0 +1,100 @@
+# mpi_src/usermanager/api.py
+"""
+Read-only JSON resources for the captive-portal app and dashboards.
+
+Rows are read with ``values()`` straight into dicts, so no model instances are built,
+and each query is served by an existing index. Every resource has a version in the
+cache (per user, or the catalogue version for ``plans``) that moves on when its rows
+change. The ETag of a poll is computed from that version alone, so an unchanged poll is
+answered 304 without querying the resource's tables. The session sync, the user
+profile sync, reconciliation and the model signals call ``touch_resources``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from usermanager.catalogue import catalogue_version
+from usermanager.models import Payment, Profile, Session, UserProfile
+
+
+def _version_key(resource, user_id):
+    return f'usermanager-api:{resource}:{user_id}:version'
+
+
+def resource_version(resource, user_id):
+    """The version of a user's ``resource``; starts one if the cache has none."""
+    if resource == 'plans':
+        return catalogue_version()
+    key = _version_key(resource, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def resource_etag(resource, user_id):
+    return f'"{resource}-{resource_version(resource, user_id)}"'
+
+
+def touch_resources(user_id, *resources):
+    """Move the user's ``resources`` to a new version once the current transaction commits."""
+    def bump():
+        for resource in resources:
+            key = _version_key(resource, user_id)
+            cache.set(key, max(int(time.time() * 1000), (cache.get(key) or 0) + 1), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def plans(user_id=None):
+    """The plan catalogue, cheapest first; cached under the catalogue version."""
+    key = f'usermanager-api:plans:{catalogue_version()}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            Profile.objects.order_by('price', 'name')
+            .values('id', 'name', 'name_for_users', 'price', 'validity')
+        )
+        cache.set(key, rows, timeout=getattr(settings, 'PLAN_CATALOGUE_TIMEOUT', 86400))
+    return rows
+
+
+def current_plan(user_id):
+    """The user's running plans, latest expiry first."""
+    return list(
+        UserProfile.objects.filter(user_id=user_id, state='running-active')
+        .order_by('-end_time')
+        .values('id', 'state', 'end_time', plan=F('profile__name'), plan_name_for_users=F('profile__name_for_users'))
+    )
+
+
+def active_sessions(user_id):
+    """Open sessions with their live counters."""
+    return list(
+        Session.objects.filter(user_id=user_id, is_open=True)
+        .order_by('-session_id')
+        .values('session_id', 'nas_ip_address', 'user_address', 'download', 'upload', 'uptime',
+                'started', 'last_accounting_packet')
+    )
+
+
+def recent_payments(user_id):
+    """The user's latest payments, newest first."""
+    return list(
+        Payment.objects.filter(user_id=user_id)
+        .order_by('-trans_start', '-id')
+        .values('id', 'method', 'trans_status', 'trans_start', 'trans_end', 'price', 'currency',
+                plan=F('profile__name'))[:getattr(settings, 'API_RECENT_PAYMENTS', 10)]
+    )
+
+
+RESOURCES = {
+    'plans': plans,
+    'plan': current_plan,
+    'sessions': active_sessions,
+    'payments': recent_payments,
+}
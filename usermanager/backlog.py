@@ -0,0 +1,119 @@
+# mpi_src/usermanager/backlog.py
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from usermanager.locking import RowBusy
+from usermanager.mikrotik_userman import MikroTikUnavailable
+from usermanager.models import PendingPush
+
+logger = logging.getLogger(__name__)
+
+# Objects must exist on the router before anything referencing them is pushed.
+MODEL_ORDER = {'user': 0, 'profile': 1, 'user_profile': 2}
+
+
+def _merge_actions(previous, new):
+    """
+    Compact two queued actions on the same object into the one that still has to be sent.
+    Returns None when the pair cancels out (created and deleted while the router was down).
+    """
+    if previous == 'create' and new == 'delete':
+        return None
+    if previous == 'create':
+        return 'create'  # the create will carry the latest state anyway
+    return new
+
+
+def park_push(router, model, object_id, action, error=None, mikrotik_id=None):
+    """
+    Store (or compact into) the pending push for an object on an unreachable router.
+    Deletes pass the ``mikrotik_id`` of the row they delete.
+    """
+    with transaction.atomic():
+        pending = (
+            PendingPush.objects.select_for_update()
+            .filter(router=router, model=model, object_id=object_id)
+            .first()
+        )
+        if pending is None:
+            PendingPush.objects.create(
+                router=router, model=model, object_id=object_id, action=action, mikrotik_id=mikrotik_id,
+                last_error=str(error) if error else None,
+            )
+            logger.warning(f"Router {router} unreachable, parked {action} of {model} {object_id}.")
+            return
+
+        merged = _merge_actions(pending.action, action)
+        if merged is None:
+            pending.delete()
+            logger.info(f"Dropped parked {model} {object_id}: created and deleted while {router} was down.")
+            return
+
+        pending.action = merged
+        if mikrotik_id:
+            pending.mikrotik_id = mikrotik_id
+        if error:
+            pending.last_error = str(error)
+        pending.save(update_fields=['action', 'mikrotik_id', 'last_error', 'modified'])
+
+
+def has_pending(router, model, object_id):
+    """True when an older push for this object is still waiting in the backlog."""
+    return PendingPush.objects.filter(router=router, model=model, object_id=object_id).exists()
+
+
+def replay_backlog(mikrotik_manager, handlers):
+    """
+    Replay every parked push for the manager's router once it answers its health probe.
+
+    ``handlers`` maps ``(model, action)`` to a callable taking the object id (deletes also
+    take the ``mikrotik_id`` they were parked with); they are the
+    plain push functions behind the Celery tasks, so a replayed push behaves exactly like a
+    live one but without per-item task round trips or retry back-off. Stops at the first
+    outage so a flapping router does not turn the replay into a retry storm.
+    """
+    router = mikrotik_manager.router_ip
+    if not PendingPush.objects.filter(router=router).exists():
+        return 0
+
+    if not mikrotik_manager.ping():
+        logger.info(f"Router {router} still unreachable; backlog kept.")
+        return 0
+
+    max_attempts = getattr(settings, 'MIKROTIK_BACKLOG_MAX_ATTEMPTS', 5)
+    entries = sorted(
+        PendingPush.objects.filter(router=router),
+        key=lambda p: (p.action == 'delete', MODEL_ORDER[p.model] * (-1 if p.action == 'delete' else 1), p.created),
+    )
+
+    delivered, failed = [], []
+    for entry in entries:
+        try:
+            if entry.action == 'delete':
+                handlers[(entry.model, entry.action)](entry.object_id, mikrotik_id=entry.mikrotik_id)
+            else:
+                handlers[(entry.model, entry.action)](entry.object_id)
+        except RowBusy:
+            continue  # claimed by a sync right now; stays parked for the next replay
+        except MikroTikUnavailable:
+            logger.warning(f"Router {router} went away during backlog replay; {len(entries) - len(delivered) - len(failed)} pushes left.")
+            break
+        except Exception as e:
+            logger.error(f"Replaying {entry} failed: {e}", exc_info=True)
+            failed.append((entry, e))
+        else:
+            delivered.append(entry.pk)
+
+    PendingPush.objects.filter(pk__in=delivered).delete()
+    for entry, error in failed:
+        if entry.attempts + 1 >= max_attempts:
+            logger.error(f"Giving up on {entry} after {entry.attempts + 1} attempts.")
+            entry.delete()
+        else:
+            PendingPush.objects.filter(pk=entry.pk).update(attempts=F('attempts') + 1, last_error=str(error))
+
+    logger.info(f"Replayed {len(delivered)} parked pushes to {router}.")
+    return len(delivered)
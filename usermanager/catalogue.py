@@ -0,0 +1,68 @@
+# mpi_src/usermanager/catalogue.py
+"""
+Versioned cache of the plan catalogue (all ``Profile`` rows).
+
+Plans change a few times a month but are read on every visit to the plans page, every
+payment initiation and every admin form with a plan dropdown. The rows are cached under
+the current catalogue version; ``invalidate_catalogue`` moves the version on (profile
+saves and deletes, ``sync_profiles``), so readers switch to a fresh entry and the old one
+simply expires. The version is the change time in milliseconds, which also gives the
+plans page its ETag and Last-Modified.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from usermanager.models import Profile
+
+VERSION_KEY = 'usermanager-plans:version'
+
+
+def _now_version():
+    return int(time.time() * 1000)
+
+
+def catalogue_version():
+    """The current version; starts one if the cache has none (cold or evicted)."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _now_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def catalogue_modified(version=None):
+    """When the catalogue last changed, as far as the cache knows."""
+    version = catalogue_version() if version is None else version
+    return datetime.datetime.fromtimestamp(version / 1000, tz=datetime.timezone.utc)
+
+
+def plan_catalogue():
+    """All plans, cheapest first; one cache read while the catalogue is unchanged."""
+    key = f'usermanager-plans:{catalogue_version()}'
+    plans = cache.get(key)
+    if plans is None:
+        plans = list(Profile.objects.order_by('price', 'name'))
+        cache.set(key, plans, timeout=getattr(settings, 'PLAN_CATALOGUE_TIMEOUT', 86400))
+    return plans
+
+
+def get_plan(profile_id):
+    """The cached plan with this id, or None."""
+    profile_id = str(profile_id)
+    return next((plan for plan in plan_catalogue() if str(plan.pk) == profile_id), None)
+
+
+def invalidate_catalogue():
+    """
+    Start a new catalogue version once the current transaction commits; bumping earlier
+    would let a concurrent reader cache the old rows under the new version.
+    """
+    def bump():
+        # Strictly increasing even for two changes within the same millisecond
+        cache.set(VERSION_KEY, max(_now_version(), (cache.get(VERSION_KEY) or 0) + 1), timeout=None)
+
+    transaction.on_commit(bump)
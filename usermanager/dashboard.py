@@ -0,0 +1,67 @@
+# mpi_src/usermanager/dashboard.py
+"""
+Cached per-user dashboard snapshot.
+
+``UserDetailView`` renders from one cache entry per user holding the already evaluated
+rows it shows, so a dashboard hit on the steady-state path is a single cache read. The
+session sync, the user profile sync and the payment flow call ``refresh_dashboard`` when
+a user's data changes; it rebuilds the snapshot only if one is cached (someone is
+looking), otherwise the next page load builds it. ``DASHBOARD_CACHE_TIMEOUT`` bounds how
+long a change made elsewhere (e.g. in the admin) can go unseen.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from usermanager.models import Payment, Session, UserProfile, UserStats
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout or the cached models change
+SNAPSHOT_VERSION = 1
+
+
+def dashboard_key(user_id):
+    return f"usermanager-dashboard:v{SNAPSHOT_VERSION}:{user_id}"
+
+
+def dashboard_querysets(user_id):
+    """What the dashboard shows, as querysets; each is served by an index."""
+    user_profiles = UserProfile.objects.filter(user_id=user_id).select_related('profile')
+    return {
+        'running_active_profiles': user_profiles.filter(state='running-active'),
+        'recent_user_profiles': user_profiles.order_by('-end_time')[:5],
+        'recent_user_payments': Payment.objects.filter(user_id=user_id).order_by('-trans_end')[:5],
+        'active_sessions': Session.objects.filter(user_id=user_id, is_open=True).order_by('-session_id'),
+    }
+
+
+def build_snapshot(user_id):
+    """Evaluate the dashboard querysets and cache the rows."""
+    snapshot = {name: list(queryset) for name, queryset in dashboard_querysets(user_id).items()}
+    # Running usage and billing totals: one row instead of summing history
+    snapshot['user_stats'] = UserStats.objects.filter(user_id=user_id).first()
+    cache.set(dashboard_key(user_id), snapshot, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 600))
+    return snapshot
+
+
+def get_snapshot(user_id):
+    snapshot = cache.get(dashboard_key(user_id))
+    if snapshot is None:
+        snapshot = build_snapshot(user_id)
+    return snapshot
+
+
+def refresh_dashboard(user_id):
+    """
+    Rebuild a user's cached snapshot once the current transaction commits, so it never
+    caches rows that are rolled back. Nothing to do when no snapshot is cached.
+    """
+    def rebuild():
+        if cache.get(dashboard_key(user_id)) is not None:
+            build_snapshot(user_id)
+            logger.debug(f"Rebuilt dashboard snapshot of user {user_id}")
+
+    transaction.on_commit(rebuild)
@@ -0,0 +1,112 @@
+# mpi_src/usermanager/db_routers.py
+"""
+Optional read replica for dashboard and list queries.
+
+Nothing is routed to the replica unless a ``replica`` alias is configured *and* the code
+runs inside ``read_from_replica()`` (the ``ReplicaReadMixin`` views, reporting). Writes
+always go to the primary. Staleness policy: once a request writes, that browser reads
+from the primary for ``DB_REPLICA_PIN_SECONDS`` so it sees its own sign-up, payment or
+profile change even if the replica lags behind.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+PIN_COOKIE = 'db_primary_until'
+
+_use_replica = ContextVar('use_replica', default=False)
+# A mutable holder rather than a flag: sync views under ASGI run in a copied context,
+# and their writes still have to be seen by the middleware that set it up.
+_writes = ContextVar('writes', default=None)
+
+# Writes that do not change anything a user reads back (e.g. the session row itself)
+_UNTRACKED_APPS = {'sessions'}
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Send reads inside the block to the replica, when one is configured."""
+    token = _use_replica.set(enabled and replica_configured())
+    writes_token = _writes.set({'wrote': False}) if _writes.get() is None else None
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+        if writes_token is not None:
+            _writes.reset(writes_token)
+
+
+def _wrote():
+    writes = _writes.get()
+    return bool(writes and writes['wrote'])
+
+
+class ReplicaRouter:
+    """Reads go to the replica only inside ``read_from_replica()`` and before any write."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not _wrote():
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and model._meta.app_label not in _UNTRACKED_APPS:
+            writes['wrote'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA, None}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA  # the replica gets its schema from the primary
+
+
+def pinned_to_primary(request):
+    """True while this browser must read its own recent writes."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class PrimaryPinMiddleware:
+    """Pins a browser to the primary for a while after any request of theirs wrote."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _writes.set({'wrote': False})
+        try:
+            response = self.get_response(request)
+            pin_seconds = getattr(settings, 'DB_REPLICA_PIN_SECONDS', 5)
+            if _wrote() and pin_seconds and replica_configured():
+                response.set_cookie(PIN_COOKIE, str(time.time() + pin_seconds), max_age=pin_seconds, httponly=True)
+            return response
+        finally:
+            _writes.reset(token)
+
+
+class ReplicaReadMixin:
+    """
+    For read-only views: GET requests read from the replica unless the browser is pinned
+    to the primary. The template is rendered inside the block, because that is where
+    the lazy querysets actually run.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        enabled = request.method in ('GET', 'HEAD') and not pinned_to_primary(request)
+        with read_from_replica(enabled):
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        return response
@@ -0,0 +1,132 @@
+# mpi_src/usermanager/exports.py
+"""
+Streaming CSV/JSONL exports of sessions, payments and user profiles.
+
+Rows are read with ``values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)`` (a
+server-side cursor on PostgreSQL) and encoded as they arrive, a few dozen KiB at a time,
+optionally through an incremental gzip stream. Nothing holds more than one chunk of rows,
+so memory stays flat however many rows match. Used by ``ExportView`` and
+``manage.py export_usermanager``.
+"""
+import csv
+import datetime
+import json
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from usermanager.models import Payment, Session, UserProfile
+
+# ``columns`` maps each output column to its ``values_list`` lookup
+Export = namedtuple('Export', 'model date_field columns')
+
+EXPORTS = {
+    'sessions': Export(Session, 'started', {
+        'session_id': 'session_id', 'user': 'user__username', 'nas_ip_address': 'nas_ip_address',
+        'nas_port_id': 'nas_port_id', 'calling_station_id': 'calling_station_id', 'user_address': 'user_address',
+        'status': 'status', 'started': 'started', 'ended': 'ended', 'uptime': 'uptime',
+        'download': 'download', 'upload': 'upload', 'terminate_cause': 'terminate_cause',
+    }),
+    'payments': Export(Payment, 'trans_start', {
+        'id': 'id', 'user': 'user__username', 'profile': 'profile__name', 'method': 'method',
+        'trans_status': 'trans_status', 'trans_start': 'trans_start', 'trans_end': 'trans_end',
+        'price': 'price', 'currency': 'currency', 'paystack_reference': 'paystack_reference',
+        'user_message': 'user_message',
+    }),
+    'user_profiles': Export(UserProfile, 'created', {
+        'id': 'id', 'user': 'user__username', 'profile': 'profile__name', 'state': 'state',
+        'lifecycle': 'lifecycle', 'end_time': 'end_time', 'created': 'created',
+    }),
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+# Encoded output is handed on in pieces of about this size
+BUFFER_SIZE = 64 * 1024
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_export(queryset, date_field, since=None, until=None, username=None):
+    """Rows whose ``date_field`` falls on ``since`` .. ``until`` (dates, inclusive), of one user."""
+    if username:
+        queryset = queryset.filter(user__username=username)
+    if since:
+        queryset = queryset.filter(**{f'{date_field}__gte': _day_start(since)})
+    if until:
+        queryset = queryset.filter(**{f'{date_field}__lt': _day_start(until + datetime.timedelta(days=1))})
+    return queryset
+
+
+class _Echo:
+    """``csv.writer`` target that hands each formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + '\n'
+
+
+def _buffered(lines):
+    """Join lines into ~``BUFFER_SIZE`` byte chunks; one write per line would dominate."""
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(name, fmt='csv', compress=False, queryset=None, since=None, until=None, username=None,
+                  using=None):
+    """
+    The export ``name`` as an iterator of bytes. ``queryset`` narrows the rows further
+    (e.g. to the requesting user); ``using`` picks the database to read from.
+    """
+    export = EXPORTS[name]
+    queryset = export.model.objects.all() if queryset is None else queryset
+    if using:
+        queryset = queryset.using(using)
+    queryset = filter_export(queryset, export.date_field, since, until, username)
+    header = list(export.columns)
+    rows = (
+        queryset.order_by(export.date_field, 'pk')
+        .values_list(*export.columns.values())
+        .iterator(chunk_size=getattr(settings, 'EXPORT_CHUNK_SIZE', 2000))
+    )
+    lines = _csv_lines(header, rows) if fmt == 'csv' else _jsonl_lines(header, rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if compress else chunks
+
+
+def export_filename(name, fmt, compress=False):
+    return f"{name}-{timezone.localdate():%Y%m%d}.{FORMATS[fmt][1]}{'.gz' if compress else ''}"
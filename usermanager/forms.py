@@ -21,3 +21,12 @@ class SignInForm(AuthenticationForm):
         model = User
         fields = ['username', 'password']
 
+
+
+# Server-side filters of the paginated list views
+class ListFilterForm(forms.Form):
+    user = forms.CharField(required=False, max_length=128)  # username; superusers only
+    since = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    until = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    nas = forms.GenericIPAddressField(required=False, label='NAS')
+    status = forms.CharField(required=False, max_length=32)
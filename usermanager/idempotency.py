@@ -0,0 +1,78 @@
+# mpi_src/usermanager/idempotency.py
+"""
+Deduplication for Django -> MikroTik pushes.
+
+Every push task carries an idempotency key made of the object id and the local version
+it was enqueued for. A short in-flight claim stops two workers running the same delivery
+at once; a longer "done" marker makes redeliveries within the dedup window free. Both
+live in the Redis-backed default cache.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PUSH_LOCK_TIMEOUT = 60  # seconds; longer than any single push takes
+
+
+def push_key(model, action, object_id, version):
+    return f"mikrotik-push:{model}:{action}:{object_id}:{version}"
+
+
+def claim_push(key):
+    """
+    True when this delivery should run: it has not completed within the dedup window and
+    no other worker is running it right now.
+    """
+    if cache.get(f"{key}:done"):
+        return False
+    return cache.add(f"{key}:lock", 1, timeout=PUSH_LOCK_TIMEOUT)
+
+
+def release_push(key, done):
+    """Drop the in-flight claim; remember the delivery if it completed."""
+    if done:
+        cache.set(f"{key}:done", 1, timeout=getattr(settings, 'MIKROTIK_PUSH_DEDUP_WINDOW', 3600))
+    cache.delete(f"{key}:lock")
+
+
+# ------------------------------------------------ router name -> .id index
+INDEX_TIMEOUT = 300
+
+_LISTINGS = {
+    'user': lambda manager: manager.get_users(),
+    'profile': lambda manager: manager.get_profiles(),
+}
+
+
+def _index_key(manager, kind):
+    return f"mikrotik-index:{manager.router_ip}:{kind}"
+
+
+def lookup_router_id(manager, kind, name):
+    """
+    Return the router ``.id`` of the ``kind`` object called ``name``, or None.
+    The whole name -> .id map is fetched with one listing call and cached, so a retried
+    create costs a cache read instead of a duplicate router object.
+    """
+    key = _index_key(manager, kind)
+    index = cache.get(key)
+    if index is None:
+        index = {item['name']: item['.id'] for item in _LISTINGS[kind](manager) if 'name' in item}
+        cache.set(key, index, timeout=INDEX_TIMEOUT)
+    return index.get(name)
+
+
+def remember_router_id(manager, kind, name, router_id):
+    """Add a freshly created object to the cached index, if the index is cached."""
+    key = _index_key(manager, kind)
+    index = cache.get(key)
+    if index is not None:
+        index[name] = router_id
+        cache.set(key, index, timeout=INDEX_TIMEOUT)
+
+
+def forget_router_index(manager, kind):
+    cache.delete(_index_key(manager, kind))
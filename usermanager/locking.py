@@ -0,0 +1,61 @@
+# mpi_src/usermanager/locking.py
+"""
+Row claims shared by the sync engine and the push tasks.
+
+On backends with ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL, MySQL 8) a claim is a
+row lock held for the claiming transaction. Elsewhere (SQLite) it is a short lease stored
+on the row itself, taken and released with one UPDATE each, and no transaction is held
+while the claim lasts: SQLite's write lock covers the whole database, and a push would
+otherwise hold it for the router's HTTP round trip. Either way a worker never
+waits for, or overwrites, a row another worker is busy with: contended rows are simply
+left out and picked up on the next cycle.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+LEASE_SECONDS = 60  # longer than a sync batch or a single push takes
+
+
+class RowBusy(Exception):
+    """The row is claimed by another worker; try again next cycle."""
+
+
+@contextmanager
+def claim_rows(queryset, lease_seconds=LEASE_SECONDS):
+    """
+    Claim the rows of ``queryset`` this worker can get without waiting and yield them
+    as a list of instances. With row locks the body runs in the claiming transaction;
+    with leases it runs outside one, so its writes commit as they go.
+    """
+    using = router.db_for_write(queryset.model)
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            yield list(queryset.using(using).select_for_update(skip_locked=True))
+        return
+
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    model = queryset.model
+    queryset.using(using).filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now)).update(
+        lease_owner=token, lease_until=now + timedelta(seconds=lease_seconds),
+    )
+    try:
+        yield list(model.objects.using(using).filter(lease_owner=token))
+    finally:
+        model.objects.using(using).filter(lease_owner=token).update(lease_owner=None, lease_until=None)
+
+
+@contextmanager
+def claim_row(model, pk):
+    """Claim a single row, raising RowBusy when another worker holds it."""
+    with claim_rows(model.objects.filter(pk=pk)) as claimed:
+        if not claimed:
+            if model.objects.filter(pk=pk).exists():
+                raise RowBusy(f"{model.__name__} {pk} is claimed by another worker")
+            raise model.DoesNotExist(f"{model.__name__} {pk} does not exist")
+        yield claimed[0]
@@ -0,0 +1,138 @@
+# mpi_src/usermanager/management/commands/benchmark_db.py
+
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from usermanager.dashboard import dashboard_querysets
+from usermanager.models import Session, User, UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent read/write throughput of the configured database profile. '
+        'Run it once per profile, e.g. SQLITE_WAL=False vs the default, or DB_ENGINE=postgresql. '
+        'It writes to a throwaway database with the same settings (as the test runner does), '
+        'never to the configured one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=2, help='Threads writing sync-sized batches')
+        parser.add_argument('--readers', type=int, default=4, help='Threads running dashboard-style reads')
+        parser.add_argument('--seconds', type=float, default=10.0, help='How long to run')
+        parser.add_argument('--batch', type=int, default=50, help='Sessions written per sync transaction')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as scratch:
+            if connection.vendor == 'sqlite':
+                # A file, not the in-memory default, so the journal pragmas apply
+                connection.settings_dict['TEST']['NAME'] = os.path.join(scratch, 'benchmark.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.benchmark(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, options):
+        self.stdout.write(f'Profile: {self.describe_profile()}')
+        # One user per writer, as each sync batch belongs to its own subscribers; bulk
+        # writes skip the signals that would enqueue router pushes
+        users = User.objects.bulk_create([
+            User(username=f'benchmark-{i}') for i in range(max(options['writers'], 1))
+        ])
+        UserStats.objects.bulk_create([UserStats(user=user) for user in users])
+        session_ids = itertools.count()
+        stop = threading.Event()
+        counts = {'writes': 0, 'reads': 0, 'busy': 0}
+        lock = threading.Lock()
+
+        def count(key, amount=1):
+            with lock:
+                counts[key] += amount
+
+        def writer(user):
+            # What sync_sessions does per batch: new sessions in, running counters
+            # moved, the previous batch closed, the user's stats bumped
+            previous = []
+            try:
+                while not stop.is_set():
+                    now = timezone.now()
+                    try:
+                        with transaction.atomic():
+                            rows = Session.objects.bulk_create([
+                                Session(
+                                    session_id=f'benchmark-{next(session_ids)}', user=user, nas_port_id='1',
+                                    nas_port_type='wireless', calling_station_id='AA:BB', user_address='10.5.50.2',
+                                    download=0, upload=0, status='start', started=now, is_open=True,
+                                )
+                                for _ in range(options['batch'])
+                            ])
+                            Session.objects.filter(user=user, is_open=True).update(
+                                download=F('download') + 1000, upload=F('upload') + 100,
+                            )
+                            Session.objects.filter(pk__in=previous).update(status='stop', ended=now, is_open=False)
+                            UserStats.objects.filter(user=user).update(
+                                cycle_bytes=F('cycle_bytes') + 1100, lifetime_bytes=F('lifetime_bytes') + 1100,
+                            )
+                        previous = [row.pk for row in rows]
+                        count('writes', len(rows))
+                    except OperationalError:
+                        count('busy')
+            finally:
+                connections.close_all()
+
+        def reader():
+            # A dashboard rebuild: its querysets plus the stats row
+            try:
+                while not stop.is_set():
+                    user_id = random.choice(users).pk
+                    try:
+                        for queryset in dashboard_querysets(user_id).values():
+                            list(queryset)
+                        UserStats.objects.filter(user_id=user_id).first()
+                        count('reads')
+                    except OperationalError:
+                        count('busy')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=writer, args=(user,)) for user in users[:options['writers']]]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['writes'] / elapsed:,.0f} sessions synced/s, {counts['reads'] / elapsed:,.0f} dashboard reads/s, "
+            f"{counts['busy']} 'database is locked' errors over {elapsed:.1f}s "
+            f"({options['writers']} writers, {options['readers']} readers)."
+        ))
+
+    def describe_profile(self):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                pragmas = {
+                    name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+                }
+            return 'sqlite ' + ', '.join(f'{name}={value}' for name, value in pragmas.items())
+        settings_dict = connection.settings_dict
+        return (
+            f"{connection.vendor} CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}, "
+            f"pool={bool(settings_dict['OPTIONS'].get('pool'))}, "
+            f"server-side cursors={not settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')}"
+        )
@@ -0,0 +1,82 @@
+# mpi_src/usermanager/management/commands/benchmark_sync_memory.py
+
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from usermanager.routeros import RouterSession, parse_datetime, parse_duration
+
+
+def synthetic_sessions(rows):
+    """A /rest/user-manager/session payload shaped like a busy router's."""
+    return json.dumps([
+        {
+            '.id': f'*{i:X}', 'acct-session-id': f'8100{i:06x}', 'user': f'user{i % 5000}',
+            'nas-ip-address': '10.5.50.1', 'nas-port-id': 'wlan1', 'nas-port-type': 'wireless-802.11',
+            'calling-station-id': f'AA:BB:CC:{i % 256:02X}:{i // 256 % 256:02X}:01',
+            'user-address': f'10.5.{i // 256 % 256}.{i % 256}', 'download': str(i * 1500), 'upload': str(i * 150),
+            'uptime': '1h2m3s', 'status': 'start,interim', 'started': '2024-10-05 12:00:00', 'ended': '',
+            'terminate-cause': '', 'last-accounting-packet': '2024-10-05 13:02:03',
+            'from-address': '', 'active': 'true', 'comment': '',
+        }
+        for i in range(rows)
+    ]).encode()
+
+
+def decode_dicts(payload):
+    """The previous sync: every raw dict stays alive while each row is parsed on use."""
+    rows = json.loads(payload)
+    for row in rows:
+        int(row.get('download', 0)), int(row.get('upload', 0)), parse_duration(row.get('uptime'))
+        parse_datetime(row.get('started')), parse_datetime(row.get('ended'))
+        parse_datetime(row.get('last-accounting-packet'))
+    return rows
+
+
+def decode_records(payload):
+    return json.loads(payload, object_hook=RouterSession.from_router)
+
+
+STRATEGIES = {'dicts': decode_dicts, 'records': decode_records}
+
+
+def measure(strategy, payload, trace, results):
+    """Runs in a fresh process so peak RSS belongs to this strategy alone."""
+    if trace:
+        tracemalloc.start()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    rows = STRATEGIES[strategy](payload)
+    elapsed = time.perf_counter() - started
+    result = {'rows': len(rows), 'seconds': elapsed, 'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before}
+    if trace:
+        result['traced_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    results.put(result)
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory of decoding router sessions into dicts vs compact records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Synthetic sessions in the payload')
+
+    def handle(self, *args, **options):
+        payload = synthetic_sessions(options['rows'])
+        self.stdout.write(f"Payload: {options['rows']} sessions, {len(payload) // 1024} KiB of JSON")
+        context = multiprocessing.get_context('fork')
+        for strategy in STRATEGIES:
+            result = {}
+            for trace in (True, False):  # tracemalloc slows decoding and inflates RSS: measure apart
+                results = context.Queue()
+                process = context.Process(target=measure, args=(strategy, payload, trace, results))
+                process.start()
+                result.update(results.get())  # untraced run last: its RSS and timing win
+                process.join()
+            self.stdout.write(
+                f"{strategy:>8}: peak RSS +{result['rss_kb'] // 1024} MiB, "
+                f"Python heap peak {result['traced_kb'] // 1024} MiB, {result['seconds']:.2f}s"
+            )
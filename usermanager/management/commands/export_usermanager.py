@@ -0,0 +1,45 @@
+# mpi_src/usermanager/management/commands/export_usermanager.py
+
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usermanager.exports import EXPORTS, FORMATS, stream_export
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Stream sessions, payments or user profiles as CSV/JSONL, in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', default='csv', choices=sorted(FORMATS))
+        parser.add_argument('--since', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--user', help='Only this username')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output on the fly')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        chunks = stream_export(
+            options['name'], options['format'], options['gzip'],
+            since=options['since'] and _date(options['since']),
+            until=options['until'] and _date(options['until']),
+            username=options['user'],
+        )
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Exported {options['name']} to {options['output']}"))
@@ -0,0 +1,53 @@
+# mpi_src/usermanager/management/commands/prune_usermanager.py
+
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from usermanager.models import User
+from usermanager.pruning import TARGETS, estimate, prune, delete_user_in_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delete traffic, usage, unpaid payments and orphaned rows past their retention, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=sorted(TARGETS), help='Prune only this target (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows and chunks would be deleted')
+        parser.add_argument('--chunk-size', type=int, help='Rows per delete transaction (default PRUNE_CHUNK_SIZE)')
+        parser.add_argument('--sleep', type=float, help='Seconds between chunks (default PRUNE_CHUNK_SLEEP)')
+        parser.add_argument('--restart', action='store_true', help='Ignore the cutoff of an interrupted run')
+        parser.add_argument('--user', help='Delete this user and all their history in batches instead')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            return self.delete_user(options)
+
+        if options['dry_run']:
+            pause = settings.PRUNE_CHUNK_SLEEP if options['sleep'] is None else options['sleep']
+            for name, (rows, chunks) in estimate(options['only']).items():
+                self.stdout.write(f'{name}: {rows} rows in {chunks} chunks (~{chunks * pause:.0f}s of pauses)')
+            return
+
+        result = prune(
+            options['only'], chunk_size=options['chunk_size'], pause=options['sleep'], resume=not options['restart'],
+        )
+        for name, rows in result.items():
+            self.stdout.write(self.style.SUCCESS(f'{name}: deleted {rows} rows'))
+
+    def delete_user(self, options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+        if options['dry_run']:
+            for relation in ('trafficseries', 'session', 'dailyusage', 'trafficrollup', 'payment', 'userprofile'):
+                self.stdout.write(f'{relation}: {getattr(user, f"{relation}_set").count()} rows')
+            return
+        deleted = delete_user_in_chunks(user, chunk_size=options['chunk_size'], pause=options['sleep'])
+        for model, rows in deleted.items():
+            self.stdout.write(self.style.SUCCESS(f'{model}: deleted {rows} rows'))
+        logger.info(f"Deleted user {options['user']} in batches: {deleted}")
+        self.stdout.write(self.style.SUCCESS(f"Deleted user {options['user']}"))
@@ -0,0 +1,42 @@
+# mpi_src/usermanager/management/commands/report_usermanager.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from usermanager.reporting import close_periods, revenue_per_plan, top_users_by_traffic
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Revenue per plan per day, or the top users by traffic, from rollups and live data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('report', choices=['revenue', 'top-users', 'close'])
+        parser.add_argument('--since', help='First day (YYYY-MM-DD, default 7 days ago)')
+        parser.add_argument('--until', help='Last day (YYYY-MM-DD, default today)')
+        parser.add_argument('--limit', type=int, default=20, help='Users to list for top-users')
+
+    def handle(self, *args, **options):
+        if options['report'] == 'close':
+            days = close_periods()
+            self.stdout.write(self.style.SUCCESS(f'Closed {days} days'))
+            return
+
+        until = _date(options['until']) if options['until'] else timezone.localdate()
+        since = _date(options['since']) if options['since'] else until - datetime.timedelta(days=6)
+        if options['report'] == 'revenue':
+            for row in revenue_per_plan(since, until):
+                self.stdout.write(
+                    f"{row['date']}  {row['plan'] or '-':<20} {row['payments']:>6}  {row['revenue']} {row['currency']}"
+                )
+        else:
+            for row in top_users_by_traffic(since, until, options['limit']):
+                self.stdout.write(f"{row['username']:<30} {row['traffic']:>16}  ({row['sessions']} sessions)")
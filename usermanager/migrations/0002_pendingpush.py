@@ -0,0 +1,80 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingPush",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("router", models.CharField(max_length=256, verbose_name="router")),
+                (
+                    "model",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("profile", "Profile"),
+                            ("user_profile", "User Profile"),
+                        ],
+                        max_length=67,
+                        verbose_name="model",
+                    ),
+                ),
+                ("object_id", models.UUIDField(verbose_name="object ID")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("create", "Create"),
+                            ("update", "Update"),
+                            ("delete", "Delete"),
+                        ],
+                        max_length=67,
+                        verbose_name="action",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="attempts"),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, null=True, verbose_name="last error"),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(auto_now=True, verbose_name="modified"),
+                ),
+            ],
+            options={
+                "ordering": ["created"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("router", "model", "object_id"),
+                        name="unique_pending_push_per_object",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0002_pendingpush"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="local_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="local version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="router_fingerprint",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="router fingerprint",
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="synced_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="synced version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="local_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="local version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="router_fingerprint",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="router fingerprint",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="synced_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="synced version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="local_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="local version"
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="router_fingerprint",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="router fingerprint",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="synced_version",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="synced version"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0003_sync_markers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="lease_owner",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="lease owner",
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="lease_until",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="lease until"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="lease_owner",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="lease owner",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="lease_until",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="lease until"
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="lease_owner",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="lease owner",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="lease_until",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="lease until"
+            ),
+        ),
+    ]
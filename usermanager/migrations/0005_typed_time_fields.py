@@ -0,0 +1,184 @@
+# Converts UserProfile.end_time and Session.uptime from router strings to typed columns.
+
+import datetime
+import re
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copies of the RouterOS parsing/formatting helpers in usermanager/routeros.py as
+# they were when this migration was written; the migration must not change with them.
+_UNIT_SECONDS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+_DURATION_RE = re.compile(
+    r"^\s*(?:(?P<w>\d+)w)?\s*(?:(?P<d>\d+)d)?\s*(?:(?P<h>\d+)h)?\s*(?:(?P<m>\d+)m(?!s))?\s*"
+    r"(?:(?P<s>\d+)s)?\s*(?:(?P<ms>\d+)ms)?\s*"
+    r"(?:(?P<clock_h>\d+):(?P<clock_m>\d{2}):(?P<clock_s>\d{2})(?:\.(?P<clock_frac>\d+))?)?\s*$"
+)
+_NO_VALUE = {"", "unlimited", "never", "none"}
+_MONTHS = {
+    name: i
+    for i, name in enumerate(
+        (
+            "jan",
+            "feb",
+            "mar",
+            "apr",
+            "may",
+            "jun",
+            "jul",
+            "aug",
+            "sep",
+            "oct",
+            "nov",
+            "dec",
+        ),
+        start=1,
+    )
+}
+_LEGACY_DATE_RE = re.compile(
+    r"^(?P<mon>[a-z]{3})/(?P<day>\d{2})/(?P<year>\d{4})(?:\s+(?P<time>\d{2}:\d{2}:\d{2}))?$"
+)
+
+
+def parse_duration(value):
+    value = str(value).strip().lower()
+    if value in _NO_VALUE:
+        return None
+    match = _DURATION_RE.match(value)
+    if not match or not any(match.groupdict().values()):
+        return None
+    parts = match.groupdict()
+    seconds = sum(
+        int(parts[unit]) * factor
+        for unit, factor in _UNIT_SECONDS.items()
+        if parts[unit]
+    )
+    if parts["clock_h"]:
+        seconds += (
+            int(parts["clock_h"]) * 3600
+            + int(parts["clock_m"]) * 60
+            + int(parts["clock_s"])
+        )
+    micro = int(parts["ms"]) * 1000 if parts["ms"] else 0
+    if parts["clock_frac"]:
+        micro += int(parts["clock_frac"][:6].ljust(6, "0"))
+    return datetime.timedelta(seconds=seconds, microseconds=micro)
+
+
+def format_duration(value):
+    if value is None:
+        return ""
+    seconds = int(value.total_seconds())
+    out = []
+    for unit, factor in _UNIT_SECONDS.items():
+        amount, seconds = divmod(seconds, factor)
+        if amount:
+            out.append(f"{amount}{unit}")
+    return "".join(out) or "0s"
+
+
+def parse_datetime(value):
+    value = str(value).strip().lower()
+    if value in _NO_VALUE:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        match = _LEGACY_DATE_RE.match(value)
+        if not match or match["mon"] not in _MONTHS:
+            return None
+        hour, minute, second = map(int, (match["time"] or "00:00:00").split(":"))
+        parsed = datetime.datetime(
+            int(match["year"]),
+            _MONTHS[match["mon"]],
+            int(match["day"]),
+            hour,
+            minute,
+            second,
+        )
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def format_datetime(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def backfill_time_fields(apps, schema_editor):
+    UserProfile = apps.get_model("usermanager", "UserProfile")
+    Session = apps.get_model("usermanager", "Session")
+
+    for user_profile in UserProfile.objects.exclude(legacy_end_time=None).iterator(
+        chunk_size=1000
+    ):
+        UserProfile.objects.filter(pk=user_profile.pk).update(
+            end_time=parse_datetime(user_profile.legacy_end_time)
+        )
+
+    for session in Session.objects.exclude(legacy_uptime="").iterator(chunk_size=1000):
+        Session.objects.filter(pk=session.pk).update(
+            uptime=parse_duration(session.legacy_uptime) or datetime.timedelta(0)
+        )
+
+
+def restore_time_fields(apps, schema_editor):
+    UserProfile = apps.get_model("usermanager", "UserProfile")
+    Session = apps.get_model("usermanager", "Session")
+
+    for user_profile in UserProfile.objects.exclude(end_time=None).iterator(
+        chunk_size=1000
+    ):
+        UserProfile.objects.filter(pk=user_profile.pk).update(
+            legacy_end_time=format_datetime(user_profile.end_time)
+        )
+
+    for session in Session.objects.iterator(chunk_size=1000):
+        Session.objects.filter(pk=session.pk).update(
+            legacy_uptime=format_duration(session.uptime)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0004_sync_leases"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="userprofile",
+            old_name="end_time",
+            new_name="legacy_end_time",
+        ),
+        migrations.RenameField(
+            model_name="session",
+            old_name="uptime",
+            new_name="legacy_uptime",
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="end_time",
+            field=models.DateTimeField(
+                blank=True, db_index=True, null=True, verbose_name="end time"
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="uptime",
+            field=models.DurationField(
+                default=datetime.timedelta(0), verbose_name="Uptime"
+            ),
+        ),
+        migrations.RunPython(backfill_time_fields, restore_time_fields),
+        migrations.RemoveField(
+            model_name="userprofile",
+            name="legacy_end_time",
+        ),
+        migrations.RemoveField(
+            model_name="session",
+            name="legacy_uptime",
+        ),
+    ]
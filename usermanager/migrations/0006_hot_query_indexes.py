@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0005_typed_time_fields"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="payment",
+            options={"ordering": ["-trans_end"]},
+        ),
+        migrations.AlterModelOptions(
+            name="session",
+            options={"ordering": ["-session_id"]},
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-trans_end"], name="payment_user_trans_end_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["trans_status", "-trans_end"],
+                name="payment_status_trans_end_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(fields=["user", "-session_id"], name="session_user_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(
+                condition=models.Q(("ended__isnull", True)),
+                fields=["user", "-session_id"],
+                name="session_user_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["user", "state", "-mikrotik_id"],
+                name="userprofile_user_state_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["user", "-end_time"], name="userprofile_user_end_idx"
+            ),
+        ),
+    ]
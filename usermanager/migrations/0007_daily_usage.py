@@ -0,0 +1,72 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:11
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0006_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                (
+                    "nas_ip_address",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=45,
+                        verbose_name="NAS IP Address",
+                    ),
+                ),
+                (
+                    "download",
+                    models.BigIntegerField(default=0, verbose_name="Download"),
+                ),
+                ("upload", models.BigIntegerField(default=0, verbose_name="Upload")),
+                (
+                    "sessions",
+                    models.PositiveIntegerField(default=0, verbose_name="sessions"),
+                ),
+                (
+                    "uptime",
+                    models.DurationField(
+                        default=datetime.timedelta(0), verbose_name="Uptime"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily usage",
+                "ordering": ["-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date", "nas_ip_address"),
+                        name="unique_daily_usage",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0007_daily_usage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrafficSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "session_id",
+                    models.CharField(max_length=67, verbose_name="Session ID"),
+                ),
+                (
+                    "nas_ip_address",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=45,
+                        verbose_name="NAS IP Address",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.PositiveIntegerField(
+                        choices=[(0, "Raw"), (300, "5 minutes"), (3600, "1 hour")],
+                        default=0,
+                        verbose_name="resolution",
+                    ),
+                ),
+                ("bucket", models.DateTimeField(verbose_name="bucket")),
+                ("samples", models.JSONField(default=dict, verbose_name="samples")),
+                (
+                    "last_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last sample"
+                    ),
+                ),
+                (
+                    "last_download",
+                    models.BigIntegerField(
+                        default=0, verbose_name="last download counter"
+                    ),
+                ),
+                (
+                    "last_upload",
+                    models.BigIntegerField(
+                        default=0, verbose_name="last upload counter"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "traffic series",
+                "ordering": ["bucket"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "bucket"], name="traffic_user_bucket_idx"
+                    ),
+                    models.Index(
+                        fields=["nas_ip_address", "bucket"],
+                        name="traffic_nas_bucket_idx",
+                    ),
+                    models.Index(
+                        fields=["resolution", "bucket"],
+                        name="traffic_resolution_bucket_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("session_id", "resolution", "bucket"),
+                        name="unique_traffic_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0008_traffic_series"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "cycle_start",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="cycle start"
+                    ),
+                ),
+                (
+                    "cycle_bytes",
+                    models.BigIntegerField(default=0, verbose_name="bytes this cycle"),
+                ),
+                (
+                    "lifetime_bytes",
+                    models.BigIntegerField(default=0, verbose_name="lifetime bytes"),
+                ),
+                (
+                    "active_sessions",
+                    models.IntegerField(default=0, verbose_name="active sessions"),
+                ),
+                (
+                    "last_payment_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last payment"
+                    ),
+                ),
+                (
+                    "last_payment_amount",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                        verbose_name="last payment amount",
+                    ),
+                ),
+                (
+                    "total_paid",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="total paid",
+                    ),
+                ),
+                (
+                    "recomputed",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="recomputed"
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(auto_now=True, verbose_name="modified"),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "user stats",
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+CLOSED_STATUSES = {"stop", "close-acked", "expired"}
+
+
+def materialise_status_columns(apps, schema_editor):
+    Session = apps.get_model("usermanager", "Session")
+    UserProfile = apps.get_model("usermanager", "UserProfile")
+
+    UserProfile.objects.filter(state="used").update(lifecycle="time_elapsed")
+    UserProfile.objects.filter(state="running").update(lifecycle="data_exhausted")
+
+    Session.objects.exclude(ended=None).update(is_open=False)
+    closed = [
+        session.pk
+        for session in Session.objects.filter(ended=None)
+        .only("status")
+        .iterator(chunk_size=1000)
+        if CLOSED_STATUSES & set((session.status or "").split(","))
+    ]
+    for start in range(0, len(closed), 1000):
+        Session.objects.filter(pk__in=closed[start : start + 1000]).update(
+            is_open=False
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0009_user_stats"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="session",
+            name="session_user_open_idx",
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="is_open",
+            field=models.BooleanField(default=True, verbose_name="open"),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="lifecycle",
+            field=models.CharField(
+                choices=[
+                    ("active", "Active"),
+                    ("data_exhausted", "Data Exhausted"),
+                    ("time_elapsed", "Time Elapsed"),
+                ],
+                db_index=True,
+                default="active",
+                max_length=20,
+                verbose_name="lifecycle",
+            ),
+        ),
+        migrations.RunPython(materialise_status_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(
+                condition=models.Q(("is_open", True)),
+                fields=["user", "-session_id"],
+                name="session_user_open_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0010_status_columns"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["-trans_start", "-id"], name="payment_trans_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-trans_start", "-id"],
+                name="payment_user_trans_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(fields=["-started", "-id"], name="session_started_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(
+                fields=["user", "-started", "-id"], name="session_user_started_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="session",
+            index=models.Index(
+                fields=["nas_ip_address", "-started", "-id"],
+                name="session_nas_started_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["-created", "-id"], name="userprofile_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userprofile",
+            index=models.Index(
+                fields=["user", "-created", "-id"], name="userprofile_user_created_idx"
+            ),
+        ),
+    ]
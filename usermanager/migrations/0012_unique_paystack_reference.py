@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+def clear_duplicate_references(apps, schema_editor):
+    """
+    Keep the earliest payment per reference; later duplicates lose the reference, which
+    is kept in duplicate_of_reference.
+    """
+    Payment = apps.get_model("usermanager", "Payment")
+    duplicates = (
+        Payment.objects.exclude(paystack_reference=None)
+        .values("paystack_reference")
+        .annotate(n=models.Count("id"))
+        .filter(n__gt=1)
+        .values_list("paystack_reference", flat=True)
+    )
+    for reference in list(duplicates):
+        payments = Payment.objects.filter(paystack_reference=reference).order_by(
+            "trans_start", "id"
+        )
+        for payment in payments[1:]:
+            payment.paystack_reference = None
+            payment.duplicate_of_reference = reference
+            payment.save(update_fields=["paystack_reference", "duplicate_of_reference"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0011_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="duplicate_of_reference",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(clear_duplicate_references, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="payment",
+            name="paystack_reference",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0012_unique_paystack_reference"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClosedDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True, verbose_name="date")),
+                (
+                    "closed_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="closed at"),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RevenueRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                (
+                    "plan",
+                    models.CharField(
+                        blank=True, default="", max_length=67, verbose_name="plan"
+                    ),
+                ),
+                (
+                    "currency",
+                    models.CharField(
+                        default="GHS", max_length=67, verbose_name="currency"
+                    ),
+                ),
+                (
+                    "payments",
+                    models.PositiveIntegerField(default=0, verbose_name="payments"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="revenue",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date", "plan"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "plan", "currency"),
+                        name="unique_revenue_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TrafficRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                (
+                    "download",
+                    models.BigIntegerField(default=0, verbose_name="Download"),
+                ),
+                ("upload", models.BigIntegerField(default=0, verbose_name="Upload")),
+                (
+                    "sessions",
+                    models.PositiveIntegerField(default=0, verbose_name="sessions"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-date"],
+                "indexes": [
+                    models.Index(
+                        fields=["date", "user"], name="traffic_rollup_date_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date"), name="unique_traffic_rollup"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_created(apps, schema_editor):
+    """Rows from before ``created`` was filled get their last change, or now."""
+    UserProfile = apps.get_model("usermanager", "UserProfile")
+    UserProfile.objects.filter(created=None).update(
+        created=Coalesce("modified", models.Value(timezone.now()))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0013_reporting_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="userprofile",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, verbose_name="created"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0014_userprofile_created_not_null"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="trans_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                    ("flagged", "Flagged"),
+                ],
+                max_length=67,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="user_profile",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="usermanager.userprofile",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("usermanager", "0015_payment_flags"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingpush",
+            name="mikrotik_id",
+            field=models.CharField(
+                blank=True, max_length=20, null=True, verbose_name="MikroTik ID"
+            ),
+        ),
+    ]
@@ -4,13 +4,20 @@
 # │   ├── mikrotik_userman.py
 
 # mpi_src/usermanager/mikrotik_userman.py
+import os
+import threading
 import requests
-from typing import Optional, List, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Optional, List, Dict, Any, Callable
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class MikroTikUnavailable(RuntimeError):
+    """Raised when the router cannot be reached at all (connection refused, timeout)."""
+
+
 class MikroTikUserManager:
     def __init__(self, router_ip: str, router_username: str, router_password: str):
         self.router_ip = router_ip.rstrip('/')
@@ -19,25 +26,44 @@ class MikroTikUserManager:
         self.session = requests.Session()
         self.session.auth = (self.router_username, self.router_password)
         self.session.headers.update({'Content-Type': 'application/json'})
+        # Keep-alive pool shared by every thread of the process using this client
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
-    def _request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None) -> Any:
+    def _request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None, timeout: float = 10,
+                 object_hook: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Any:
         url = f"{self.router_ip}/{endpoint.lstrip('/')}"
         try:
-            response = self.session.request(method=method.upper(), url=url, json=data, timeout=10)
+            response = self.session.request(method=method.upper(), url=url, json=data, timeout=timeout)
             response.raise_for_status()
             if response.content:
-                return response.json()
+                return response.json(object_hook=object_hook)
             return None
         except requests.exceptions.HTTPError as http_err:
             logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
             raise RuntimeError(f"HTTP error occurred: {http_err} - {response.text}")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as conn_err:
+            logger.error(f"Router unreachable: {conn_err}")
+            raise MikroTikUnavailable(f"Router unreachable: {conn_err}")
         except requests.exceptions.RequestException as req_err:
             logger.error(f"Request exception: {req_err}")
             raise RuntimeError(f"Request exception: {req_err}")
 
+    def ping(self, timeout: float = 3) -> bool:
+        """
+        Cheap health probe: True when the router answers its REST API.
+        """
+        try:
+            self._request('GET', 'rest/system/identity', timeout=timeout)
+            return True
+        except RuntimeError:
+            return False
+
     # ------------------------------------------------ users
-    def get_users(self) -> List[Dict[str, Any]]:
-        return self._request('GET', 'rest/user-manager/user') or []
+    def get_users(self, decoder: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Any]:
+        """All users; ``decoder`` converts each row as it is parsed (see ``routeros``)."""
+        return self._request('GET', 'rest/user-manager/user', object_hook=decoder) or []
 
     def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -66,6 +92,8 @@ class MikroTikUserManager:
 
         try:
             return self._request('PUT', 'rest/user-manager/user', data=data)
+        except MikroTikUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error creating user '{username}': {e}")
             raise RuntimeError(f"Error creating user '{username}': {e}")
@@ -90,6 +118,8 @@ class MikroTikUserManager:
 
         try:
             return self._request('PATCH', f"rest/user-manager/user/{user_id}", data=data)
+        except MikroTikUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error updating user '{user_id}': {e}")
             raise RuntimeError(f"Error updating user '{user_id}': {e}")
@@ -98,8 +128,9 @@ class MikroTikUserManager:
         return self._request('DELETE', f"rest/user-manager/user/{user_id}")
 
     # ------------------------------------------------ profiles
-    def get_profiles(self) -> List[Dict[str, Any]]:
-        return self._request('GET', 'rest/user-manager/profile') or []
+    def get_profiles(self, decoder: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Any]:
+        """All profiles; ``decoder`` converts each row as it is parsed (see ``routeros``)."""
+        return self._request('GET', 'rest/user-manager/profile', object_hook=decoder) or []
     
     def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
         try:
@@ -140,6 +171,8 @@ class MikroTikUserManager:
                 logger.error("Profile creation failed: No response received.")
                 return None
             return response
+        except MikroTikUnavailable:
+            raise
         except RuntimeError as e:
             logger.error(f"Error creating profile: {e}")
             return None  # Ensure a None response if there's an error
@@ -152,8 +185,9 @@ class MikroTikUserManager:
         return self._request('DELETE', f'rest/user-manager/profile/{profile_id}')
 
     # ------------------------------------------------ user profiles
-    def get_user_profiles(self) -> List[Dict[str, Any]]:
-        return self._request('GET', 'rest/user-manager/user-profile') or []
+    def get_user_profiles(self, decoder: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Any]:
+        """All user profiles; ``decoder`` converts each row as it is parsed (see ``routeros``)."""
+        return self._request('GET', 'rest/user-manager/user-profile', object_hook=decoder) or []
     
     def get_user_profile(self, user_profile_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -161,6 +195,8 @@ class MikroTikUserManager:
         """
         try:
             return self._request('GET', f'rest/user-manager/user-profile/{user_profile_id}')
+        except MikroTikUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error retrieving user profile '{user_profile_id}': {e}")
             raise RuntimeError(f"Error retrieving user profile '{user_profile_id}': {e}")
@@ -258,8 +294,9 @@ class MikroTikUserManager:
             raise RuntimeError(f"Error deleting payment '{payment_id}': {e}")
 
     # ------------------------------------------------ session
-    def get_sessions(self) -> List[Dict[str, Any]]:
-        return self._request('GET', 'rest/user-manager/session') or []
+    def get_sessions(self, decoder: Optional[Callable[[Dict[str, Any]], Any]] = None) -> List[Any]:
+        """All sessions; ``decoder`` converts each row as it is parsed (see ``routeros``)."""
+        return self._request('GET', 'rest/user-manager/session', object_hook=decoder) or []
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -289,3 +326,39 @@ def init_mikrotik_manager():
         router_password=settings.ROUTER_PASSWORD
     )
 
+
+# One client per router per process, created on first use. Clients made before a
+# Celery/gunicorn fork are never reused in the child, so no socket is shared across processes.
+_managers: Dict[str, MikroTikUserManager] = {}
+_managers_pid: Optional[int] = None
+_managers_lock = threading.Lock()
+
+
+def get_mikrotik_manager(router_ip: Optional[str] = None) -> MikroTikUserManager:
+    """
+    Return this process's pooled client for a router (the configured router by default).
+    """
+    global _managers_pid
+    router_ip = router_ip or settings.ROUTER_IP
+    with _managers_lock:
+        if _managers_pid != os.getpid():
+            _managers.clear()
+            _managers_pid = os.getpid()
+        manager = _managers.get(router_ip)
+        if manager is None:
+            manager = MikroTikUserManager(
+                router_ip=router_ip,
+                router_username=settings.ROUTER_USERNAME,
+                router_password=settings.ROUTER_PASSWORD
+            )
+            _managers[router_ip] = manager
+        return manager
+
+
+def reset_mikrotik_managers():
+    """Drop every cached client of this process (e.g. after the router credentials change)."""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.session.close()
+        _managers.clear()
+
@@ -5,13 +5,65 @@
 
 # mpi_src/usermanager/models.py
 import uuid
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 
 MAX_LEN = 67
 
-class User(AbstractUser):
+
+class MikroTikSynced(models.Model):
+    """
+    Sync markers for rows mirrored on the router.
+
+    ``local_version`` is bumped by every local edit and ``synced_version`` records the last
+    local version the router acknowledged, so ``local_version > synced_version`` means a
+    local edit is still on its way to the router. ``router_fingerprint`` is a hash of the
+    router-side state last applied or pushed, so a pull can tell whether the router changed.
+    """
+    SYNC_FIELDS = ()  # fields mirrored on the router, in the order they are fingerprinted
+
+    local_version = models.PositiveIntegerField(_('local version'), default=0, editable=False)
+    synced_version = models.PositiveIntegerField(_('synced version'), default=0, editable=False)
+    router_fingerprint = models.CharField(_('router fingerprint'), max_length=32, blank=True, null=True, editable=False)
+    # Lease used by usermanager.locking where the database cannot SKIP LOCKED
+    lease_owner = models.CharField(_('lease owner'), max_length=32, blank=True, null=True, editable=False)
+    lease_until = models.DateTimeField(_('lease until'), blank=True, null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Rows written by the router pull set _from_router; everything else is a local edit.
+        update_fields = kwargs.get('update_fields')
+        touches_router = update_fields is None or set(update_fields) & set(self.SYNC_FIELDS)
+        if not getattr(self, '_from_router', False) and touches_router:
+            self.local_version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'local_version'}
+        if touches_router:
+            derived = self.materialise({name: getattr(self, name) for name in self.SYNC_FIELDS})
+            for field, value in derived.items():
+                setattr(self, field, value)
+            if derived and kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | set(derived)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def materialise(cls, values):
+        """
+        Columns derived from router-mirrored ``values`` (e.g. a status enum), so they can be
+        filtered and indexed. Kept in step by save() and by the sync's bulk updates.
+        """
+        return {}
+
+    @property
+    def has_local_changes(self):
+        return self.local_version > self.synced_version
+
+
+class User(AbstractUser, MikroTikSynced):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     mikrotik_id = models.CharField(max_length=20, unique=True, blank=True, null=True)  # Field to store MikroTik ID
     name = models.CharField(_('name'), max_length=MAX_LEN, unique=True, blank=True, null=True)
@@ -27,6 +79,7 @@ class User(AbstractUser):
     created  = models.DateTimeField(_('created'), auto_now_add=True, null=True, db_index=True, )
     modified = models.DateTimeField(_('modified'), auto_now=True, null=True)
 
+    SYNC_FIELDS = ('group', 'disabled', 'otp_secret', 'shared_users', 'plain_password')
 
     def save(self, *args, **kwargs):
         if self.password and not self.plain_password:
@@ -40,7 +93,7 @@ class User(AbstractUser):
         return self.username
 
 
-class Profile(models.Model):
+class Profile(MikroTikSynced):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     mikrotik_id = models.CharField(max_length=20, unique=True, blank=True, null=True)  # Field to store MikroTik ID
     name = models.CharField(_('name'), max_length=MAX_LEN, unique=True)
@@ -53,6 +106,8 @@ class Profile(models.Model):
     created  = models.DateTimeField(_('created'), auto_now_add=True, null=True, db_index=True, )
     modified = models.DateTimeField(_('modified'), auto_now=True, null=True)
 
+    SYNC_FIELDS = ('name_for_users', 'price', 'starts_when', 'validity', 'override_shared_users')
+
     class meta:
         ordering = '-mikrotik_id'
 
@@ -60,29 +115,53 @@ class Profile(models.Model):
         return f"{self.name_for_users} - {self.price} - {self.validity}"
 
 
-class UserProfile(models.Model):
+class UserProfile(MikroTikSynced):
+    class Lifecycle(models.TextChoices):
+        ACTIVE = 'active', _('Active')  # time and data not finished
+        DATA_EXHAUSTED = 'data_exhausted', _('Data Exhausted')  # router state 'running'
+        TIME_ELAPSED = 'time_elapsed', _('Time Elapsed')  # router state 'used'; may or may not have data
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     mikrotik_id = models.CharField(max_length=20, unique=True, blank=True, null=True)  # Field to store MikroTik ID
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE)
     state = models.CharField(_('state'), max_length=MAX_LEN, blank=True, null=True)
-    end_time = models.CharField(_('end time'), max_length=MAX_LEN, blank=True, null=True)
-    created  = models.DateTimeField(_('created'), auto_now_add=True, null=True, db_index=True, )
+    end_time = models.DateTimeField(_('end time'), blank=True, null=True, db_index=True)  # None: unlimited
+    lifecycle = models.CharField(_('lifecycle'), max_length=20, choices=Lifecycle.choices, default=Lifecycle.ACTIVE, db_index=True)
+    created  = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)  # keyset pagination orders by it
     modified = models.DateTimeField(_('modified'), auto_now=True, null=True)
 
+    SYNC_FIELDS = ('state', 'end_time')
+
     class Meta:
         ordering = ['-mikrotik_id']
+        indexes = [
+            # dashboard: a user's running profiles, and their most recent ones
+            models.Index(fields=['user', 'state', '-mikrotik_id'], name='userprofile_user_state_idx'),
+            models.Index(fields=['user', '-end_time'], name='userprofile_user_end_idx'),
+            # keyset pagination of the user profile list
+            models.Index(fields=['-created', '-id'], name='userprofile_created_idx'),
+            models.Index(fields=['user', '-created', '-id'], name='userprofile_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.profile.name} - {self.state} - {self.end_time}"
     
+    @classmethod
+    def lifecycle_for_state(cls, state):
+        """Map a RouterOS user-profile state to its lifecycle."""
+        if state == 'used':
+            return cls.Lifecycle.TIME_ELAPSED
+        if state == 'running':
+            return cls.Lifecycle.DATA_EXHAUSTED
+        return cls.Lifecycle.ACTIVE
+
+    @classmethod
+    def materialise(cls, values):
+        return {'lifecycle': cls.lifecycle_for_state(values.get('state'))}
+
     def get_state(self):
-        if self.state == 'used': # time has ended, may or may not have data
-            return 'Time Elapsed'
-        elif self.state == 'running':
-            return 'Data Exhausted' # data has finished
-        else:
-            return 'Active' # time and data not finished
+        return self.get_lifecycle_display()
 
 
 class Payment(models.Model):
@@ -95,6 +174,7 @@ class Payment(models.Model):
         ('pending', 'Pending'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('flagged', 'Flagged'),  # charged something other than the price; left to a human
     ]
 
     METHOD_CHOICES = [
@@ -105,7 +185,7 @@ class Payment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     mikrotik_id = models.CharField(max_length=20, unique=True, blank=True, null=True)  # Field to store MikroTik ID
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, null=True, blank=True)  # set once granted
     profile = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, blank=True)
     copy_from = models.CharField(max_length=MAX_LEN, choices=COPY_FROM_CHOICES)
     method = models.CharField(max_length=MAX_LEN, choices=METHOD_CHOICES, default='OFFLINE')
@@ -115,10 +195,21 @@ class Payment(models.Model):
     user_message = models.TextField(null=True, blank=True)
     currency = models.CharField(max_length=MAX_LEN, default="GHS")
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    paystack_reference = models.CharField(max_length=100, null=True, blank=True)
+    paystack_reference = models.CharField(max_length=100, unique=True, null=True, blank=True)  # one payment per charge
+    # The reference a duplicate payment carried before the reference became unique
+    duplicate_of_reference = models.CharField(max_length=100, null=True, blank=True)
 
-    class meta:
-        ordering = '-trans_end'
+    class Meta:
+        ordering = ['-trans_end']
+        indexes = [
+            # dashboard and payment list: a user's payments, newest first
+            models.Index(fields=['user', '-trans_end'], name='payment_user_trans_end_idx'),
+            # admin list filtered by status
+            models.Index(fields=['trans_status', '-trans_end'], name='payment_status_trans_end_idx'),
+            # keyset pagination of the payment list (trans_end is NULL while pending)
+            models.Index(fields=['-trans_start', '-id'], name='payment_trans_start_idx'),
+            models.Index(fields=['user', '-trans_start', '-id'], name='payment_user_trans_start_idx'),
+        ]
 
     def __str__(self):
         return f"Payment for {self.user_profile} - {self.method} ({self.trans_status})"
@@ -135,27 +226,48 @@ class Session(models.Model):
     user_address = models.GenericIPAddressField(_('User Address'))
     download = models.BigIntegerField(_('Download'))
     upload = models.BigIntegerField(_('Upload'))
-    uptime = models.CharField(_('Uptime'), max_length=MAX_LEN)
+    uptime = models.DurationField(_('Uptime'), default=timedelta(0))
     status = models.CharField(_('Status'), max_length=MAX_LEN)
     started = models.DateTimeField(_('Started'))
     ended = models.DateTimeField(_('Ended'), null=True, blank=True)
     last_accounting_packet = models.DateTimeField(_('Last Accounting Packet'), null=True, blank=True)
     terminate_cause = models.CharField(_('Terminate Cause'), max_length=MAX_LEN, blank=True, null=True)
+    is_open = models.BooleanField(_('open'), default=True)  # materialised from status and ended
 
-    class meta:
-        ordering = '-session_id'
+    CLOSED_STATUSES = {'stop', 'close-acked', 'expired'}
+
+    class Meta:
+        ordering = ['-session_id']
+        indexes = [
+            models.Index(fields=['user', '-session_id'], name='session_user_idx'),
+            # open sessions are a small slice of the table; index only those
+            models.Index(
+                fields=['user', '-session_id'], name='session_user_open_idx',
+                condition=models.Q(is_open=True),
+            ),
+            # keyset pagination of the session list, unfiltered or by user or NAS
+            models.Index(fields=['-started', '-id'], name='session_started_idx'),
+            models.Index(fields=['user', '-started', '-id'], name='session_user_started_idx'),
+            models.Index(fields=['nas_ip_address', '-started', '-id'], name='session_nas_started_idx'),
+        ]
 
     def __str__(self):
         return f"Session {self.session_id} for {self.user.username}"
 
+    @classmethod
+    def status_is_open(cls, status, ended):
+        """RouterOS reports a session's status as comma-separated flags, e.g. 'start,interim,stop'."""
+        return ended is None and not cls.CLOSED_STATUSES & set((status or '').split(','))
+
+    def save(self, *args, **kwargs):
+        self.is_open = self.status_is_open(self.status, self.ended)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'ended'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'is_open'}
+        super().save(*args, **kwargs)
+
     def get_session_status(self):
-        closed_statuses = {'stop', 'close-acked', 'expired'}
-        # Split the status string by commas
-        statuses = set(self.status.split(','))  # Convert to set for efficient membership testing
-        if closed_statuses & statuses:  # Check if there is any intersection
-            return 'Closed'
-        else:
-            return 'Running'
+        return 'Running' if self.is_open else 'Closed'
         
     def get_terminate_cause(self):
         if self.terminate_cause == 'Admin Reset':
@@ -163,11 +275,209 @@ class Session(models.Model):
         
     def session_traffic(self):
         return self.download + self.upload
-    
+
+
+class DailyUsage(models.Model):
+    """
+    Traffic of closed sessions rolled up per user, day and NAS once they pass the
+    retention window (see usermanager/usage.py). The raw Session rows are deleted.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField(_('date'))
+    nas_ip_address = models.CharField(_('NAS IP Address'), max_length=45, blank=True, default='')
+    download = models.BigIntegerField(_('Download'), default=0)
+    upload = models.BigIntegerField(_('Upload'), default=0)
+    sessions = models.PositiveIntegerField(_('sessions'), default=0)
+    uptime = models.DurationField(_('Uptime'), default=timedelta(0))
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'nas_ip_address'], name='unique_daily_usage'),
+        ]
+        verbose_name_plural = 'daily usage'
+
+    def __str__(self):
+        return f"{self.user.username} on {self.date}: {self.download + self.upload} bytes"
+
+    def traffic(self):
+        return self.download + self.upload
+
+
+class ClosedDay(models.Model):
+    """
+    A day whose revenue and traffic rollups have been materialised; reports read such days
+    from the rollup tables and never recompute them (see usermanager/reporting.py).
+    """
+    date = models.DateField(_('date'), unique=True)
+    closed_at = models.DateTimeField(_('closed at'), auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Closed {self.date}"
+
+
+class RevenueRollup(models.Model):
+    """Completed payments of one closed day per plan and currency."""
+    date = models.DateField(_('date'))
+    plan = models.CharField(_('plan'), max_length=MAX_LEN, blank=True, default='')  # '' for payments without one
+    currency = models.CharField(_('currency'), max_length=MAX_LEN, default='GHS')
+    payments = models.PositiveIntegerField(_('payments'), default=0)
+    revenue = models.DecimalField(_('revenue'), max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'plan']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'plan', 'currency'], name='unique_revenue_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.plan or '-'} on {self.date}: {self.revenue} {self.currency}"
+
+
+class TrafficRollup(models.Model):
+    """Traffic of one closed day per user, whichever session tier it came from."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField(_('date'))
+    download = models.BigIntegerField(_('Download'), default=0)
+    upload = models.BigIntegerField(_('Upload'), default=0)
+    sessions = models.PositiveIntegerField(_('sessions'), default=0)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_traffic_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'user'], name='traffic_rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} on {self.date}: {self.download + self.upload} bytes"
+
+
+class UserStats(models.Model):
+    """
+    Running usage and billing totals per user, kept up to date from sync and payment
+    deltas and periodically recomputed from history (see usermanager/stats.py).
+    A cycle starts at the user's latest completed payment.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    cycle_start = models.DateTimeField(_('cycle start'), null=True, blank=True)
+    cycle_bytes = models.BigIntegerField(_('bytes this cycle'), default=0)
+    lifetime_bytes = models.BigIntegerField(_('lifetime bytes'), default=0)
+    active_sessions = models.IntegerField(_('active sessions'), default=0)
+    last_payment_at = models.DateTimeField(_('last payment'), null=True, blank=True)
+    last_payment_amount = models.DecimalField(_('last payment amount'), max_digits=10, decimal_places=2, null=True, blank=True)
+    total_paid = models.DecimalField(_('total paid'), max_digits=12, decimal_places=2, default=0)
+    recomputed = models.DateTimeField(_('recomputed'), null=True, blank=True)
+    modified = models.DateTimeField(_('modified'), auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'user stats'
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
+
+
+class TrafficSeries(models.Model):
+    """
+    Counter samples of one session over one bucket (an hour, or a day at hourly
+    resolution), stored as delta-encoded arrays rather than a row per sample.
+    ``samples`` is ``{"t": [...], "d": [...], "u": [...]}``: seconds since the previous
+    sample (the first since ``bucket``) and bytes downloaded/uploaded since the previous
+    sample. See usermanager/traffic.py.
+    """
+    RAW = 0
+    FIVE_MINUTES = 300
+    HOURLY = 3600
+    RESOLUTION_CHOICES = [
+        (RAW, 'Raw'),
+        (FIVE_MINUTES, '5 minutes'),
+        (HOURLY, '1 hour'),
+    ]
+
+    session_id = models.CharField(_('Session ID'), max_length=MAX_LEN)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    nas_ip_address = models.CharField(_('NAS IP Address'), max_length=45, blank=True, default='')
+    resolution = models.PositiveIntegerField(_('resolution'), choices=RESOLUTION_CHOICES, default=RAW)
+    bucket = models.DateTimeField(_('bucket'))
+    samples = models.JSONField(_('samples'), default=dict)
+    # Counters at the last sample, so the next sample can be stored as a delta
+    last_at = models.DateTimeField(_('last sample'), null=True, blank=True)
+    last_download = models.BigIntegerField(_('last download counter'), default=0)
+    last_upload = models.BigIntegerField(_('last upload counter'), default=0)
+
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['session_id', 'resolution', 'bucket'], name='unique_traffic_bucket'),
+        ]
+        indexes = [
+            # bandwidth graphs: one range read per user or per NAS
+            models.Index(fields=['user', 'bucket'], name='traffic_user_bucket_idx'),
+            models.Index(fields=['nas_ip_address', 'bucket'], name='traffic_nas_bucket_idx'),
+            # downsampling picks old rows of one resolution
+            models.Index(fields=['resolution', 'bucket'], name='traffic_resolution_bucket_idx'),
+        ]
+        verbose_name_plural = 'traffic series'
+
+    def __str__(self):
+        return f"{self.session_id} @ {self.bucket} ({self.get_resolution_display()})"
+
+
+class PendingPush(models.Model):
+    """
+    A Django -> MikroTik push that could not be delivered because the router was
+    unreachable. Kept one row per (router, object), so the backlog is compacted to
+    the latest desired state and replayed once the router answers again.
+    """
+    MODEL_CHOICES = [
+        ('user', 'User'),
+        ('profile', 'Profile'),
+        ('user_profile', 'User Profile'),
+    ]
+
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    router = models.CharField(_('router'), max_length=256)
+    model = models.CharField(_('model'), max_length=MAX_LEN, choices=MODEL_CHOICES)
+    object_id = models.UUIDField(_('object ID'))
+    action = models.CharField(_('action'), max_length=MAX_LEN, choices=ACTION_CHOICES)
+    # A delete outlives its row: the router's ID is all that is left to delete by
+    mikrotik_id = models.CharField(_('MikroTik ID'), max_length=20, blank=True, null=True)
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    last_error = models.TextField(_('last error'), blank=True, null=True)
+    created  = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
+    modified = models.DateTimeField(_('modified'), auto_now=True)
+
+    class Meta:
+        ordering = ['created']
+        constraints = [
+            models.UniqueConstraint(fields=['router', 'model', 'object_id'], name='unique_pending_push_per_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id} on {self.router}"
+
 
 
 # Avoid importing tasks at the top. Use signals or inline imports when needed.
 def trigger_mikrotik_tasks(instance, created, **kwargs):
+    # Rows written by the router pull are already in the router's state; echoing them
+    # back would only start another round trip.
+    if getattr(instance, '_from_router', False):
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(update_fields) & set(instance.SYNC_FIELDS):
+        return  # e.g. last_login on sign-in
+
     # Import tasks locally to avoid circular import
     from usermanager.tasks import (
         create_user_in_mikrotik, update_user_in_mikrotik, delete_user_in_mikrotik,
@@ -176,33 +486,67 @@ def trigger_mikrotik_tasks(instance, created, **kwargs):
     )
 
     if isinstance(instance, User):
-        if created:
-            create_user_in_mikrotik.delay(instance.id)
-        else:
-            update_user_in_mikrotik.delay(instance.id)
+        task = create_user_in_mikrotik if created else update_user_in_mikrotik
     elif isinstance(instance, Profile):
-        if created:
-            create_profile_in_mikrotik.delay(instance.id)
-        else:
-            update_profile_in_mikrotik.delay(instance.id)
+        task = create_profile_in_mikrotik if created else update_profile_in_mikrotik
     elif isinstance(instance, UserProfile):
-        if created:
-            create_user_profile_in_mikrotik.delay(instance.id)
-        else:
-            update_user_profile_in_mikrotik.delay(instance.id)
+        task = create_user_profile_in_mikrotik if created else update_user_profile_in_mikrotik
+    else:
+        return
+
+    # Enqueue only once the row is committed, otherwise the worker can run before
+    # the transaction lands, miss the row and drop the change.
+    # (id, local_version) is the push's idempotency key.
+    object_id, version = instance.id, instance.local_version
+    transaction.on_commit(lambda: task.delay(object_id, version))
 
 # Example signal setup to trigger MikroTik tasks when models are saved
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
 def trigger_user_tasks(sender, instance, created, **kwargs):
     trigger_mikrotik_tasks(instance, created, **kwargs)
 
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=UserProfile)
+def trigger_mikrotik_delete(sender, instance, **kwargs):
+    if getattr(instance, '_from_router', False):
+        return
+    from usermanager.tasks import delete_user_in_mikrotik, delete_profile_in_mikrotik, delete_user_profile_in_mikrotik
+
+    task = {
+        User: delete_user_in_mikrotik, Profile: delete_profile_in_mikrotik, UserProfile: delete_user_profile_in_mikrotik,
+    }[sender]
+    # The row is gone by the time the task runs, so it carries the router's ID along
+    object_id, mikrotik_id = instance.id, instance.mikrotik_id
+    transaction.on_commit(lambda: task.delay(object_id, mikrotik_id=mikrotik_id))
+
 @receiver(post_save, sender=Profile)
 def trigger_profile_tasks(sender, instance, created, **kwargs):
     trigger_mikrotik_tasks(instance, created, **kwargs)
 
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_plan_catalogue(sender, instance, **kwargs):
+    from usermanager.catalogue import invalidate_catalogue
+    invalidate_catalogue()
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_revenue_reports(sender, instance, **kwargs):
+    from usermanager.reporting import invalidate_reports
+    invalidate_reports('revenue')
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def touch_api_resources(sender, instance, **kwargs):
+    from usermanager.api import touch_resources
+    touch_resources(instance.user_id, 'payments' if sender is Payment else 'plan')
+
 @receiver(post_save, sender=UserProfile)
 def trigger_user_profile_tasks(sender, instance, created, **kwargs):
     trigger_mikrotik_tasks(instance, created, **kwargs)
\ No newline at end of file
@@ -0,0 +1,133 @@
+# mpi_src/usermanager/pagination.py
+"""
+Keyset (cursor) pagination for the large list views.
+
+A page is fetched as "the next ``per_page`` rows after the last one shown", in an
+ordering backed by an index and ending in a unique column, so every page costs the
+same index range scan however deep it is and however big the table grows. There is no
+``COUNT(*)`` and no ``OFFSET``: pages only know whether there is a next/previous one.
+
+Ordering fields must not be NULL; the cursor is the ordering values of the boundary row,
+url-safe base64 JSON, and is opaque to templates.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+NEXT, PREVIOUS = 'n', 'p'
+
+
+def encode_cursor(values, direction=NEXT):
+    # str() rather than DjangoJSONEncoder: it keeps full microseconds, which the comparison needs
+    raw = json.dumps({'d': direction, 'v': values}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    """``(direction, values)`` of a cursor; ValueError when it is malformed or tampered with."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, raw = data['d'], data['v']
+        if direction not in (NEXT, PREVIOUS) or len(raw) != len(ordering):
+            raise ValueError('cursor does not match the ordering')
+        fields = [model._meta.get_field(name.lstrip('-')) for name in ordering]
+        return direction, [field.to_python(value) for field, value in zip(fields, raw)]
+    except (TypeError, KeyError, ValidationError, json.JSONDecodeError) as e:
+        raise ValueError(f'invalid cursor: {e}')
+
+
+def _reverse(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+def _after(ordering, values):
+    """
+    Rows strictly after ``values`` in ``ordering``. Written as ``a <= x AND (a < x OR
+    (a = x AND ...))`` so the leading column bounds the index range scan.
+    """
+    name = ordering[0].lstrip('-')
+    op = 'lt' if ordering[0].startswith('-') else 'gt'
+    if len(ordering) == 1:
+        return Q(**{f'{name}__{op}': values[0]})
+    return Q(**{f'{name}__{op}e': values[0]}) & (
+        Q(**{f'{name}__{op}': values[0]}) | (Q(**{name: values[0]}) & _after(ordering[1:], values[1:]))
+    )
+
+
+def keyset_queryset(queryset, ordering, cursor=None):
+    """``queryset`` in ``ordering``, starting after ``cursor``; ``(direction, queryset)``."""
+    if not cursor:
+        return NEXT, queryset.order_by(*ordering)
+    direction, values = decode_cursor(queryset.model, ordering, cursor)
+    if direction == PREVIOUS:
+        return direction, queryset.filter(_after(_reverse(ordering), values)).order_by(*_reverse(ordering))
+    return direction, queryset.filter(_after(ordering, values)).order_by(*ordering)
+
+
+class KeysetPage:
+    """The rows of one page plus the cursors to its neighbours; quacks like ``Page`` for templates."""
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, obj, direction):
+        values = [getattr(obj, obj._meta.get_field(name.lstrip('-')).attname) for name in self.ordering]
+        return encode_cursor(values, direction)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.object_list[-1], NEXT) if self._has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.object_list[0], PREVIOUS) if self._has_previous and self.object_list else None
+
+
+def keyset_page(queryset, ordering, per_page, cursor=None):
+    """One page of ``queryset``: a single LIMIT query, one row more than shown to detect a next page."""
+    direction, queryset = keyset_queryset(queryset, ordering, cursor)
+    rows = list(queryset[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREVIOUS:
+        rows.reverse()
+        return KeysetPage(rows, ordering, has_next=True, has_previous=more)
+    return KeysetPage(rows, ordering, has_next=more, has_previous=bool(cursor))
+
+
+class KeysetPaginationMixin:
+    """
+    ``ListView`` pagination by cursor (``?cursor=``) over ``keyset_ordering`` instead of
+    page numbers. Templates get ``page_obj.next_cursor`` / ``page_obj.previous_cursor``.
+    """
+    keyset_ordering = ('-id',)
+    paginate_by = 50
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = keyset_page(queryset, self.keyset_ordering, page_size, self.request.GET.get(self.cursor_kwarg))
+        except ValueError as e:
+            raise Http404(f'Invalid page: {e}')
+        return None, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,143 @@
+# mpi_src/usermanager/payments.py
+"""
+Idempotent fulfilment of Paystack payments.
+
+Checkout records a ``pending`` payment with the price the customer was quoted. The
+charge can then be reported several times: by the ``charge.success`` webhook (which
+Paystack retries until it gets a 2xx), by the customer's browser returning to
+``VerifyPaymentView``, by redeliveries of the Celery task and by reconciliation.
+``paystack_reference`` is unique, so whichever report arrives first settles the payment
+and grants the plan; every later one finds it settled and does nothing. A charge that
+does not match the quoted price is recorded as ``flagged`` and grants nothing.
+"""
+import hmac
+import hashlib
+import json
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, User, UserProfile
+from usermanager.stats import apply_payment
+from usermanager.dashboard import refresh_dashboard
+
+logger = logging.getLogger(__name__)
+
+
+def signature_is_valid(secret_key, body, signature):
+    """Paystack signs the raw webhook body with HMAC-SHA512 of the secret key."""
+    if not secret_key or not signature:
+        return False
+    expected = hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class AmountMismatch(ValueError):
+    """The gateway charged something other than the plan's price; the plan is not granted."""
+
+
+def charge_metadata(charge):
+    """The metadata of a Paystack transaction; Paystack hands it back as given (dict, JSON or empty)."""
+    metadata = charge.get('metadata')
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def expected_amount(profile):
+    """What the plan costs in the currency's subunit, as Paystack reports amounts."""
+    return int(profile.price * 100)
+
+
+def quoted_amount(reference, profile):
+    """
+    What the portal asked Paystack to charge for ``reference``: the price recorded when
+    checkout started, or the plan's current price for a charge with no payment. None once
+    the charge was flagged: nothing matches it.
+    """
+    payment = Payment.objects.filter(paystack_reference=reference).values('price', 'trans_status').first()
+    if payment is None:
+        return expected_amount(profile)
+    return None if payment['trans_status'] == 'flagged' else int(payment['price'] * 100)
+
+
+def record_pending_payment(reference, user, profile):
+    """Record the checkout of ``profile`` at its current price, before the customer pays."""
+    return Payment.objects.create(
+        user=user, profile=profile, method='ONLINE', trans_start=timezone.now(),
+        trans_status='pending', price=profile.price, paystack_reference=reference,
+    )
+
+
+def _flag(payment, reference, user, profile, amount, expected):
+    """Keep a record of a charge that does not match its price, so it is flagged once."""
+    message = f"Paystack charged {amount} for {profile.name}, expected {expected}"
+    if payment is not None:
+        Payment.objects.filter(pk=payment.pk, trans_status='pending').update(
+            trans_status='flagged', trans_end=timezone.now(), user_message=message,
+        )
+    else:
+        try:
+            with transaction.atomic():
+                Payment.objects.create(
+                    user=user, profile=profile, method='ONLINE', trans_start=timezone.now(),
+                    trans_end=timezone.now(), trans_status='flagged', user_message=message,
+                    price=(Decimal(amount) / 100).quantize(Decimal('0.01')), paystack_reference=reference,
+                )
+        except IntegrityError:
+            pass  # a concurrent report recorded it
+    return message
+
+
+def fulfil_payment(reference, user_id, profile_id, amount):
+    """
+    Settle the payment ``reference`` of ``amount`` (in pesewas) and grant the plan; the
+    pending payment from checkout is completed, or a payment is recorded if there is none.
+    Returns ``(payment, created)``; ``created`` is False when it was already settled.
+    Raises ``AmountMismatch``, after flagging the payment, instead of granting a plan that
+    was not paid at the quoted price.
+    """
+    existing = Payment.objects.filter(paystack_reference=reference).select_related('user', 'profile').first()
+    if existing and existing.trans_status != 'pending':
+        return existing, False
+
+    if existing:
+        user, profile = existing.user, existing.profile or Profile.objects.get(id=profile_id)
+        expected = int(existing.price * 100)
+    else:
+        profile = Profile.objects.get(id=profile_id)
+        user = User.objects.get(id=user_id)
+        expected = expected_amount(profile)
+    if int(amount) != expected:
+        raise AmountMismatch(_flag(existing, reference, user, profile, amount, expected))
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            if existing:
+                payment = Payment.objects.select_for_update().filter(pk=existing.pk, trans_status='pending').first()
+                if payment is None:
+                    return Payment.objects.get(pk=existing.pk), False  # settled concurrently
+            else:
+                payment = Payment(
+                    user=user, profile=profile, method='ONLINE', trans_start=now,
+                    price=(Decimal(amount) / 100).quantize(Decimal('0.01')), paystack_reference=reference,
+                )
+            # Every payment is a new assignment of the plan, renewals included (the router
+            # keeps one user-profile row per assignment); its post_save pushes it there.
+            payment.user_profile = UserProfile.objects.create(user=user, profile=profile)
+            payment.trans_status, payment.trans_end = 'completed', now
+            payment.save()
+    except IntegrityError:
+        # A concurrent report of the same reference won the unique index
+        return Payment.objects.get(paystack_reference=reference), False
+
+    apply_payment(payment)
+    refresh_dashboard(user.pk)
+    logger.info(f"Fulfilled payment {reference} for {user.username}: {profile.name}")
+    return payment, True
@@ -0,0 +1,140 @@
+# mpi_src/usermanager/paystack_client.py
+"""
+Paystack API client.
+
+One pooled keep-alive ``requests.Session`` per process with strict connect/read timeouts,
+so a slow gateway fails a payment request in seconds instead of holding a worker, and a
+burst of purchases reuses a handful of connections. ``AsyncPaystackClient`` runs the
+same calls in worker threads for the async views, keeping the ASGI event loop free while
+Paystack answers. ``PAYSTACK_BASE_URL`` points it at a stand-in gateway for testing.
+"""
+import datetime
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PaystackError(RuntimeError):
+    """Paystack refused the request; ``status`` and ``details`` carry its answer."""
+
+    def __init__(self, message: str, status: int = 502, details: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class PaystackUnavailable(PaystackError):
+    """Raised when Paystack cannot be reached or does not answer in time."""
+
+
+class PaystackClient:
+    def __init__(self, secret_key: str, base_url: str = 'https://api.paystack.co',
+                 timeout: Tuple[float, float] = (3, 10), pool_size: int = 10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout  # (connect, read) seconds
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {secret_key}',
+            'Content-Type': 'application/json',
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None,
+                 params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The whole response body (``status``, ``message``, ``data`` and, for listings, ``meta``)."""
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        try:
+            response = self.session.request(method=method, url=url, json=data, params=params, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            logger.error(f"Paystack unreachable: {e}")
+            raise PaystackUnavailable(f"Paystack unreachable: {e}", status=504)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Paystack request exception: {e}")
+            raise PaystackError(f"Paystack request exception: {e}")
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {'message': response.text}
+        if not response.ok or not body.get('status', False):
+            logger.error(f"Paystack error {response.status_code} on {endpoint}: {body}")
+            raise PaystackError(body.get('message', 'Paystack error'), status=response.status_code, details=body)
+        return body
+
+    def initialize_transaction(self, email: str, amount: int, reference: str, callback_url: str,
+                               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Start a checkout; ``amount`` is in the currency's subunit (pesewas/kobo).
+        ``metadata`` comes back with the transaction, webhook events included.
+        """
+        data = {'email': email, 'amount': amount, 'reference': reference, 'callback_url': callback_url}
+        if metadata:
+            data['metadata'] = metadata
+        return self._request('POST', 'transaction/initialize', data).get('data') or {}
+
+    def verify_transaction(self, reference: str) -> Dict[str, Any]:
+        return self._request('GET', f'transaction/verify/{reference}').get('data') or {}
+
+    def list_transactions(self, since: datetime.datetime, until: datetime.datetime,
+                          page: int = 1, per_page: int = 100) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """One page of the transactions created in ``[since, until]``, and the paging ``meta``."""
+        body = self._request('GET', 'transaction', params={
+            'from': since.isoformat(), 'to': until.isoformat(), 'page': page, 'perPage': per_page,
+        })
+        return body.get('data') or [], body.get('meta') or {}
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncPaystackClient:
+    """The same calls, awaitable; each runs in a worker thread off the event loop."""
+
+    def __init__(self, client: PaystackClient):
+        self.client = client
+
+    async def initialize_transaction(self, *args, **kwargs) -> Dict[str, Any]:
+        return await sync_to_async(self.client.initialize_transaction, thread_sensitive=False)(*args, **kwargs)
+
+    async def verify_transaction(self, reference: str) -> Dict[str, Any]:
+        return await sync_to_async(self.client.verify_transaction, thread_sensitive=False)(reference)
+
+
+# One client per configuration per process, created on first use (see get_mikrotik_manager)
+_clients: Dict[tuple, PaystackClient] = {}
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+
+
+def get_paystack_client() -> PaystackClient:
+    """Return this process's pooled Paystack client for the current settings."""
+    global _clients_pid
+    key = (settings.PAYSTACK_BASE_URL, settings.PAYSTACK_SECRET_KEY)
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = PaystackClient(
+                secret_key=settings.PAYSTACK_SECRET_KEY or '',
+                base_url=settings.PAYSTACK_BASE_URL,
+                timeout=(settings.PAYSTACK_CONNECT_TIMEOUT, settings.PAYSTACK_READ_TIMEOUT),
+                pool_size=settings.PAYSTACK_POOL_SIZE,
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_paystack_client() -> AsyncPaystackClient:
+    return AsyncPaystackClient(get_paystack_client())
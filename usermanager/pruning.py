@@ -0,0 +1,144 @@
+# mpi_src/usermanager/pruning.py
+"""
+Retention and pruning in small, resumable batches.
+
+Each target selects the rows past its retention (``PRUNE_RETENTION_DAYS``) and deletes
+them by primary key, ``PRUNE_CHUNK_SIZE`` rows per transaction with a pause
+(``PRUNE_CHUNK_SLEEP``) in between, so no single statement holds locks for long and
+web requests and syncs get the database in between. A run's cutoff is checkpointed in
+the cache, so an interrupted run is finished with the same cutoff it started with.
+Old sessions are not a target here: archival (usage.archive_sessions) rolls them into
+daily usage under ``SESSION_RETENTION_DAYS``.
+"""
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from usermanager.models import (
+    DailyUsage, Payment, PendingPush, Profile, Session, TrafficRollup, TrafficSeries, User, UserProfile, UserStats,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TIMEOUT = 7 * 86400
+
+# ``rows(cutoff)`` selects what is past retention; ``delete(ids)`` removes one chunk
+Target = namedtuple('Target', 'model rows delete')
+
+PENDING_PUSH_MODELS = {'user': User, 'profile': Profile, 'user_profile': UserProfile}
+
+
+def _plain_delete(model):
+    return lambda ids: model.objects.filter(pk__in=ids).delete()[0]
+
+
+def _orphaned_pushes(cutoff):
+    """Parked creates/updates of objects deleted since; nothing is left to push."""
+    orphaned = Q()
+    for name, model in PENDING_PUSH_MODELS.items():
+        orphaned |= Q(model=name) & ~Q(object_id__in=model.objects.values('pk'))
+    return PendingPush.objects.exclude(action='delete').filter(orphaned)
+
+
+TARGETS = {
+    'traffic': Target(
+        TrafficSeries, lambda cutoff: TrafficSeries.objects.filter(bucket__lt=cutoff), _plain_delete(TrafficSeries),
+    ),
+    'daily_usage': Target(
+        DailyUsage, lambda cutoff: DailyUsage.objects.filter(date__lt=cutoff.date()), _plain_delete(DailyUsage),
+    ),
+    # Completed payments are accounting records and flagged ones wait for a human: never pruned
+    'payments': Target(
+        Payment,
+        lambda cutoff: Payment.objects.filter(trans_status__in=['pending', 'failed'], trans_start__lt=cutoff),
+        _plain_delete(Payment),
+    ),
+    'pending_pushes': Target(PendingPush, _orphaned_pushes, _plain_delete(PendingPush)),
+}
+
+
+def _checkpoint_key(name):
+    return f"usermanager-prune:{name}:cutoff"
+
+
+def _cutoff(name, now):
+    days = getattr(settings, 'PRUNE_RETENTION_DAYS', {}).get(name)
+    return None if days is None else now - timedelta(days=days)
+
+
+def estimate(names=None, now=None):
+    """Dry run: ``{target: (rows, chunks)}`` that a prune would delete right now."""
+    now = now or timezone.now()
+    chunk_size = getattr(settings, 'PRUNE_CHUNK_SIZE', 500)
+    result = {}
+    for name in names or TARGETS:
+        cutoff = _cutoff(name, now)
+        if cutoff is None and name != 'pending_pushes':
+            continue  # retention disabled
+        rows = TARGETS[name].rows(cutoff).count()
+        result[name] = (rows, -(-rows // chunk_size))
+    return result
+
+
+def _delete_in_chunks(queryset, delete, chunk_size, pause):
+    """
+    Delete ``queryset`` in primary-key order, one chunk per transaction. Deleted rows
+    drop out of the queryset, so each chunk is the first ``chunk_size`` still left.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += delete(ids)
+        if pause:
+            time.sleep(pause)  # let other writers in between chunks
+    return deleted
+
+
+def prune(names=None, now=None, chunk_size=None, pause=None, resume=True):
+    """Prune every (or the named) target past its retention. Returns ``{target: rows}``."""
+    now = now or timezone.now()
+    chunk_size = chunk_size or getattr(settings, 'PRUNE_CHUNK_SIZE', 500)
+    pause = getattr(settings, 'PRUNE_CHUNK_SLEEP', 0.05) if pause is None else pause
+    result = {}
+    for name in names or TARGETS:
+        target = TARGETS[name]
+        key = _checkpoint_key(name)
+        checkpoint = cache.get(key) if resume else None
+        # An interrupted run is finished with its own cutoff, not a later one
+        cutoff = checkpoint['cutoff'] if checkpoint else _cutoff(name, now)
+        if cutoff is None and name != 'pending_pushes':
+            continue
+        cache.set(key, {'cutoff': cutoff}, timeout=CHECKPOINT_TIMEOUT)
+        result[name] = _delete_in_chunks(target.rows(cutoff), target.delete, chunk_size, pause)
+        cache.delete(key)  # finished: the next run takes a fresh cutoff
+        if result[name]:
+            logger.info(f"Pruned {result[name]} {name}.")
+    return result
+
+
+def delete_user_in_chunks(user, chunk_size=None, pause=None):
+    """
+    Delete a user's history chunk by chunk, then the user. Deleting a heavy user
+    directly would cascade into one huge DELETE per table inside a single transaction.
+    """
+    chunk_size = chunk_size or getattr(settings, 'PRUNE_CHUNK_SIZE', 500)
+    pause = getattr(settings, 'PRUNE_CHUNK_SLEEP', 0.05) if pause is None else pause
+    deleted = {}
+    # Children before parents: payments reference user profiles
+    for model in (TrafficSeries, Session, DailyUsage, TrafficRollup, Payment, UserProfile):
+        deleted[model.__name__] = _delete_in_chunks(
+            model.objects.filter(user=user), _plain_delete(model), chunk_size, pause,
+        )
+    UserStats.objects.filter(user=user).delete()
+    user.delete()
+    return deleted
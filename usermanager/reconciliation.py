@@ -0,0 +1,121 @@
+# mpi_src/usermanager/reconciliation.py
+"""
+Reconciliation of payments against Paystack's transaction listing.
+
+A charge can succeed at Paystack without the portal hearing about it (webhook lost,
+customer closed the tab), and the pending payment recorded at checkout then stays
+pending. Rather than verifying references one at a time, ``reconcile_payments`` pages
+through the gateway's listing for a date window and matches each page against
+``Payment.paystack_reference`` (unique, so one indexed lookup per page). Successful
+charges are settled through ``fulfil_payment``: pending payments are completed and
+granted, charges with no payment are fulfilled from their metadata, and a charge that
+does not match the quoted price is stored as a ``flagged`` payment for a human, so the
+next run skips it. Pending payments whose charge failed are marked failed.
+
+The window and the next page are checkpointed in the cache after every page, so an
+interrupted run continues where it stopped. The window's upper bound is fixed when a run
+starts: Paystack lists newest first, and charges made during the run would otherwise
+shift every later page.
+"""
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, User
+from usermanager.payments import AmountMismatch, charge_metadata, fulfil_payment
+from usermanager.paystack_client import get_paystack_client
+from usermanager.api import touch_resources
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = 'usermanager-reconcile:checkpoint'
+CHECKPOINT_TIMEOUT = 7 * 86400
+
+FAILED_STATUSES = {'failed', 'abandoned', 'reversed'}
+
+
+def _reconcile_page(charges, result):
+    """Match one page of gateway transactions against the payments table."""
+    result['seen'] += len(charges)
+    by_reference = {charge['reference']: charge for charge in charges if charge.get('reference')}
+    payments = Payment.objects.in_bulk(list(by_reference), field_name='paystack_reference')
+    failed = []
+
+    for reference, charge in by_reference.items():
+        payment = payments.get(reference)
+        status = charge.get('status')
+        if payment is not None and payment.trans_status != 'pending':
+            continue  # settled or flagged already
+        if status in FAILED_STATUSES and payment is not None:
+            failed.append(payment)
+            continue
+        if status != 'success':
+            continue
+
+        if payment is not None:
+            user_id, profile_id = payment.user_id, payment.profile_id
+        else:
+            metadata = charge_metadata(charge)
+            user_id, profile_id = metadata.get('user_id'), metadata.get('profile_id')
+            if not user_id or not profile_id:
+                logger.warning(f"Paystack charge {reference} has no payment and no portal metadata")
+                result['unmatched'] += 1
+                continue
+        try:
+            _, settled = fulfil_payment(reference, user_id, profile_id, charge['amount'])
+        except (User.DoesNotExist, Profile.DoesNotExist) as e:
+            logger.warning(f"Paystack charge {reference} cannot be fulfilled: {e}")
+            result['unmatched'] += 1
+            continue
+        except AmountMismatch as e:
+            logger.warning(f"Paystack charge {reference} flagged: {e}")
+            result['flagged'] += 1
+            continue
+        result['completed' if payment is not None else 'fulfilled'] += settled
+
+    if failed:
+        result['failed'] += Payment.objects.filter(
+            pk__in=[payment.pk for payment in failed], trans_status='pending',
+        ).update(trans_status='failed', trans_end=timezone.now())
+        for user_id in {payment.user_id for payment in failed}:
+            touch_resources(user_id, 'payments')
+
+
+def reconcile_payments(since=None, until=None, client=None, per_page=None, pause=None, resume=True):
+    """
+    Reconcile the transactions Paystack created in ``[since, until]`` (by default the last
+    ``PAYSTACK_RECONCILE_DAYS``). Returns counts per outcome.
+    """
+    checkpoint = cache.get(CHECKPOINT_KEY) if resume else None
+    if checkpoint:
+        since, until, page = checkpoint['since'], checkpoint['until'], checkpoint['page']
+        logger.info(f"Resuming payment reconciliation of {since} - {until} at page {page}")
+    else:
+        until = until or timezone.now()
+        since = since or until - timedelta(days=getattr(settings, 'PAYSTACK_RECONCILE_DAYS', 3))
+        page = 1
+    client = client or get_paystack_client()
+    per_page = per_page or getattr(settings, 'PAYSTACK_RECONCILE_PAGE_SIZE', 100)
+    pause = getattr(settings, 'PAYSTACK_RECONCILE_PAUSE', 0.5) if pause is None else pause
+
+    result = Counter()
+    while True:
+        charges, meta = client.list_transactions(since, until, page=page, per_page=per_page)
+        if charges:
+            _reconcile_page(charges, result)
+        page += 1
+        if not charges or page > meta.get('pageCount', page):
+            break
+        cache.set(CHECKPOINT_KEY, {'since': since, 'until': until, 'page': page}, timeout=CHECKPOINT_TIMEOUT)
+        if pause:
+            time.sleep(pause)  # stay well inside the gateway's rate limit
+    cache.delete(CHECKPOINT_KEY)  # finished: the next run takes a fresh window
+
+    if any(count for outcome, count in result.items() if outcome != 'seen'):
+        logger.info(f"Payment reconciliation of {since} - {until}: {dict(result)}")
+    return dict(result)
@@ -0,0 +1,228 @@
+# mpi_src/usermanager/reporting.py
+"""
+Revenue and traffic reports.
+
+Everything is aggregated in the database (``values().annotate()`` grouped by
+``TruncDate``) over indexed columns: completed payments by ``trans_end``, sessions by
+``started``. Once a day is more than ``REPORT_CLOSE_AFTER_DAYS`` old, long enough for
+reconciliation to settle late payments, ``close_periods`` materialises it into
+``RevenueRollup`` and ``TrafficRollup`` rows and records a ``ClosedDay``. Reports read
+closed days from the rollups and aggregate only the open days live, so a closed day is
+never recomputed. A closed day's traffic counts ended sessions only; one still running
+when its day closed is added by ``add_ended_session`` once the sync sees it end.
+
+Results are cached under a per-report version that ``invalidate_reports`` moves on when
+payments or new sessions land; ``REPORT_CACHE_TIMEOUT`` bounds how far the growing
+counters of running sessions can lag. Reads go to the replica when one is configured.
+"""
+import logging
+import time
+from datetime import datetime, time as day_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from usermanager.db_routers import read_from_replica
+from usermanager.models import ClosedDay, DailyUsage, Payment, RevenueRollup, Session, TrafficRollup, User
+from usermanager.usage import session_rollup
+
+logger = logging.getLogger(__name__)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, day_time.min))
+
+
+def _version_key(kind):
+    return f'usermanager-reports:{kind}:version'
+
+
+def report_version(kind):
+    """The current version of the ``revenue`` or ``traffic`` reports (see catalogue_version)."""
+    version = cache.get(_version_key(kind))
+    if version is None:
+        cache.add(_version_key(kind), int(time.time() * 1000), timeout=None)
+        version = cache.get(_version_key(kind))
+    return version
+
+
+def invalidate_reports(kind):
+    """Start a new version of the ``kind`` reports once the current transaction commits."""
+    def bump():
+        key = _version_key(kind)
+        cache.set(key, max(int(time.time() * 1000), (cache.get(key) or 0) + 1), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def _cached(kind, name, args, compute):
+    key = f"usermanager-reports:{kind}:{report_version(kind)}:{name}:{':'.join(map(str, args))}"
+    result = cache.get(key)
+    if result is None:
+        with read_from_replica():
+            result = compute()
+        cache.set(key, result, timeout=getattr(settings, 'REPORT_CACHE_TIMEOUT', 300))
+    return result
+
+
+# --- aggregation
+
+def _revenue(start, end):
+    """Completed payments with ``trans_end`` in [start, end) per day, plan and currency."""
+    return (
+        Payment.objects.filter(trans_status='completed', trans_end__gte=start, trans_end__lt=end)
+        .order_by()
+        .annotate(day=TruncDate('trans_end'), plan=Coalesce('profile__name', Value(''), output_field=CharField()))
+        .values('day', 'plan', 'currency')
+        .annotate(payment_count=Count('pk'), revenue=Sum('price'))
+    )
+
+
+def _traffic_per_user(start, end, ended_only=False):
+    """``{user_id: [download, upload, sessions]}`` of sessions started in [start, end), both tiers."""
+    traffic = {}
+    sessions = Session.objects.filter(started__gte=start, started__lt=end)
+    if ended_only:
+        sessions = sessions.filter(is_open=False)
+    for row in session_rollup(sessions, 'user_id'):
+        traffic[row['user_id']] = [row['download_sum'] or 0, row['upload_sum'] or 0, row['session_count']]
+    archived = DailyUsage.objects.filter(date__gte=timezone.localdate(start), date__lt=timezone.localdate(end))
+    for row in archived.order_by().values('user_id').annotate(d=Sum('download'), u=Sum('upload'), n=Sum('sessions')):
+        totals = traffic.setdefault(row['user_id'], [0, 0, 0])
+        totals[0] += row['d'] or 0
+        totals[1] += row['u'] or 0
+        totals[2] += row['n'] or 0
+    return traffic
+
+
+# --- closing periods
+
+def first_open_day():
+    """The first day not yet materialised, or None before anything was closed."""
+    latest = ClosedDay.objects.aggregate(latest=Max('date'))['latest']
+    return latest + timedelta(days=1) if latest else None
+
+
+def close_day(day):
+    """Materialise the rollups of ``day``. Returns False if it was closed already."""
+    start, end = _day_start(day), _day_start(day + timedelta(days=1))
+    with transaction.atomic():
+        _, created = ClosedDay.objects.get_or_create(date=day)
+        if not created:
+            return False
+        RevenueRollup.objects.bulk_create([
+            RevenueRollup(
+                date=day, plan=row['plan'], currency=row['currency'],
+                payments=row['payment_count'], revenue=row['revenue'],
+            )
+            for row in _revenue(start, end)
+        ])
+        TrafficRollup.objects.bulk_create([
+            TrafficRollup(user_id=user_id, date=day, download=download, upload=upload, sessions=sessions)
+            for user_id, (download, upload, sessions) in _traffic_per_user(start, end, ended_only=True).items()
+        ])
+    return True
+
+
+def add_ended_session(session):
+    """
+    Add a session that has just ended to the rollup of the day it started, if that day is
+    closed already (it was still running then). Returns True if a rollup was adjusted.
+    """
+    day = timezone.localdate(session.started)
+    if not ClosedDay.objects.filter(date=day).exists():
+        return False
+    rollup, _ = TrafficRollup.objects.get_or_create(user_id=session.user_id, date=day)
+    TrafficRollup.objects.filter(pk=rollup.pk).update(
+        download=F('download') + session.download, upload=F('upload') + session.upload, sessions=F('sessions') + 1,
+    )
+    invalidate_reports('traffic')
+    return True
+
+
+def _earliest_day():
+    candidates = [
+        Payment.objects.filter(trans_status='completed').aggregate(first=Min('trans_end'))['first'],
+        Session.objects.aggregate(first=Min('started'))['first'],
+    ]
+    days = [timezone.localdate(moment) for moment in candidates if moment]
+    archived = DailyUsage.objects.aggregate(first=Min('date'))['first']
+    if archived:
+        days.append(archived)
+    return min(days) if days else None
+
+
+def close_periods(now=None):
+    """
+    Close every day older than ``REPORT_CLOSE_AFTER_DAYS`` that is still open, one
+    transaction per day. Returns the number of days closed.
+    """
+    cutoff = timezone.localdate(now or timezone.now()) - timedelta(days=getattr(settings, 'REPORT_CLOSE_AFTER_DAYS', 3))
+    day = first_open_day() or _earliest_day()
+    closed = 0
+    while day is not None and day < cutoff:
+        closed += close_day(day)
+        day += timedelta(days=1)
+    if closed:
+        logger.info(f"Closed {closed} reporting days up to {day - timedelta(days=1)}.")
+    return closed
+
+
+# --- reports
+
+def revenue_per_plan(since, until):
+    """
+    Payments and revenue per day, plan and currency for ``since`` .. ``until``
+    (inclusive), oldest first, as dicts.
+    """
+    def compute():
+        first_open = first_open_day()
+        rows = []
+        if first_open is not None:
+            rollups = RevenueRollup.objects.filter(date__gte=since, date__lte=until, date__lt=first_open)
+            rows += list(rollups.values('date', 'plan', 'currency', 'payments', 'revenue'))
+        open_since = max(since, first_open) if first_open else since
+        if open_since <= until:
+            rows += [
+                {'date': row['day'], 'plan': row['plan'], 'currency': row['currency'],
+                 'payments': row['payment_count'], 'revenue': row['revenue']}
+                for row in _revenue(_day_start(open_since), _day_start(until + timedelta(days=1)))
+            ]
+        return sorted(rows, key=lambda row: (row['date'], row['plan'], row['currency']))
+
+    return _cached('revenue', 'per-plan', (since, until), compute)
+
+
+def top_users_by_traffic(since, until, limit=20):
+    """The ``limit`` users with the most traffic in ``since`` .. ``until`` (inclusive), as dicts."""
+    def compute():
+        first_open = first_open_day()
+        traffic = {}
+        if first_open is not None:
+            rollups = TrafficRollup.objects.filter(date__gte=since, date__lte=until, date__lt=first_open)
+            for row in rollups.order_by().values('user_id').annotate(
+                d=Sum('download'), u=Sum('upload'), n=Sum('sessions'),
+            ):
+                traffic[row['user_id']] = [row['d'], row['u'], row['n']]
+        open_since = max(since, first_open) if first_open else since
+        if open_since <= until:
+            live = _traffic_per_user(_day_start(open_since), _day_start(until + timedelta(days=1)))
+            for user_id, (download, upload, sessions) in live.items():
+                totals = traffic.setdefault(user_id, [0, 0, 0])
+                totals[0] += download
+                totals[1] += upload
+                totals[2] += sessions
+
+        top = sorted(traffic.items(), key=lambda item: item[1][0] + item[1][1], reverse=True)[:limit]
+        usernames = dict(User.objects.filter(pk__in=[user_id for user_id, _ in top]).values_list('pk', 'username'))
+        return [
+            {'user_id': user_id, 'username': usernames.get(user_id), 'download': download, 'upload': upload,
+             'traffic': download + upload, 'sessions': sessions}
+            for user_id, (download, upload, sessions) in top
+        ]
+
+    return _cached('traffic', 'top-users', (since, until, limit), compute)
@@ -0,0 +1,184 @@
+# mpi_src/usermanager/routeros.py
+"""
+Parsing and formatting of RouterOS time values, and compact records for router rows.
+
+RouterOS reports durations as ``1w2d3h4m5s``, ``2d03:04:05``, ``30d 00:00:00`` or
+``00:05:10`` (optionally with ``ms``), and dates either as ISO ``2024-10-05 12:00:00``
+(RouterOS 7.10+) or the older ``oct/05/2024 12:00:00``. ``unlimited`` and empty values
+mean "no value".
+
+The REST API returns every attribute of a row as a string in a dict. The sync only needs
+a handful of them, so the records below keep just the persisted fields, already typed.
+Passed as ``decoder`` to the ``MikroTikUserManager.get_*`` listings, each row is converted
+as soon as it is parsed and the raw dicts never pile up.
+"""
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from django.utils import timezone
+
+_UNIT_SECONDS = {'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+_DURATION_RE = re.compile(
+    r'^\s*(?:(?P<w>\d+)w)?\s*(?:(?P<d>\d+)d)?\s*(?:(?P<h>\d+)h)?\s*(?:(?P<m>\d+)m(?!s))?\s*'
+    r'(?:(?P<s>\d+)s)?\s*(?:(?P<ms>\d+)ms)?\s*'
+    r'(?:(?P<clock_h>\d+):(?P<clock_m>\d{2}):(?P<clock_s>\d{2})(?:\.(?P<clock_frac>\d+))?)?\s*$'
+)
+_NO_VALUE = {'', 'unlimited', 'never', 'none'}
+_MONTHS = {name: i for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1)}
+_LEGACY_DATE_RE = re.compile(r'^(?P<mon>[a-z]{3})/(?P<day>\d{2})/(?P<year>\d{4})(?:\s+(?P<time>\d{2}:\d{2}:\d{2}))?$')
+
+
+def parse_duration(value) -> Optional[timedelta]:
+    """Parse a RouterOS duration; None for empty/unlimited or unparseable values."""
+    if value is None or isinstance(value, timedelta):
+        return value
+    value = str(value).strip().lower()
+    if value in _NO_VALUE:
+        return None
+    match = _DURATION_RE.match(value)
+    if not match or not any(match.groupdict().values()):
+        return None
+    parts = match.groupdict()
+    seconds = sum(int(parts[unit]) * factor for unit, factor in _UNIT_SECONDS.items() if parts[unit])
+    if parts['clock_h']:
+        seconds += int(parts['clock_h']) * 3600 + int(parts['clock_m']) * 60 + int(parts['clock_s'])
+    micro = int(parts['ms']) * 1000 if parts['ms'] else 0
+    if parts['clock_frac']:
+        micro += int(parts['clock_frac'][:6].ljust(6, '0'))
+    return timedelta(seconds=seconds, microseconds=micro)
+
+
+def format_duration(value: Optional[timedelta]) -> str:
+    """Format a timedelta the way RouterOS prints it (``1w2d3h4m5s``)."""
+    if value is None:
+        return ''
+    seconds = int(value.total_seconds())
+    out = []
+    for unit, factor in _UNIT_SECONDS.items():
+        amount, seconds = divmod(seconds, factor)
+        if amount:
+            out.append(f'{amount}{unit}')
+    return ''.join(out) or '0s'
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    """Parse a RouterOS date/time into an aware datetime; None for empty/unlimited values."""
+    if value is None or isinstance(value, datetime):
+        return value
+    value = str(value).strip().lower()
+    if value in _NO_VALUE:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        match = _LEGACY_DATE_RE.match(value)
+        if not match or match['mon'] not in _MONTHS:
+            return None
+        hour, minute, second = map(int, (match['time'] or '00:00:00').split(':'))
+        parsed = datetime(int(match['year']), _MONTHS[match['mon']], int(match['day']), hour, minute, second)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def format_datetime(value: Optional[datetime]) -> Optional[str]:
+    """Format a datetime the way RouterOS accepts it; None stays None."""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _intern(value) -> str:
+    """Group, profile, port and status names repeat across thousands of rows: share one copy."""
+    return sys.intern(value) if value else ''
+
+
+class RouterUser(NamedTuple):
+    id: str
+    name: str
+    group: str
+    disabled: bool
+    otp_secret: str
+    shared_users: int
+    password: str
+
+    @classmethod
+    def from_router(cls, row):
+        return cls(
+            row['.id'], row['name'], _intern(row.get('group')), row.get('disabled') == 'true',
+            row.get('otp-secret', ''), int(row.get('shared-users', 0)), row.get('password', ''),
+        )
+
+
+class RouterProfile(NamedTuple):
+    id: str
+    name: str
+    name_for_users: str
+    price: str
+    starts_when: str
+    validity: str
+    override_shared_users: str
+
+    @classmethod
+    def from_router(cls, row):
+        return cls(
+            row['.id'], row['name'], row.get('name-for-users', ''), row.get('price', '0.00'),
+            _intern(row.get('starts-when', 'assigned')), row.get('validity', '30d 00:00:00'),
+            _intern(row.get('override-shared-users', 'off')),
+        )
+
+
+class RouterUserProfile(NamedTuple):
+    id: str
+    user: str
+    profile: str
+    state: Optional[str]
+    end_time: Optional[datetime]
+
+    @classmethod
+    def from_router(cls, row):
+        return cls(
+            row['.id'], row['user'], _intern(row['profile']), row.get('state') and _intern(row['state']),
+            parse_datetime(row.get('end-time')),
+        )
+
+
+class RouterSession(NamedTuple):
+    id: Optional[str]
+    session_id: Optional[str]
+    user: Optional[str]
+    nas_ip_address: Optional[str]
+    nas_port_id: Optional[str]
+    nas_port_type: Optional[str]
+    calling_station_id: Optional[str]
+    user_address: Optional[str]
+    download: int
+    upload: int
+    uptime: timedelta
+    status: Optional[str]
+    started: Optional[datetime]
+    ended: Optional[datetime]
+    terminate_cause: Optional[str]
+    last_accounting_packet: Optional[datetime]
+
+    @classmethod
+    def from_router(cls, row):
+        get = row.get
+        return cls(
+            get('.id'), get('acct-session-id'), get('user'),
+            get('nas-ip-address') and _intern(row['nas-ip-address']),
+            get('nas-port-id') and _intern(row['nas-port-id']),
+            get('nas-port-type') and _intern(row['nas-port-type']),
+            get('calling-station-id'), get('user-address'),
+            int(get('download', 0)), int(get('upload', 0)),
+            parse_duration(get('uptime')) or timedelta(0),
+            get('status') and _intern(row['status']),
+            parse_datetime(get('started')), parse_datetime(get('ended')),
+            get('terminate-cause') and _intern(row['terminate-cause']),
+            parse_datetime(get('last-accounting-packet')),
+        )
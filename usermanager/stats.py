@@ -0,0 +1,150 @@
+# mpi_src/usermanager/stats.py
+"""
+Denormalised per-user counters.
+
+The session sync and the payment flow adjust ``UserStats`` with single UPDATE ... SET
+x = x + delta statements, so the dashboard reads one row instead of summing history.
+A usage cycle begins at the last completed payment and counts whole sessions started
+since then (archived days after it); both paths share that definition.
+``recompute_user_stats`` rebuilds the rows from sessions, archived daily usage and
+payments to correct any drift (missed deltas, manual edits in the admin).
+"""
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from usermanager.models import DailyUsage, Payment, Session, User, UserStats
+
+logger = logging.getLogger(__name__)
+
+RECOMPUTE_CHUNK_SIZE = 500
+
+
+def _bump(user_id, **deltas):
+    """Add ``deltas`` to the user's counters; builds the row from history if it is missing."""
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        modified=timezone.now(), **{field: F(field) + delta for field, delta in deltas.items()},
+    )
+    if not updated:
+        recompute_user_stats([user_id])  # history already includes this change
+
+
+def _counter_delta(current, previous):
+    """Bytes counted since ``previous``; a counter that went down was reset by the router."""
+    return current - previous if current >= previous else current
+
+
+def apply_session_update(session, previous=None):
+    """
+    Account for a synced session. ``previous`` is the row's ``download``, ``upload``
+    and ``is_open`` before the sync, or None for a session seen for the first time.
+    """
+    if previous is None:
+        traffic = session.download + session.upload
+        opened = int(session.is_open)
+    else:
+        traffic = (
+            _counter_delta(session.download, previous['download'])
+            + _counter_delta(session.upload, previous['upload'])
+        )
+        opened = int(session.is_open) - int(previous['is_open'])
+
+    if traffic or opened:
+        # Traffic of a session started before the current cycle belongs to the previous one
+        in_cycle = Case(
+            When(Q(cycle_start__isnull=True) | Q(cycle_start__lte=session.started), then=Value(traffic)),
+            default=Value(0),
+        )
+        _bump(session.user_id, cycle_bytes=in_cycle, lifetime_bytes=traffic, active_sessions=opened)
+
+
+def apply_payment(payment):
+    """Account for a completed payment; it also starts a new usage cycle."""
+    if payment.trans_status != 'completed':
+        return
+    paid_at = payment.trans_end or payment.trans_start
+    updated = UserStats.objects.filter(user_id=payment.user_id).update(
+        total_paid=F('total_paid') + payment.price,
+        last_payment_at=paid_at, last_payment_amount=payment.price,
+        cycle_start=paid_at, cycle_bytes=_cycle_bytes(payment.user_id, paid_at), modified=timezone.now(),
+    )
+    if not updated:
+        recompute_user_stats([payment.user_id])
+
+
+def _cycle_bytes(user_id, cycle_start):
+    """Bytes used in the cycle that began at ``cycle_start`` (all usage when None)."""
+    sessions = Session.objects.filter(user_id=user_id)
+    days = DailyUsage.objects.filter(user_id=user_id)
+    if cycle_start:
+        sessions = sessions.filter(started__gte=cycle_start)
+        days = days.filter(date__gt=cycle_start.date())
+    return (
+        (sessions.aggregate(b=Sum(F('download') + F('upload')))['b'] or 0)
+        + (days.aggregate(b=Sum(F('download') + F('upload')))['b'] or 0)
+    )
+
+
+def _per_user(queryset, user_ids, **aggregates):
+    return {
+        row.pop('user_id'): row
+        for row in queryset.filter(user_id__in=user_ids).order_by().values('user_id').annotate(**aggregates)
+    }
+
+
+def _recompute_chunk(user_ids, now):
+    traffic = _per_user(
+        Session.objects.all(), user_ids,
+        raw=Sum(F('download') + F('upload')), open=Count('pk', filter=Q(is_open=True)),
+    )
+    archived = _per_user(DailyUsage.objects.all(), user_ids, bytes=Sum(F('download') + F('upload')))
+    # When a payment was made, as apply_payment reads it
+    completed = Payment.objects.filter(trans_status='completed').annotate(paid_at=Coalesce('trans_end', 'trans_start'))
+    payments = _per_user(completed, user_ids, total=Sum('price'), last_at=Max('paid_at'))
+
+    for user_id in user_ids:
+        paid = payments.get(user_id, {})
+        last_payment = None
+        if paid.get('last_at'):
+            last_payment = (
+                completed.filter(user_id=user_id, paid_at=paid['last_at'])
+                .order_by('-id').only('price', 'trans_start', 'trans_end').first()
+            )
+        cycle_start = last_payment.paid_at if last_payment else None
+
+        values = {
+            'cycle_start': cycle_start,
+            'cycle_bytes': _cycle_bytes(user_id, cycle_start),
+            'lifetime_bytes': (traffic.get(user_id, {}).get('raw') or 0) + (archived.get(user_id, {}).get('bytes') or 0),
+            'active_sessions': traffic.get(user_id, {}).get('open') or 0,
+            'last_payment_at': cycle_start,
+            'last_payment_amount': last_payment.price if last_payment else None,
+            'total_paid': paid.get('total') or Decimal('0'),
+            'recomputed': now,
+        }
+        try:
+            with transaction.atomic():
+                UserStats.objects.update_or_create(user_id=user_id, defaults=values)
+        except IntegrityError:
+            UserStats.objects.filter(user_id=user_id).update(**values)  # created concurrently
+
+
+def recompute_user_stats(user_ids=None):
+    """Rebuild the counters of ``user_ids`` (everyone by default) from history."""
+    now = timezone.now()
+    if user_ids is None:
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    chunk, count = [], 0
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) == RECOMPUTE_CHUNK_SIZE:
+            _recompute_chunk(chunk, now)
+            count, chunk = count + len(chunk), []
+    if chunk:
+        _recompute_chunk(chunk, now)
+        count += len(chunk)
+    return count
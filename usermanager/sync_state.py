@@ -0,0 +1,101 @@
+# mpi_src/usermanager/sync_state.py
+"""
+Conflict resolution between local edits and router state.
+
+Policy, applied the same way by the pull (sync) and the push tasks:
+
+* a pull that sees the same router state it last applied or pushed writes nothing;
+* a row with a local edit not yet acknowledged by the router keeps its local values
+  (the pending push will carry them), even if the router changed meanwhile;
+* otherwise the router wins, written with a compare-and-swap on ``local_version`` so a
+  local edit committed while the pull was running is never overwritten;
+* a successful push records the version it carried and the state it sent, so the next
+  pull recognises its own write instead of echoing it back.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.db.models import Value
+from django.db.models.functions import Greatest
+
+# Outcomes of apply_router_state
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+KEPT_LOCAL = 'kept-local'
+
+
+def _normalise(field, value):
+    value = field.to_python(value)
+    if isinstance(value, Decimal):
+        return str(value.normalize())  # '10', '10.0' and '10.00' are the same price
+    if value in (None, ''):
+        return ''
+    return str(value)
+
+
+def fingerprint(model, values):
+    """Stable hash of the router-mirrored fields of ``values`` (model field name -> value)."""
+    parts = [
+        _normalise(model._meta.get_field(name), values.get(name))
+        for name in model.SYNC_FIELDS
+    ]
+    return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
+
+
+def instance_fingerprint(instance):
+    return fingerprint(type(instance), {name: getattr(instance, name) for name in instance.SYNC_FIELDS})
+
+
+_LOOKUP = object()
+
+
+def apply_router_state(model, lookup, values, create_defaults=None, extra=None, instance=_LOOKUP):
+    """
+    Apply one router row to the local table.
+
+    ``values`` holds the router-mirrored fields, ``extra`` router bookkeeping that is
+    always taken from the router (e.g. ``mikrotik_id``), ``create_defaults`` fields only
+    needed to create the row. Callers that already hold the local row (or know there is
+    none) pass it as ``instance`` to skip the lookup. Returns ``(instance, outcome)``.
+    """
+    extra = extra or {}
+    router_fingerprint = fingerprint(model, values)
+    if instance is _LOOKUP:
+        instance = model.objects.filter(**lookup).first()
+
+    if instance is None:
+        instance = model(**lookup, **(create_defaults or {}), **values, **extra)
+        instance.router_fingerprint = router_fingerprint
+        instance._from_router = True
+        instance.save()
+        instance._from_router = False  # later saves of this instance are local edits
+        return instance, CREATED
+
+    stale_extra = {k: v for k, v in extra.items() if getattr(instance, k) != v}
+    if instance.router_fingerprint == router_fingerprint and not stale_extra:
+        return instance, UNCHANGED
+
+    if instance.has_local_changes:
+        return instance, KEPT_LOCAL
+
+    fields = {'router_fingerprint': router_fingerprint, **values, **model.materialise(values), **extra}
+    updated = model.objects.filter(pk=instance.pk, local_version=instance.local_version).update(**fields)
+    if not updated:
+        return instance, KEPT_LOCAL
+    for name, value in fields.items():
+        setattr(instance, name, value)
+    return instance, UPDATED
+
+
+def mark_pushed(instance, version, sent_state=True, **fields):
+    """
+    Record a successful push of ``instance`` as it was at ``local_version == version``.
+    ``sent_state=False`` is for pushes the router fills in itself (e.g. a new user
+    profile), where the next pull must still apply the router's values.
+    """
+    type(instance).objects.filter(pk=instance.pk).update(
+        synced_version=Greatest('synced_version', Value(version)),
+        router_fingerprint=instance_fingerprint(instance) if sent_state else None,
+        **fields,
+    )
@@ -1,19 +1,36 @@
 # mpi_src/usermanager/tasks.py
 import logging
+import functools
 from django.db import transaction, IntegrityError
 from celery import shared_task
 from datetime import datetime
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-from usermanager.mikrotik_userman import init_mikrotik_manager
-from usermanager.models import User, Profile, UserProfile, Session
+from usermanager.mikrotik_userman import get_mikrotik_manager, MikroTikUnavailable
+from usermanager.models import User, Profile, UserProfile, Session, trigger_mikrotik_tasks
+from usermanager.backlog import park_push, has_pending, replay_backlog
+from usermanager.locking import claim_rows, claim_row, RowBusy
+from usermanager.sync_state import apply_router_state, mark_pushed, UNCHANGED
+from usermanager.idempotency import (
+    push_key, claim_push, release_push, lookup_router_id, remember_router_id,
+)
+from usermanager.usage import archive_sessions, archive_cutoff
+from usermanager.traffic import record_sample, downsample_traffic
+from usermanager.stats import apply_session_update, recompute_user_stats
+from usermanager.dashboard import refresh_dashboard
+from usermanager.api import touch_resources
+from usermanager.catalogue import invalidate_catalogue
+from usermanager.pruning import prune
+from usermanager.payments import AmountMismatch, fulfil_payment
+from usermanager.reconciliation import reconcile_payments
+from usermanager.reporting import add_ended_session, close_periods, invalidate_reports
+from usermanager.routeros import (
+    format_datetime, format_duration, RouterUser, RouterProfile, RouterUserProfile, RouterSession,
+)
 
 logger = logging.getLogger(__name__)
 
-# Initialize the MikroTik manager
-mikrotik_manager = init_mikrotik_manager()
-
 
 # ------------------------------- from MikroTik to Django
 @shared_task
@@ -22,6 +39,7 @@ def sync_mikrotik_data():
     logger.debug("Starting sync_mikrotik_data task")
 
     try:
+        mikrotik_manager = get_mikrotik_manager()
         sync_users(mikrotik_manager)
         sync_profiles(mikrotik_manager)
         sync_user_profiles(mikrotik_manager)
@@ -32,27 +50,66 @@ def sync_mikrotik_data():
         logger.info("MikroTik sync completed successfully")
 
 
+SYNC_BATCH_SIZE = 500
+
+
+def claimed_router_rows(model, router_rows, field, router_key):
+    """
+    Pair router rows with the local rows this worker could claim, one batch per transaction.
+    Router rows are records from ``usermanager.routeros``; ``router_key`` names the attribute
+    matched against ``field``. Yields ``(router_row, local_row_or_None)``; router rows whose local row is claimed by
+    another worker (e.g. a push in flight) are skipped and picked up on the next cycle.
+    """
+    for start in range(0, len(router_rows), SYNC_BATCH_SIZE):
+        batch = router_rows[start:start + SYNC_BATCH_SIZE]
+        keys = [getattr(row, router_key) for row in batch]
+        rows = model.objects.filter(**{f'{field}__in': keys})
+        with claim_rows(rows) as claimed:
+            local = {getattr(obj, field): obj for obj in claimed}
+            contended = set(rows.exclude(pk__in=[obj.pk for obj in claimed]).values_list(field, flat=True))
+            if contended:
+                logger.info(f"Skipping {len(contended)} {model.__name__} rows claimed by another worker.")
+            for row in batch:
+                key = getattr(row, router_key)
+                if key not in contended:
+                    yield row, local.get(key)
+
+
+def requeue_if_pending(instance):
+    """
+    Re-enqueue the push of a local edit the router has not acknowledged yet. The claim
+    keeps a push that is still queued or running from being enqueued again every cycle.
+    """
+    if not instance.has_local_changes:
+        return
+    created = not instance.mikrotik_id
+    model = next(name for name, cls in PUSH_MODELS.items() if isinstance(instance, cls))
+    key = push_key(model, 'create' if created else 'update', instance.pk, instance.local_version)
+    if claim_push(f"{key}:requeue"):
+        trigger_mikrotik_tasks(instance, created=created)
+
+
 def sync_users(mikrotik_manager):
     """Synchronizes users from MikroTik to the Django database."""
     try:
-        with transaction.atomic():
-            mikrotik_users = mikrotik_manager.get_users()
-            for mt_user in mikrotik_users:
-                user, created = User.objects.update_or_create(
-                    username=mt_user['name'],
-                    defaults={
-                        'group': mt_user.get('group', ''),
-                        'disabled': mt_user.get('disabled') == 'true',
-                        'otp_secret': mt_user.get('otp-secret', ''),
-                        'shared_users': int(mt_user.get('shared-users', 0)),
-                        'plain_password': mt_user.get('password', ''),
-                        'mikrotik_id': mt_user['.id'],  # Store MikroTik ID
-                    }
-                )
-                if created:
-                    logger.info(f'Created new user: {user.username}')
-                else:
-                    logger.info(f'Updated user: {user.username}')
+        mikrotik_users = mikrotik_manager.get_users(decoder=RouterUser.from_router)
+        for mt_user, local_user in claimed_router_rows(User, mikrotik_users, 'username', 'name'):
+            user, outcome = apply_router_state(
+                User,
+                lookup={'username': mt_user.name},
+                values={
+                    'group': mt_user.group,
+                    'disabled': mt_user.disabled,
+                    'otp_secret': mt_user.otp_secret,
+                    'shared_users': mt_user.shared_users,
+                    'plain_password': mt_user.password,
+                },
+                extra={'mikrotik_id': mt_user.id},  # Store MikroTik ID
+                instance=local_user,
+            )
+            requeue_if_pending(user)
+            if outcome != UNCHANGED:
+                logger.info(f'User {user.username}: {outcome}')
     except Exception as e:
         logger.error(f"Error syncing users: {e}", exc_info=True)
         raise
@@ -61,24 +118,26 @@ def sync_users(mikrotik_manager):
 def sync_profiles(mikrotik_manager):
     """Synchronizes profiles from MikroTik to the Django database."""
     try:
-        with transaction.atomic():
-            mikrotik_profiles = mikrotik_manager.get_profiles()
-            for mt_profile in mikrotik_profiles:
-                profile, created = Profile.objects.update_or_create(
-                    name=mt_profile['name'],
-                    defaults={
-                        'name_for_users': mt_profile.get('name-for-users', ''),
-                        'price': mt_profile.get('price', '0.00'),
-                        'starts_when': mt_profile.get('starts-when', 'assigned'),
-                        'validity': mt_profile.get('validity', '30d 00:00:00'),
-                        'override_shared_users': mt_profile.get('override-shared-users', 'off'),
-                        'mikrotik_id': mt_profile['.id'],  # Store MikroTik ID
-                    }
-                )
-                if created:
-                    logger.info(f'Created new profile: {profile.name}')
-                else:
-                    logger.info(f'Updated profile: {profile.name}')
+        mikrotik_profiles = mikrotik_manager.get_profiles(decoder=RouterProfile.from_router)
+        for mt_profile, local_profile in claimed_router_rows(Profile, mikrotik_profiles, 'name', 'name'):
+            profile, outcome = apply_router_state(
+                Profile,
+                lookup={'name': mt_profile.name},
+                values={
+                    'name_for_users': mt_profile.name_for_users,
+                    'price': mt_profile.price,
+                    'starts_when': mt_profile.starts_when,
+                    'validity': mt_profile.validity,
+                    'override_shared_users': mt_profile.override_shared_users,
+                },
+                extra={'mikrotik_id': mt_profile.id},  # Store MikroTik ID
+                instance=local_profile,
+            )
+            requeue_if_pending(profile)
+            if outcome != UNCHANGED:
+                logger.info(f'Profile {profile.name}: {outcome}')
+                # Router changes to existing rows are plain UPDATEs that send no post_save
+                invalidate_catalogue()
     except Exception as e:
         logger.error(f"Error syncing profiles: {e}", exc_info=True)
         raise
@@ -126,44 +185,30 @@ def sync_profiles(mikrotik_manager):
 def sync_user_profiles(mikrotik_manager):
     """Synchronizes user profiles from MikroTik to the Django database."""
     try:
-        with transaction.atomic():
-            mikrotik_user_profiles = mikrotik_manager.get_user_profiles()
-            for mt_user_profile in mikrotik_user_profiles:
-                user = User.objects.filter(username=mt_user_profile['user']).first()
-                profile = Profile.objects.filter(name=mt_user_profile['profile']).first()
-
-                if not user or not profile:
-                    logger.warning(f"Skipping sync: User '{mt_user_profile['user']}' or Profile '{mt_user_profile['profile']}' not found.")
-                    continue
-
-                end_time = mt_user_profile.get('end-time', None)
-                state = mt_user_profile.get('state')
-                mikrotik_id = mt_user_profile['.id']
-
-                # Attempt to get the existing UserProfile by MikroTik ID
-                user_profile, created = UserProfile.objects.get_or_create(
-                    mikrotik_id=mikrotik_id,
-                    defaults={
-                        'user': user,
-                        'profile': profile,
-                        'state': state,
-                        'end_time': end_time
-                    }
-                )
-
-                # If the record already exists, check if we need to update it
-                if not created:
-                    # Only update state and end_time if they have changed
-                    update_needed = False
-                    if user_profile.state != state:
-                        user_profile.state = state
-                        update_needed = True
-                    if user_profile.end_time != end_time:
-                        user_profile.end_time = end_time
-                        update_needed = True
-
-                    if update_needed:
-                        user_profile.save()
+        mikrotik_user_profiles = mikrotik_manager.get_user_profiles(decoder=RouterUserProfile.from_router)
+        for mt_user_profile, local_user_profile in claimed_router_rows(UserProfile, mikrotik_user_profiles, 'mikrotik_id', 'id'):
+            user = User.objects.filter(username=mt_user_profile.user).first()
+            profile = Profile.objects.filter(name=mt_user_profile.profile).first()
+
+            if not user or not profile:
+                logger.warning(f"Skipping sync: User '{mt_user_profile.user}' or Profile '{mt_user_profile.profile}' not found.")
+                continue
+
+            user_profile, outcome = apply_router_state(
+                UserProfile,
+                lookup={'mikrotik_id': mt_user_profile.id},
+                values={
+                    'state': mt_user_profile.state,
+                    'end_time': mt_user_profile.end_time,
+                },
+                create_defaults={'user': user, 'profile': profile},
+                instance=local_user_profile,
+            )
+            requeue_if_pending(user_profile)
+            if outcome != UNCHANGED:
+                logger.info(f'UserProfile {user_profile.mikrotik_id}: {outcome}')
+                refresh_dashboard(user_profile.user_id)
+                touch_resources(user_profile.user_id, 'plan')
 
     except Exception as e:
         logger.error(f"Error syncing user profiles: {e}", exc_info=True)
@@ -174,56 +219,86 @@ def sync_sessions(mikrotik_manager):
     """Synchronizes sessions from MikroTik to the Django database."""
     try:
         with transaction.atomic():
-            mikrotik_sessions = mikrotik_manager.get_sessions()
+            mikrotik_sessions = mikrotik_manager.get_sessions(decoder=RouterSession.from_router)
+            # The counters before this sync, for every listed session in one query
+            previous_counters = {
+                row.pop('session_id'): row
+                for row in Session.objects.filter(
+                    session_id__in=[mt_session.session_id for mt_session in mikrotik_sessions],
+                ).values('session_id', 'download', 'upload', 'is_open')
+            }
+            touched_users, new_sessions = set(), False
+            archived_before = archive_cutoff()
             for mt_session in mikrotik_sessions:
-                user = User.objects.filter(username=mt_session.get('user')).first()
-                if not user:
-                    logger.warning(f"User '{mt_session.get('user')}' not found. Skipping session '{mt_session.get('acct-session-id')}'")
+                # The router still lists sessions we have rolled into DailyUsage and
+                # deleted; recreating them would count their traffic twice.
+                if mt_session.ended and mt_session.ended < archived_before:
                     continue
 
-                # Convert naive datetime to aware datetime if time zone support is active
-                from django.utils import timezone
-                ended_str = mt_session.get('ended')
-                ended = None
-                if ended_str:
-                    ended = datetime.strptime(ended_str, '%Y-%m-%d %H:%M:%S')
-                    if timezone.is_naive(ended):
-                        ended = timezone.make_aware(ended)
+                user = User.objects.filter(username=mt_session.user).first()
+                if not user:
+                    logger.warning(f"User '{mt_session.user}' not found. Skipping session '{mt_session.session_id}'")
+                    continue
 
                 session_defaults = {
                     'user': user,  # Ensure user is assigned here
-                    'nas_ip_address': mt_session.get('nas-ip-address'),
-                    'nas_port_id': mt_session.get('nas-port-id'),
-                    'nas_port_type': mt_session.get('nas-port-type'),
-                    'calling_station_id': mt_session.get('calling-station-id'),
-                    'download': int(mt_session.get('download', 0)),
-                    'upload': int(mt_session.get('upload', 0)),
-                    'uptime': mt_session.get('uptime'),
-                    'status': mt_session.get('status'),
-                    'started': mt_session.get('started'),
-                    'ended': mt_session.get('ended', None),
-                    'terminate_cause': mt_session.get('terminate-cause', None),
-                    'user_address': mt_session.get('user-address'),
-                    'last_accounting_packet': mt_session.get('last-accounting-packet'),
-                    'mikrotik_id': mt_session.get('.id')  # Store MikroTik ID here
+                    'nas_ip_address': mt_session.nas_ip_address,
+                    'nas_port_id': mt_session.nas_port_id,
+                    'nas_port_type': mt_session.nas_port_type,
+                    'calling_station_id': mt_session.calling_station_id,
+                    'download': mt_session.download,
+                    'upload': mt_session.upload,
+                    'uptime': mt_session.uptime,
+                    'status': mt_session.status,
+                    'started': mt_session.started,
+                    'ended': mt_session.ended,
+                    'terminate_cause': mt_session.terminate_cause,
+                    'user_address': mt_session.user_address,
+                    'last_accounting_packet': mt_session.last_accounting_packet,
+                    'mikrotik_id': mt_session.id  # Store MikroTik ID here
                 }
 
+                previous = previous_counters.get(mt_session.session_id)
                 session, created = Session.objects.update_or_create(
-                    session_id=mt_session.get('acct-session-id'),
+                    session_id=mt_session.session_id,
                     defaults=session_defaults
                 )
+                apply_session_update(session, previous)
+                was_open = session.is_open if previous is None else previous['is_open']
+                counters_moved = previous is None or (
+                    (session.download, session.upload) != (previous['download'], previous['upload'])
+                )
+                # Most listed sessions are closed and unchanged; their users need no refresh
+                if previous is None or session.is_open != previous['is_open'] or (was_open and counters_moved):
+                    touched_users.add(session.user_id)
+                if not session.is_open and (previous is None or previous['is_open']):
+                    add_ended_session(session)  # its day may have closed before it ended
 
                 if created:
+                    new_sessions = True
                     logger.info(f'Created new session: {session.session_id}')
                 else:
                     logger.info(f'Updated session: {session.session_id}')
 
+                # Keep the counter history behind the bandwidth graphs. The router keeps
+                # listing closed sessions, so sample only sessions that were open (a closing
+                # one gets its final counters) and whose counters moved.
+                if was_open and counters_moved:
+                    record_sample(session)
+
                 # Notify WebSocket clients of new session data
                 send_traffic_update_to_group(session.session_id, {
                     "download": session.download,
                     "upload": session.upload,
-                    "uptime": session.uptime,
+                    "uptime": format_duration(session.uptime),
                 })
+
+            # Once per user, after the whole batch commits
+            for user_id in touched_users:
+                refresh_dashboard(user_id)
+                touch_resources(user_id, 'sessions')
+            if new_sessions:
+                invalidate_reports('traffic')
     except Exception as e:
         logger.error(f"Error syncing sessions: {e}", exc_info=True)
         raise
@@ -242,13 +317,170 @@ def send_traffic_update_to_group(session_id, traffic_data):
 
 
 # ------------------------------- from Django to MikroTik
+# Plain push functions keyed by (model, action); the backlog replays through these.
+PUSH_HANDLERS = {}
+PUSH_MODELS = {'user': User, 'profile': Profile, 'user_profile': UserProfile}
+
+
+def mikrotik_push(model, action):
+    """
+    Wrap a push function as an idempotent, outage-tolerant task body.
+
+    Deliveries carry ``version`` (the row's local_version when the push was enqueued), so
+    ``(object id, version)`` is the idempotency key: a version the router already
+    acknowledged, or one delivered within the dedup window, is skipped. When the router is
+    unreachable the push is parked in the offline backlog instead of failing, and a push
+    for an object that already has a parked one is parked behind it, so pushes for the
+    same object are never applied out of order.
+    """
+    def decorator(func):
+        PUSH_HANDLERS[(model, action)] = func
+
+        @functools.wraps(func)
+        def wrapper(object_id, version=None, mikrotik_id=None):
+            # Deletes run after the row is gone and carry its router ID instead
+            extra = {'mikrotik_id': mikrotik_id} if action == 'delete' else {}
+            key = None
+            if version is not None:
+                if action != 'delete' and PUSH_MODELS[model].objects.filter(pk=object_id, synced_version__gte=version).exists():
+                    logger.info(f"Skipping {action} of {model} {object_id} v{version}: already on the router.")
+                    return
+                key = push_key(model, action, object_id, version)
+                if not claim_push(key):
+                    logger.info(f"Skipping duplicate delivery of {action} {model} {object_id} v{version}.")
+                    return
+
+            done = False
+            try:
+                router = get_mikrotik_manager().router_ip
+                if has_pending(router, model, object_id):
+                    park_push(router, model, object_id, action, mikrotik_id=mikrotik_id)
+                else:
+                    try:
+                        func(object_id, **extra)
+                    except MikroTikUnavailable as e:
+                        park_push(router, model, object_id, action, error=e, mikrotik_id=mikrotik_id)
+                done = True
+            except RowBusy:
+                # Left pending; the next sync cycle re-enqueues it.
+                logger.info(f"Skipping {action} of {model} {object_id}: row busy in another worker.")
+            finally:
+                if key:
+                    release_push(key, done)
+        return wrapper
+    return decorator
+
+
+@shared_task
+def replay_mikrotik_backlog():
+    """Probes the router and, once it is back, replays the compacted backlog of parked pushes."""
+    try:
+        replay_backlog(get_mikrotik_manager(), PUSH_HANDLERS)
+    except Exception as e:
+        logger.error(f"Error replaying MikroTik backlog: {e}", exc_info=True)
+
+
+@shared_task
+def archive_old_sessions():
+    """Rolls closed sessions past the retention window into daily usage."""
+    try:
+        return archive_sessions()
+    except Exception as e:
+        logger.error(f"Error archiving sessions: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def downsample_traffic_history():
+    """Folds aged per-session traffic samples into 5-minute and hourly resolution."""
+    try:
+        return downsample_traffic()
+    except Exception as e:
+        logger.error(f"Error downsampling traffic history: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def recompute_all_user_stats():
+    """Rebuilds every user's usage and billing counters from history to correct drift."""
+    try:
+        return recompute_user_stats()
+    except Exception as e:
+        logger.error(f"Error recomputing user stats: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def prune_usermanager_data():
+    """Deletes data past its retention in small batches; resumes an interrupted run."""
+    try:
+        return prune()
+    except Exception as e:
+        logger.error(f"Error pruning usermanager data: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def fulfil_paystack_payment(reference, user_id, profile_id, amount):
+    """Records a confirmed Paystack charge and grants its plan; repeats are no-ops."""
+    try:
+        payment, _ = fulfil_payment(reference, user_id, profile_id, amount)
+        return str(payment.pk)
+    except (User.DoesNotExist, Profile.DoesNotExist, AmountMismatch) as e:
+        logger.error(f"Cannot fulfil payment {reference}: {e}")
+    except Exception as e:
+        logger.error(f"Error fulfilling payment {reference}: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def close_report_periods():
+    """Materialises the revenue and traffic rollups of days past the reporting grace period."""
+    try:
+        return close_periods()
+    except Exception as e:
+        logger.error(f"Error closing report periods: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def reconcile_paystack_payments():
+    """Matches recent Paystack transactions against payments; resumes an interrupted run."""
+    try:
+        return reconcile_payments()
+    except Exception as e:
+        logger.error(f"Error reconciling Paystack payments: {e}", exc_info=True)
+        raise
+
+
 # event-based tasks triggered by CRUD operations
 # --- User
 @shared_task
+@mikrotik_push('user', 'create')
 def create_user_in_mikrotik(user_id):
     """Create a new user in MikroTik."""
     try:
+        mikrotik_manager = get_mikrotik_manager()
         user = User.objects.get(id=user_id)
+        version = user.local_version
+        if user.mikrotik_id:
+            logger.info(f'User {user.username} already exists in MikroTik as {user.mikrotik_id}.')
+            return
+
+        existing_id = lookup_router_id(mikrotik_manager, 'user', user.username)
+        if existing_id:
+            # A previous delivery already created it; adopt it and bring it up to date.
+            mikrotik_manager.update_user(
+                user_id=existing_id,
+                group=user.group,
+                disabled=str(user.disabled).lower(),
+                shared_users=user.shared_users,
+                plain_password=user.plain_password
+            )
+            mark_pushed(user, version, mikrotik_id=existing_id)
+            logger.info(f'Adopted existing MikroTik user {user.username} ({existing_id}).')
+            return
+
         response = mikrotik_manager.create_user(
             username=user.username,
             group=user.group,
@@ -257,8 +489,8 @@ def create_user_in_mikrotik(user_id):
             shared_users=user.shared_users,
             plain_password=user.plain_password
         )
-        user.mikrotik_id = response['.id']  # Save MikroTik ID
-        user.save()
+        mark_pushed(user, version, mikrotik_id=response['.id'])  # Save MikroTik ID
+        remember_router_id(mikrotik_manager, 'user', user.username, response['.id'])
         logger.info(f'Created user {user.username} in MikroTik.')
     except User.DoesNotExist:
         logger.error(f'User with ID {user_id} does not exist.')
@@ -268,41 +500,46 @@ def create_user_in_mikrotik(user_id):
 
 
 @shared_task
+@mikrotik_push('user', 'update')
 def update_user_in_mikrotik(user_id):
     """Update an existing user in MikroTik."""
     try:
-        user = User.objects.get(id=user_id)
-        if user.mikrotik_id:
-            mikrotik_manager.update_user(
-                user_id=user.mikrotik_id,
-                group=user.group,
-                disabled=str(user.disabled).lower(),
-                # otp_secret=user.otp_secret,
-                shared_users=user.shared_users,
-                plain_password=user.plain_password
-            )
-            logger.info(f'Updated user {user.username} in MikroTik.')
-        else:
-            logger.warning(f"User {user.username} does not have a MikroTik ID.")
+        mikrotik_manager = get_mikrotik_manager()
+        # Claimed so a concurrent sync cannot interleave its read-modify-write with ours
+        with claim_row(User, user_id) as user:
+            version = user.local_version
+            if user.mikrotik_id:
+                mikrotik_manager.update_user(
+                    user_id=user.mikrotik_id,
+                    group=user.group,
+                    disabled=str(user.disabled).lower(),
+                    # otp_secret=user.otp_secret,
+                    shared_users=user.shared_users,
+                    plain_password=user.plain_password
+                )
+                mark_pushed(user, version)
+                logger.info(f'Updated user {user.username} in MikroTik.')
+            else:
+                logger.warning(f"User {user.username} does not have a MikroTik ID.")
     except User.DoesNotExist:
         logger.error(f'User with ID {user_id} does not exist.')
+    except RowBusy:
+        raise
     except Exception as e:
         logger.error(f"Error updating User {user_id} in MikroTik: {e}", exc_info=True)
         raise
 
 
 @shared_task
-def delete_user_in_mikrotik(user_id):
-    """Delete a user in MikroTik."""
+@mikrotik_push('user', 'delete')
+def delete_user_in_mikrotik(user_id, mikrotik_id=None):
+    """Delete a user in MikroTik; the row is already deleted locally."""
     try:
-        user = User.objects.get(id=user_id)
-        if user.mikrotik_id:
-            mikrotik_manager.delete_user(user_id=user.mikrotik_id)
-            logger.info(f'Deleted user {user.username} in MikroTik.')
-        else:
-            logger.warning(f"User {user.username} does not have a MikroTik ID.")
-    except User.DoesNotExist:
-        logger.error(f'User with ID {user_id} does not exist.')
+        if not mikrotik_id:
+            logger.info(f"User {user_id} was never created in MikroTik; nothing to delete.")
+            return
+        get_mikrotik_manager().delete_user(user_id=mikrotik_id)
+        logger.info(f'Deleted User {user_id} ({mikrotik_id}) in MikroTik.')
     except Exception as e:
         logger.error(f"Error deleting User {user_id} in MikroTik: {e}", exc_info=True)
         raise
@@ -331,10 +568,32 @@ def delete_user_in_mikrotik(user_id):
 #         logger.error(f"Error creating Profile {profile_id} in MikroTik: {e}", exc_info=True)
 #         raise
 @shared_task
+@mikrotik_push('profile', 'create')
 def create_profile_in_mikrotik(profile_id):
     """Create a new profile in MikroTik."""
     try:
+        mikrotik_manager = get_mikrotik_manager()
         profile = Profile.objects.get(id=profile_id)
+        version = profile.local_version
+        if profile.mikrotik_id:
+            logger.info(f'Profile {profile.name} already exists in MikroTik as {profile.mikrotik_id}.')
+            return
+
+        existing_id = lookup_router_id(mikrotik_manager, 'profile', profile.name)
+        if existing_id:
+            # A previous delivery already created it; adopt it and bring it up to date.
+            mikrotik_manager.update_profile(
+                profile_id=existing_id,
+                name_for_users=profile.name_for_users,
+                price=str(profile.price),
+                starts_when=profile.starts_when,
+                validity=profile.validity,
+                override_shared_users=profile.override_shared_users
+            )
+            mark_pushed(profile, version, mikrotik_id=existing_id)
+            logger.info(f'Adopted existing MikroTik profile {profile.name} ({existing_id}).')
+            return
+
         logger.info(f'Creating profile in MikroTik: {profile}')
 
         response = mikrotik_manager.create_profile(
@@ -347,8 +606,8 @@ def create_profile_in_mikrotik(profile_id):
         )
 
         if response is not None:
-            profile.mikrotik_id = response['.id']  # Save MikroTik ID
-            profile.save()
+            mark_pushed(profile, version, mikrotik_id=response['.id'])  # Save MikroTik ID
+            remember_router_id(mikrotik_manager, 'profile', profile.name, response['.id'])
             logger.info(f'Successfully created profile {profile.name} in MikroTik with ID {response[".id"]}.')
         else:
             logger.error(f'Failed to create profile {profile.name} in MikroTik: No response received.')
@@ -361,41 +620,46 @@ def create_profile_in_mikrotik(profile_id):
 
 
 @shared_task
+@mikrotik_push('profile', 'update')
 def update_profile_in_mikrotik(profile_id):
     """Update an existing profile in MikroTik."""
     try:
-        profile = Profile.objects.get(id=profile_id)
-        if profile.mikrotik_id:
-            mikrotik_manager.update_profile(
-                profile_id=profile.mikrotik_id,
-                name_for_users=profile.name_for_users,
-                price=str(profile.price),
-                starts_when=profile.starts_when,
-                validity=profile.validity,
-                override_shared_users=profile.override_shared_users
-            )
-            logger.info(f'Updated profile {profile.name} in MikroTik.')
-        else:
-            logger.warning(f"Profile {profile.name} does not have a MikroTik ID.")
+        mikrotik_manager = get_mikrotik_manager()
+        # Claimed so a concurrent sync cannot interleave its read-modify-write with ours
+        with claim_row(Profile, profile_id) as profile:
+            version = profile.local_version
+            if profile.mikrotik_id:
+                mikrotik_manager.update_profile(
+                    profile_id=profile.mikrotik_id,
+                    name_for_users=profile.name_for_users,
+                    price=str(profile.price),
+                    starts_when=profile.starts_when,
+                    validity=profile.validity,
+                    override_shared_users=profile.override_shared_users
+                )
+                mark_pushed(profile, version)
+                logger.info(f'Updated profile {profile.name} in MikroTik.')
+            else:
+                logger.warning(f"Profile {profile.name} does not have a MikroTik ID.")
     except Profile.DoesNotExist:
         logger.error(f'Profile with ID {profile_id} does not exist.')
+    except RowBusy:
+        raise
     except Exception as e:
         logger.error(f"Error updating Profile {profile_id} in MikroTik: {e}", exc_info=True)
         raise
 
 
 @shared_task
-def delete_profile_in_mikrotik(profile_id):
-    """Delete a profile in MikroTik."""
+@mikrotik_push('profile', 'delete')
+def delete_profile_in_mikrotik(profile_id, mikrotik_id=None):
+    """Delete a profile in MikroTik; the row is already deleted locally."""
     try:
-        profile = Profile.objects.get(id=profile_id)
-        if profile.mikrotik_id:
-            mikrotik_manager.delete_profile(profile_id=profile.mikrotik_id)
-            logger.info(f'Deleted profile {profile.name} in MikroTik.')
-        else:
-            logger.warning(f"Profile {profile.name} does not have a MikroTik ID.")
-    except Profile.DoesNotExist:
-        logger.error(f'Profile with ID {profile_id} does not exist.')
+        if not mikrotik_id:
+            logger.info(f"Profile {profile_id} was never created in MikroTik; nothing to delete.")
+            return
+        get_mikrotik_manager().delete_profile(profile_id=mikrotik_id)
+        logger.info(f'Deleted Profile {profile_id} ({mikrotik_id}) in MikroTik.')
     except Exception as e:
         logger.error(f"Error deleting Profile {profile_id} in MikroTik: {e}", exc_info=True)
         raise
@@ -403,18 +667,25 @@ def delete_profile_in_mikrotik(profile_id):
 
 # --- UserProfile
 @shared_task
+@mikrotik_push('user_profile', 'create')
 def create_user_profile_in_mikrotik(user_profile_id):
     """Create a user profile in MikroTik."""
     try:
+        mikrotik_manager = get_mikrotik_manager()
         user_profile = UserProfile.objects.get(id=user_profile_id)
+        version = user_profile.local_version
+        if user_profile.mikrotik_id:
+            logger.info(f'UserProfile {user_profile_id} already exists in MikroTik as {user_profile.mikrotik_id}.')
+            return
+
         response = mikrotik_manager.create_user_profile(
             user=user_profile.user.username,
             profile=user_profile.profile.name,
             # state=user_profile.state,
             # end_time=user_profile.end_time
         )
-        user_profile.mikrotik_id = response['.id']  # Save MikroTik ID
-        user_profile.save()
+        # The router fills in state and end-time itself; the next pull brings them back.
+        mark_pushed(user_profile, version, sent_state=False, mikrotik_id=response['.id'])  # Save MikroTik ID
         logger.info(f'Created UserProfile {user_profile_id} for user {user_profile.user.username} in MikroTik.')
     except UserProfile.DoesNotExist:
         logger.error(f'UserProfile with ID {user_profile_id} does not exist.')
@@ -424,38 +695,43 @@ def create_user_profile_in_mikrotik(user_profile_id):
 
 
 @shared_task
+@mikrotik_push('user_profile', 'update')
 def update_user_profile_in_mikrotik(user_profile_id):
     """Update a user profile in MikroTik."""
     try:
-        user_profile = UserProfile.objects.get(id=user_profile_id)
-        if user_profile.mikrotik_id:
-            mikrotik_manager.update_user_profile(
-                user_profile_id=user_profile.mikrotik_id,
-                state=user_profile.state,
-                end_time=user_profile.end_time
-            )
-            logger.info(f'Updated UserProfile {user_profile_id} in MikroTik.')
-        else:
-            logger.warning(f"UserProfile {user_profile_id} does not have a MikroTik ID.")
+        mikrotik_manager = get_mikrotik_manager()
+        # Claimed so a concurrent sync cannot interleave its read-modify-write with ours
+        with claim_row(UserProfile, user_profile_id) as user_profile:
+            version = user_profile.local_version
+            if user_profile.mikrotik_id:
+                mikrotik_manager.update_user_profile(
+                    user_profile_id=user_profile.mikrotik_id,
+                    state=user_profile.state,
+                    end_time=format_datetime(user_profile.end_time)
+                )
+                mark_pushed(user_profile, version)
+                logger.info(f'Updated UserProfile {user_profile_id} in MikroTik.')
+            else:
+                logger.warning(f"UserProfile {user_profile_id} does not have a MikroTik ID.")
     except UserProfile.DoesNotExist:
         logger.error(f'UserProfile with ID {user_profile_id} does not exist.')
+    except RowBusy:
+        raise
     except Exception as e:
         logger.error(f"Error updating UserProfile {user_profile_id} in MikroTik: {e}", exc_info=True)
         raise
 
 
 @shared_task
-def delete_user_profile_in_mikrotik(user_profile_id):
-    """Delete a user profile in MikroTik."""
+@mikrotik_push('user_profile', 'delete')
+def delete_user_profile_in_mikrotik(user_profile_id, mikrotik_id=None):
+    """Delete a user profile in MikroTik; the row is already deleted locally."""
     try:
-        user_profile = UserProfile.objects.get(id=user_profile_id)
-        if user_profile.mikrotik_id:
-            mikrotik_manager.delete_user_profile(user_profile_id=user_profile.mikrotik_id)
-            logger.info(f'Deleted UserProfile {user_profile_id} in MikroTik.')
-        else:
-            logger.warning(f"UserProfile {user_profile_id} does not have a MikroTik ID.")
-    except UserProfile.DoesNotExist:
-        logger.error(f'UserProfile with ID {user_profile_id} does not exist.')
+        if not mikrotik_id:
+            logger.info(f"UserProfile {user_profile_id} was never created in MikroTik; nothing to delete.")
+            return
+        get_mikrotik_manager().delete_user_profile(user_profile_id=mikrotik_id)
+        logger.info(f'Deleted UserProfile {user_profile_id} ({mikrotik_id}) in MikroTik.')
     except Exception as e:
         logger.error(f"Error deleting UserProfile {user_profile_id} in MikroTik: {e}", exc_info=True)
         raise
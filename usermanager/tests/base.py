@@ -0,0 +1,12 @@
+# mpi_src/usermanager/tests/base.py
+
+from django.test import TestCase, override_settings
+
+# Redis backs the cache and the channel layer in production; tests use in-process stand-ins
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+INMEMORY_CHANNELS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=INMEMORY_CHANNELS)
+class LocalServicesTestCase(TestCase):
+    """A TestCase for code that touches the cache or pushes to WebSocket groups."""
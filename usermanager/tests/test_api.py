@@ -0,0 +1,94 @@
+# mpi_src/usermanager/tests/test_api.py
+
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, Session, User, UserProfile
+from usermanager.routeros import RouterSession
+from usermanager.tasks import sync_sessions
+from usermanager.tests.base import LocalServicesTestCase
+
+RESOURCE_TABLES = ('usermanager_profile', 'usermanager_userprofile', 'usermanager_session', 'usermanager_payment')
+
+
+class TestJsonApi(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice')
+        self.profile = Profile.objects.create(name='plan-10', name_for_users='10 GB', price='10.00')
+        self.user_profile = UserProfile.objects.create(
+            user=self.user, profile=self.profile, state='running-active', end_time=timezone.now() + timedelta(days=30),
+        )
+        Session.objects.create(
+            session_id='s-1', user=self.user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=2048, upload=512,
+            status='start', started=timezone.now(),
+        )
+        self.client.force_login(self.user)
+
+    def get(self, name, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), headers=headers)
+        return response, [q for q in queries if any(f'"{table}"' in q['sql'] for table in RESOURCE_TABLES)]
+
+    def test_resources_are_served_from_values(self):
+        with patch.object(Profile, 'from_db', side_effect=AssertionError), \
+                patch.object(UserProfile, 'from_db', side_effect=AssertionError), \
+                patch.object(Session, 'from_db', side_effect=AssertionError), \
+                patch.object(Payment, 'from_db', side_effect=AssertionError):
+            plans = self.client.get(reverse('api_plans')).json()['plans']
+            plan = self.client.get(reverse('api_current_plan')).json()['plan']
+            sessions = self.client.get(reverse('api_sessions')).json()['sessions']
+            payments = self.client.get(reverse('api_payments')).json()['payments']
+        self.assertEqual([(row['name_for_users'], row['price']) for row in plans], [('10 GB', '10.00')])
+        self.assertEqual(plan[0]['plan'], 'plan-10')
+        self.assertEqual((sessions[0]['session_id'], sessions[0]['download']), ('s-1', 2048))
+        self.assertEqual(payments, [])
+
+    def test_unchanged_poll_is_304_without_resource_queries(self):
+        for name in ('api_plans', 'api_current_plan', 'api_sessions', 'api_payments'):
+            response, _ = self.get(name)
+            self.assertEqual(response.status_code, 200)
+            response, queries = self.get(name, if_none_match=response['ETag'])
+            self.assertEqual(response.status_code, 304, name)
+            self.assertEqual(queries, [], name)
+            self.assertIn('ETag', response)
+
+    def test_changes_move_the_etag(self):
+        response, _ = self.get('api_payments')
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(
+                user=self.user, user_profile=self.user_profile, profile=self.profile, copy_from='auto',
+                trans_status='completed', trans_start=timezone.now(), price='10.00',
+            )
+        changed, _ = self.get('api_payments', if_none_match=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['payments'][0]['plan'], 'plan-10')
+        # Other resources keep their ETag
+        response, _ = self.get('api_sessions')
+        self.assertEqual(self.get('api_sessions', if_none_match=response['ETag'])[0].status_code, 304)
+
+    def test_sync_touches_only_users_whose_sessions_changed(self):
+        session = Session.objects.get(session_id='s-1')
+        manager = MagicMock()
+        for download, touched in ((2048, False), (4096, True)):
+            manager.get_sessions.return_value = [RouterSession(
+                '*1', 's-1', 'alice', None, '1', 'wireless', 'AA:BB', '10.5.50.2', download, 512,
+                timedelta(minutes=5), 'start', session.started, None, None, None,
+            )]
+            with patch('usermanager.tasks.touch_resources') as touch, \
+                    patch('usermanager.tasks.refresh_dashboard') as refresh:
+                sync_sessions(manager)
+            self.assertEqual(touch.called, touched, download)
+            self.assertEqual(refresh.called, touched, download)
+
+    def test_signed_out_is_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_sessions')).status_code, 401)
@@ -0,0 +1,133 @@
+# mpi_src/usermanager/tests/test_backlog.py
+
+import uuid
+from unittest.mock import MagicMock, patch
+
+from usermanager.backlog import park_push, replay_backlog
+from usermanager.mikrotik_userman import MikroTikUnavailable
+from usermanager.models import PendingPush, Profile
+from usermanager.tasks import PUSH_HANDLERS, delete_profile_in_mikrotik
+from usermanager.tests.base import LocalServicesTestCase
+
+ROUTER = 'http://192.168.88.1'
+
+
+class TestParkPush(LocalServicesTestCase):
+
+    def test_update_after_create_is_compacted_into_create(self):
+        object_id = uuid.uuid4()
+        park_push(ROUTER, 'user', object_id, 'create')
+        park_push(ROUTER, 'user', object_id, 'update')
+        park_push(ROUTER, 'user', object_id, 'update')
+
+        self.assertEqual(PendingPush.objects.count(), 1)
+        self.assertEqual(PendingPush.objects.get().action, 'create')
+
+    def test_create_then_delete_cancels_out(self):
+        object_id = uuid.uuid4()
+        park_push(ROUTER, 'profile', object_id, 'create')
+        park_push(ROUTER, 'profile', object_id, 'delete')
+
+        self.assertFalse(PendingPush.objects.exists())
+
+    def test_update_then_delete_keeps_delete(self):
+        object_id = uuid.uuid4()
+        park_push(ROUTER, 'profile', object_id, 'update')
+        park_push(ROUTER, 'profile', object_id, 'delete')
+
+        self.assertEqual(PendingPush.objects.get().action, 'delete')
+
+
+class TestReplayBacklog(LocalServicesTestCase):
+
+    def setUp(self):
+        self.manager = MagicMock(router_ip=ROUTER)
+        self.manager.ping.return_value = True
+
+    def test_no_probe_when_backlog_is_empty(self):
+        self.assertEqual(replay_backlog(self.manager, {}), 0)
+        self.manager.ping.assert_not_called()
+
+    def test_router_still_down_keeps_backlog(self):
+        park_push(ROUTER, 'user', uuid.uuid4(), 'create')
+        self.manager.ping.return_value = False
+        handler = MagicMock()
+
+        self.assertEqual(replay_backlog(self.manager, {('user', 'create'): handler}), 0)
+        handler.assert_not_called()
+        self.assertEqual(PendingPush.objects.count(), 1)
+
+    def test_replays_in_dependency_order(self):
+        calls = []
+        user_profile_id, profile_id, user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        park_push(ROUTER, 'user_profile', user_profile_id, 'create')
+        park_push(ROUTER, 'profile', profile_id, 'create')
+        park_push(ROUTER, 'user', user_id, 'create')
+        handlers = {
+            (model, 'create'): (lambda object_id, model=model: calls.append(model))
+            for model in ('user', 'profile', 'user_profile')
+        }
+
+        self.assertEqual(replay_backlog(self.manager, handlers), 3)
+        self.assertEqual(calls, ['user', 'profile', 'user_profile'])
+        self.assertFalse(PendingPush.objects.exists())
+
+    def test_stops_at_first_outage(self):
+        park_push(ROUTER, 'user', uuid.uuid4(), 'create')
+        park_push(ROUTER, 'profile', uuid.uuid4(), 'create')
+        handlers = {
+            ('user', 'create'): MagicMock(side_effect=MikroTikUnavailable('down again')),
+            ('profile', 'create'): MagicMock(),
+        }
+
+        self.assertEqual(replay_backlog(self.manager, handlers), 0)
+        handlers[('profile', 'create')].assert_not_called()
+        self.assertEqual(PendingPush.objects.count(), 2)
+
+    @patch('usermanager.backlog.settings')
+    def test_failing_push_is_dropped_after_max_attempts(self, mock_settings):
+        mock_settings.MIKROTIK_BACKLOG_MAX_ATTEMPTS = 2
+        park_push(ROUTER, 'user', uuid.uuid4(), 'update')
+        handlers = {('user', 'update'): MagicMock(side_effect=RuntimeError('HTTP 400'))}
+
+        replay_backlog(self.manager, handlers)
+        self.assertEqual(PendingPush.objects.get().attempts, 1)
+        replay_backlog(self.manager, handlers)
+        self.assertFalse(PendingPush.objects.exists())
+
+
+class TestParkedDeletes(LocalServicesTestCase):
+    """Deletes are enqueued by post_delete, after the row is gone."""
+
+    def setUp(self):
+        self.manager = MagicMock(router_ip=ROUTER)
+        self.manager.delete_profile.side_effect = MikroTikUnavailable('down')
+        patcher = patch('usermanager.tasks.get_mikrotik_manager', return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def delete(self, profile):
+        # Run the enqueued task in place
+        with patch('usermanager.tasks.delete_profile_in_mikrotik.delay',
+                   side_effect=lambda *args, **kwargs: delete_profile_in_mikrotik(*args, **kwargs)), \
+                self.captureOnCommitCallbacks(execute=True):
+            profile.delete()
+
+    def test_parked_delete_reaches_the_router_by_its_id(self):
+        with patch('usermanager.tasks.create_profile_in_mikrotik.delay'):
+            profile = Profile.objects.create(name='plan-10', price='10.00', mikrotik_id='*7')
+        self.delete(profile)
+        self.assertEqual(PendingPush.objects.values_list('action', 'mikrotik_id').get(), ('delete', '*7'))
+
+        self.manager.delete_profile.side_effect = None
+        self.manager.ping.return_value = True
+        self.assertEqual(replay_backlog(self.manager, PUSH_HANDLERS), 1)
+        self.manager.delete_profile.assert_called_with(profile_id='*7')  # the first try hit the outage
+        self.assertFalse(PendingPush.objects.exists())
+
+    def test_created_and_deleted_while_down_cancels_out(self):
+        with patch('usermanager.tasks.create_profile_in_mikrotik.delay'):
+            profile = Profile.objects.create(name='plan-10', price='10.00')
+        park_push(ROUTER, 'profile', profile.pk, 'create')
+        self.delete(profile)
+        self.assertFalse(PendingPush.objects.exists())
@@ -0,0 +1,85 @@
+# mpi_src/usermanager/tests/test_catalogue.py
+
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from usermanager.catalogue import catalogue_version, plan_catalogue
+from usermanager.models import Profile, User
+from usermanager.routeros import RouterProfile
+from usermanager.tasks import sync_profiles
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class TestPlanCatalogue(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.plan = Profile.objects.create(name='plan-10', name_for_users='10 GB', price='10.00')
+        self.user = User.objects.create(username='root', is_staff=True, is_superuser=True)
+        self.client.force_login(self.user)
+
+    def profile_queries(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        return response, [q for q in queries if 'FROM "usermanager_profile"' in q['sql']]
+
+    def test_plans_page_reads_the_cache_and_revalidates(self):
+        self.client.get(reverse('profile_list'))
+        response, queries = self.profile_queries(reverse('profile_list'))
+        self.assertEqual(queries, [])
+        self.assertContains(response, '10 GB')
+
+        response, _ = self.profile_queries(reverse('profile_list'), if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Last-Modified', response)
+
+    def test_profile_changes_start_a_new_version(self):
+        version = catalogue_version()
+        with patch('usermanager.tasks.create_profile_in_mikrotik.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.create(name='plan-20', name_for_users='20 GB', price='20.00')
+        self.assertGreater(catalogue_version(), version)
+        self.assertEqual([plan.name for plan in plan_catalogue()], ['plan-10', 'plan-20'])
+
+        version = catalogue_version()
+        with patch('usermanager.tasks.delete_profile_in_mikrotik.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(name='plan-20').delete()
+        self.assertGreater(catalogue_version(), version)
+        self.assertEqual(len(plan_catalogue()), 1)
+
+    def test_router_sync_invalidates(self):
+        Profile.objects.filter(pk=self.plan.pk).update(mikrotik_id='*1', synced_version=1, local_version=1)
+        plan_catalogue()
+        manager = MagicMock()
+        manager.get_profiles.return_value = [RouterProfile.from_router(
+            {'.id': '*1', 'name': 'plan-10', 'name-for-users': '10 GB', 'price': '12.00'},
+        )]
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_profiles(manager)
+        self.assertEqual(str(plan_catalogue()[0].price), '12.00')
+
+    def test_manual_sync_invalidates(self):
+        Profile.objects.filter(pk=self.plan.pk).update(mikrotik_id='*1', synced_version=1, local_version=1)
+        plan_catalogue()
+        manager = MagicMock()
+        manager.get_profiles.side_effect = lambda decoder: [decoder(
+            {'.id': '*1', 'name': 'plan-10', 'name-for-users': '10 GB', 'price': '12.00'},
+        )]
+        with patch('usermanager.management.commands.sync_mikrotik.get_mikrotik_manager', return_value=manager), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('sync_mikrotik', stdout=StringIO())
+        # Checkout charges the catalogue price, which fulfil_payment checks against the table
+        self.assertEqual(str(plan_catalogue()[0].price), '12.00')
+
+    def test_admin_plan_dropdown_uses_the_catalogue(self):
+        plan_catalogue()
+        response, queries = self.profile_queries(reverse('admin:usermanager_userprofile_add'))
+        self.assertEqual(queries, [])
+        self.assertContains(response, f'value="{self.plan.pk}"')
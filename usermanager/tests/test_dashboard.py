@@ -0,0 +1,45 @@
+# mpi_src/usermanager/tests/test_dashboard.py
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from usermanager.dashboard import dashboard_key, refresh_dashboard
+from usermanager.models import Profile, Session, User, UserProfile
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class TestDashboardSnapshot(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice')
+        profile = Profile.objects.create(name='plan-10', price='10.00')
+        UserProfile.objects.create(user=self.user, profile=profile, state='running-active')
+        self.client.force_login(self.user)
+
+    def open_session(self, session_id):
+        return Session.objects.create(
+            session_id=session_id, user=self.user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=0, upload=0,
+            status='start', started=timezone.now(),
+        )
+
+    def test_steady_state_hit_only_reads_the_cache(self):
+        self.client.get(reverse('user_detail'))
+        # Only the auth session and user lookups are left
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user_detail'))
+        self.assertEqual(len(response.context['running_active_profiles']), 1)
+
+    def test_refresh_rebuilds_a_cached_snapshot_after_commit(self):
+        self.client.get(reverse('user_detail'))
+        self.open_session('s1')
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_dashboard(self.user.pk)
+        self.assertEqual(len(cache.get(dashboard_key(self.user.pk))['active_sessions']), 1)
+
+    def test_refresh_skips_users_nobody_is_looking_at(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_dashboard(self.user.pk)
+        self.assertIsNone(cache.get(dashboard_key(self.user.pk)))
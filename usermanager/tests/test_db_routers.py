@@ -0,0 +1,90 @@
+# mpi_src/usermanager/tests/test_db_routers.py
+#
+# Routing is checked through QuerySet.db, so these run without a replica. Run with
+# SQLITE_REPLICA_PATH (or DB_REPLICA_HOST) set to also exercise the real second alias,
+# which mirrors default under test.
+
+import time
+import uuid
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, RequestFactory
+from django.views.generic import View
+
+from usermanager.db_routers import (
+    ReplicaReadMixin, PrimaryPinMiddleware, read_from_replica, PIN_COOKIE,
+)
+from usermanager.models import Payment, PendingPush, User
+
+
+class RoutedView(ReplicaReadMixin, View):
+    def get(self, request):
+        return HttpResponse(Payment.objects.all().db)
+
+    def post(self, request):
+        return HttpResponse(Payment.objects.all().db)
+
+
+@patch('usermanager.db_routers.replica_configured', return_value=True)
+class TestReplicaRouting(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_reads_use_replica_only_inside_the_block(self, _):
+        self.assertEqual(Payment.objects.all().db, 'default')
+        with read_from_replica():
+            self.assertEqual(Payment.objects.all().db, 'replica')
+
+    def test_reads_after_a_write_stay_on_primary(self, _):
+        with read_from_replica():
+            User.objects.create(username='alice')
+            self.assertEqual(Payment.objects.all().db, 'default')
+
+    def test_writes_always_go_to_primary(self, _):
+        with read_from_replica():
+            user = User.objects.create(username='alice')
+        self.assertEqual(user._state.db, 'default')
+
+    def test_view_reads_from_replica(self, _):
+        response = RoutedView.as_view()(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+
+    def test_unsafe_methods_and_pinned_browsers_read_primary(self, _):
+        response = RoutedView.as_view()(self.factory.post('/'))
+        self.assertEqual(response.content, b'default')
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = str(time.time() + 5)
+        self.assertEqual(RoutedView.as_view()(request).content, b'default')
+
+        request.COOKIES[PIN_COOKIE] = str(time.time() - 1)  # pin expired
+        self.assertEqual(RoutedView.as_view()(request).content, b'replica')
+
+    def test_middleware_pins_after_a_write(self, _):
+        def signs_up(request):
+            User.objects.create(username='alice')
+            return HttpResponse()
+
+        response = PrimaryPinMiddleware(signs_up)(self.factory.post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = PrimaryPinMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@skipUnless('replica' in settings.DATABASES, 'no replica alias configured')
+class TestReplicaAlias(TransactionTestCase):
+    # Not TestCase: a mirror only sees rows the primary has committed
+    databases = {'default', 'replica'} & set(settings.DATABASES)  # the runner sets up aliases even for skipped tests
+
+    def test_replica_serves_rows_written_to_primary(self):
+        # PendingPush: committing a User would enqueue a push task
+        PendingPush.objects.create(router='r1', model='user', object_id=uuid.uuid4(), action='create')
+        with read_from_replica():
+            queryset = PendingPush.objects.values_list('router', flat=True)
+            self.assertEqual(queryset.db, 'replica')
+            self.assertEqual(list(queryset), ['r1'])
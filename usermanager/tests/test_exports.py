@@ -0,0 +1,91 @@
+# mpi_src/usermanager/tests/test_exports.py
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from usermanager.exports import stream_export
+from usermanager.models import Session, User
+from usermanager.tests.base import LocalServicesTestCase
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class TestExports(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='root', is_staff=True, is_superuser=True)
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.day = timezone.make_aware(datetime(2026, 3, 10, 12))
+        for i in range(5):
+            self.session(f'a-{i}', self.alice, self.day - timedelta(days=i))
+        self.session('b-0', self.bob, self.day)
+
+    def session(self, session_id, user, started):
+        return Session.objects.create(
+            session_id=session_id, user=user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=10, upload=1,
+            status='stop', started=started, ended=started + timedelta(hours=1),
+        )
+
+    def download(self, as_user, **params):
+        self.client.force_login(as_user)
+        response = self.client.get(reverse('export', args=['sessions']), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_is_filtered_by_day_and_user(self):
+        response, body = self.download(self.admin, since='2026-03-08', until='2026-03-09', user='alice')
+        self.assertIn('sessions-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual([row['session_id'] for row in rows], ['a-2', 'a-1'])  # oldest first
+        self.assertEqual(rows[0]['user'], 'alice')
+
+    def test_users_export_only_their_own_rows(self):
+        _, body = self.download(self.bob, user='alice', format='jsonl')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['session_id'] for row in rows], ['b-0'])
+        self.assertEqual(rows[0]['download'], 10)
+
+    def test_gzip_on_the_fly(self):
+        _, plain = self.download(self.admin)
+        response, compressed = self.download(self.admin, gzip=1)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+    def test_output_is_streamed_in_pieces(self):
+        with patch('usermanager.exports.BUFFER_SIZE', 100):
+            chunks = list(stream_export('sessions'))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(b''.join(chunks).decode().count('\n'), 7)  # header and six rows
+
+    def test_unknown_export_is_404(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['sessions']), {'format': 'xml'}).status_code, 404)
+
+    def test_invalid_filter_is_400(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['sessions']), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.json()['errors'])
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sessions.csv.gz')
+            call_command('export_usermanager', 'sessions', '--gzip', '--user', 'bob', '-o', path, stderr=io.StringIO())
+            with gzip.open(path, 'rt') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([row['session_id'] for row in rows], ['b-0'])
@@ -0,0 +1,55 @@
+# mpi_src/usermanager/tests/test_idempotency.py
+
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+
+from usermanager.models import User
+from usermanager.tasks import create_user_in_mikrotik
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class TestIdempotentPush(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = MagicMock(router_ip='http://192.168.88.1')
+        self.manager.get_users.return_value = []
+        self.manager.create_user.return_value = {'.id': '*A'}
+        patcher = patch('usermanager.tasks.get_mikrotik_manager', return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(username='alice', plain_password='secret')
+
+    def test_redelivered_create_is_skipped(self):
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+
+        self.manager.create_user.assert_called_once()
+        self.assertEqual(User.objects.get().mikrotik_id, '*A')
+
+    def test_duplicate_skipped_within_window_even_before_db_marker(self):
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+        User.objects.filter(pk=self.user.pk).update(synced_version=0, mikrotik_id=None)
+
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+        self.manager.create_user.assert_called_once()
+
+    def test_create_adopts_object_already_on_router(self):
+        self.manager.get_users.return_value = [{'name': 'alice', '.id': '*7'}]
+
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+
+        self.manager.create_user.assert_not_called()
+        self.manager.update_user.assert_called_once()
+        self.assertEqual(User.objects.get().mikrotik_id, '*7')
+
+    def test_failed_push_can_be_retried(self):
+        self.manager.create_user.side_effect = [RuntimeError('HTTP 500'), {'.id': '*A'}]
+
+        with self.assertRaises(RuntimeError):
+            create_user_in_mikrotik(self.user.id, self.user.local_version)
+        create_user_in_mikrotik(self.user.id, self.user.local_version)
+
+        self.assertEqual(self.manager.create_user.call_count, 2)
+        self.assertEqual(User.objects.get().mikrotik_id, '*A')
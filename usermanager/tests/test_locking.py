@@ -0,0 +1,65 @@
+# mpi_src/usermanager/tests/test_locking.py
+
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
+from django.db.models import F
+
+from usermanager.locking import claim_rows, claim_row, RowBusy
+from usermanager.models import Profile, UserProfile, User
+from usermanager.routeros import RouterUserProfile
+from usermanager.tasks import sync_user_profiles, update_user_profile_in_mikrotik
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class TestRowClaims(LocalServicesTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+        self.user_profile = UserProfile.objects.create(
+            user=self.user, profile=self.profile, mikrotik_id='*1', state='waiting',
+        )
+        UserProfile.objects.update(synced_version=F('local_version'))  # already on the router
+        self.manager = MagicMock(router_ip='http://192.168.88.1')
+        patcher = patch('usermanager.tasks.get_mikrotik_manager', return_value=self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_contended_rows_are_skipped_not_waited_for(self):
+        with claim_rows(UserProfile.objects.all()) as first:
+            with claim_rows(UserProfile.objects.all()) as second:
+                self.assertEqual(len(first), 1)
+                self.assertEqual(second, [])
+        with claim_rows(UserProfile.objects.all()) as again:
+            self.assertEqual(len(again), 1)
+
+    def test_lease_holds_no_transaction(self):
+        if connection.features.has_select_for_update_skip_locked:
+            self.skipTest('row locks are held by the claiming transaction')
+        with patch('usermanager.locking.transaction.atomic') as atomic, \
+                claim_rows(UserProfile.objects.all()) as claimed:
+            self.assertEqual(len(claimed), 1)
+        atomic.assert_not_called()
+
+    def test_claim_row_raises_row_busy(self):
+        with claim_row(UserProfile, self.user_profile.pk):
+            with self.assertRaises(RowBusy):
+                with claim_row(UserProfile, self.user_profile.pk):
+                    pass
+
+    def test_push_skips_row_claimed_by_sync(self):
+        with claim_rows(UserProfile.objects.all()):
+            update_user_profile_in_mikrotik(self.user_profile.pk, self.user_profile.local_version)
+        self.manager.update_user_profile.assert_not_called()
+
+    def test_sync_skips_row_claimed_by_push(self):
+        self.manager.get_user_profiles.return_value = [
+            RouterUserProfile.from_router({'.id': '*1', 'user': 'alice', 'profile': 'plan-10', 'state': 'running-active'}),
+        ]
+        with claim_row(UserProfile, self.user_profile.pk):
+            sync_user_profiles(self.manager)
+        self.assertEqual(UserProfile.objects.get().state, 'waiting')
+
+        sync_user_profiles(self.manager)  # next cycle
+        self.assertEqual(UserProfile.objects.get().state, 'running-active')
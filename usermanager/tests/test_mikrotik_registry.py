@@ -0,0 +1,51 @@
+# mpi_src/usermanager/tests/test_mikrotik_registry.py
+
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from django.conf import settings
+
+from usermanager import mikrotik_userman
+from usermanager.mikrotik_userman import get_mikrotik_manager, reset_mikrotik_managers
+
+
+class TestMikroTikRegistry(unittest.TestCase):
+
+    def setUp(self):
+        reset_mikrotik_managers()
+
+    def test_one_client_per_router(self):
+        first = get_mikrotik_manager('http://10.0.0.1')
+        self.assertIs(get_mikrotik_manager('http://10.0.0.1'), first)
+        self.assertIsNot(get_mikrotik_manager('http://10.0.0.2'), first)
+
+    def test_client_is_recreated_after_fork(self):
+        parent = get_mikrotik_manager('http://10.0.0.1')
+        with patch.object(mikrotik_userman.os, 'getpid', return_value=-1):
+            child = get_mikrotik_manager('http://10.0.0.1')
+        self.assertIsNot(child, parent)
+        self.assertIsNot(child.session, parent.session)
+
+    def test_importing_tasks_builds_no_client(self):
+        # In a fresh interpreter: this one has imported the tasks already
+        script = (
+            "from unittest.mock import patch\n"
+            "import django\n"
+            "with patch('usermanager.mikrotik_userman.MikroTikUserManager') as manager:\n"
+            "    django.setup()\n"
+            "    import usermanager.tasks\n"
+            "print(manager.call_count)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR.parent, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'mpi.settings'}, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# mpi_src/usermanager/tests/test_pagination.py
+
+from datetime import timedelta
+
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, Session, User, UserProfile
+from usermanager.pagination import keyset_page
+from usermanager.views import PaymentListView, SessionListView
+
+
+class TestKeysetPagination(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.other = User.objects.create(username='bob')
+        self.now = timezone.now().replace(microsecond=123456)
+        # pairs of sessions share a start time: the id breaks the tie
+        for i in range(7):
+            self.session(f's{i}', self.user, self.now - timedelta(minutes=i // 2))
+        self.session('b0', self.other, self.now, nas='10.0.0.2')
+
+    def session(self, session_id, user, started, nas='10.0.0.1'):
+        return Session.objects.create(
+            session_id=session_id, user=user, nas_ip_address=nas, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=0, upload=0,
+            status='start', started=started,
+        )
+
+    def get(self, view_class, as_user, **params):
+        request = RequestFactory().get('/', params)
+        request.user = as_user
+        return view_class.as_view(paginate_by=3)(request).context_data
+
+    def test_pages_walk_every_row_once_and_back(self):
+        ordering = ('-started', '-id')
+        expected = list(Session.objects.filter(user=self.user).order_by(*ordering))
+        seen, cursor, pages = [], None, []
+        while True:
+            page = keyset_page(Session.objects.filter(user=self.user), ordering, 3, cursor)
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        back = keyset_page(Session.objects.filter(user=self.user), ordering, 3, pages[1].previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous())
+
+    def test_list_view_filters_and_never_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            context = self.get(SessionListView, self.user)
+        self.assertEqual(len(context['user_sessions']), 3)
+        self.assertTrue(context['page_obj'].has_next())
+        self.assertFalse(any('COUNT(*)' in query['sql'] for query in queries))  # no paginator count
+
+        admin = User.objects.create(username='root', is_superuser=True)
+        context = self.get(SessionListView, admin, nas='10.0.0.2')
+        self.assertEqual([s.session_id for s in context['user_sessions']], ['b0'])
+        context = self.get(SessionListView, admin, user='bob', until=str(timezone.localdate(self.now)))
+        self.assertEqual([s.session_id for s in context['user_sessions']], ['b0'])
+
+    def test_daily_usage_is_bounded_like_the_list(self):
+        self.session('b-old', self.other, self.now - timedelta(days=60))
+        admin = User.objects.create(username='root', is_superuser=True)
+
+        def sessions(**params):
+            return sum(day['sessions'] for day in self.get(SessionListView, admin, **params)['daily_usage'])
+
+        self.assertEqual(sessions(), 8)  # the last SESSION_USAGE_DAYS only
+        self.assertEqual(sessions(user='bob'), 1)
+        self.assertEqual(sessions(user='bob', since=str(timezone.localdate(self.now) - timedelta(days=90))), 2)
+
+    def test_payment_list_pages_by_start(self):
+        profile = Profile.objects.create(name='plan-10', price='10.00')
+        user_profile = UserProfile.objects.create(user=self.user, profile=profile)
+        for i in range(4):
+            Payment.objects.create(
+                user=self.user, user_profile=user_profile, copy_from='auto', trans_status='pending',
+                trans_start=self.now - timedelta(days=i), price='10.00',
+            )
+        first = self.get(PaymentListView, self.user)['page_obj']
+        second = self.get(PaymentListView, self.user, cursor=first.next_cursor)['page_obj']
+        self.assertEqual(len(first) + len(second), 4)
+        self.assertFalse(second.has_next())
+
+    def test_garbage_cursor_is_404(self):
+        with self.assertRaises(Http404):
+            self.get(SessionListView, self.user, cursor='not-a-cursor')
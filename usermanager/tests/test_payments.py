@@ -0,0 +1,100 @@
+# mpi_src/usermanager/tests/test_payments.py
+
+import hashlib
+import hmac
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from usermanager.models import Payment, Profile, User, UserProfile
+from usermanager.payments import AmountMismatch, fulfil_payment, record_pending_payment
+from usermanager.tests.base import LocalServicesTestCase
+
+
+@override_settings(PAYSTACK_SECRET_KEY='sk_test')
+class TestPaystackWebhook(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+
+    def event(self, name='charge.success', **data):
+        data.setdefault('metadata', {'user_id': str(self.user.pk), 'profile_id': str(self.profile.pk)})
+        return json.dumps({'event': name, 'data': dict({'reference': 'ref-1', 'amount': 1000}, **data)}).encode()
+
+    def post(self, body, key='sk_test'):
+        signature = hmac.new(key.encode(), body, hashlib.sha512).hexdigest()
+        with patch('usermanager.views.fulfil_paystack_payment.delay') as fulfil:
+            response = self.client.post(reverse('paystack_webhook'), body, content_type='application/json',
+                                        headers={'x-paystack-signature': signature})
+        return response, fulfil
+
+    def test_signed_charge_is_queued(self):
+        response, fulfil = self.post(self.event())
+        self.assertEqual(response.status_code, 200)
+        fulfil.assert_called_once_with('ref-1', str(self.user.pk), str(self.profile.pk), 1000)
+
+    def test_bad_signature_is_rejected(self):
+        response, fulfil = self.post(self.event(), key='sk_forged')
+        self.assertEqual(response.status_code, 401)
+        fulfil.assert_not_called()
+
+    def test_malformed_and_other_events(self):
+        response, fulfil = self.post(b'{"event": "charge.success"}')
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.post(self.event('transfer.success'))
+        self.assertEqual(response.status_code, 200)
+        response, _ = self.post(self.event(metadata=None))
+        self.assertEqual(response.status_code, 200)
+        fulfil.assert_not_called()
+
+
+class TestFulfilPayment(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+
+    def test_each_reference_is_fulfilled_once(self):
+        payment, created = fulfil_payment('ref-1', self.user.pk, self.profile.pk, 1000)
+        self.assertTrue(created)
+        self.assertEqual(str(payment.price), '10.00')
+
+        again, created = fulfil_payment('ref-1', self.user.pk, self.profile.pk, 1000)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, payment.pk)
+        self.assertEqual(Payment.objects.filter(paystack_reference='ref-1').count(), 1)
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+
+    def test_short_payment_is_flagged_not_granted(self):
+        with self.assertRaises(AmountMismatch):
+            fulfil_payment('ref-1', self.user.pk, self.profile.pk, 500)
+        self.assertEqual(Payment.objects.get().trans_status, 'flagged')
+        self.assertFalse(UserProfile.objects.exists())
+        # Flagged once: later reports of the charge find it settled
+        self.assertEqual(fulfil_payment('ref-1', self.user.pk, self.profile.pk, 500)[1], False)
+
+    def test_pending_checkout_is_held_to_its_quoted_price(self):
+        record_pending_payment('ref-1', self.user, self.profile)
+        Profile.objects.filter(pk=self.profile.pk).update(price='12.00')
+        payment, created = fulfil_payment('ref-1', self.user.pk, self.profile.pk, 1000)
+        self.assertTrue(created)
+        self.assertEqual((payment.trans_status, str(payment.price)), ('completed', '10.00'))
+        self.assertEqual(Payment.objects.get().user_profile.profile, self.profile)
+
+    def test_renewal_grants_the_plan_again(self):
+        with patch('usermanager.tasks.create_user_profile_in_mikrotik.delay') as push, \
+                self.captureOnCommitCallbacks(execute=True):
+            first, _ = fulfil_payment('ref-1', self.user.pk, self.profile.pk, 1000)
+        with patch('usermanager.tasks.create_user_profile_in_mikrotik.delay') as renewal_push, \
+                self.captureOnCommitCallbacks(execute=True):
+            renewal, _ = fulfil_payment('ref-2', self.user.pk, self.profile.pk, 1000)
+        self.assertNotEqual(renewal.user_profile_id, first.user_profile_id)
+        push.assert_called_once()
+        renewal_push.assert_called_once()
+        self.assertEqual(renewal_push.call_args.args[0], renewal.user_profile_id)
@@ -0,0 +1,157 @@
+# mpi_src/usermanager/tests/test_paystack_client.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from usermanager.models import Payment, Profile, User
+from usermanager.paystack_client import PaystackClient, PaystackError, PaystackUnavailable
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class StandInPaystack(BaseHTTPRequestHandler):
+    """Just enough of the Paystack API, keep-alive included."""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    transactions = []  # the listing, newest first
+    charges = {}  # reference: what verify reports beyond the defaults
+    pages_served = []
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.connections.add(self.client_address)
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if request['amount'] <= 0:
+            return self.answer(400, {'status': False, 'message': 'Invalid amount'})
+        self.answer(200, {'status': True, 'data': {
+            'authorization_url': f"https://checkout.paystack.test/{request['reference']}",
+            'reference': request['reference'],
+        }})
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        url = urlsplit(self.path)
+        if url.path == '/transaction':
+            return self.list_transactions(parse_qs(url.query))
+        reference = self.path.rsplit('/', 1)[-1]
+        if reference == 'slow':
+            time.sleep(1)
+        status = 'failed' if reference == 'declined' else 'success'
+        data = {'reference': reference, 'status': status, 'amount': 1000}
+        self.answer(200, {'status': True, 'data': dict(data, **self.charges.get(reference, {}))})
+
+
+    def list_transactions(self, query):
+        page, per_page = int(query['page'][0]), int(query['perPage'][0])
+        self.pages_served.append(page)
+        rows = self.transactions[(page - 1) * per_page:page * per_page]
+        page_count = -(-len(self.transactions) // per_page)
+        self.answer(200, {'status': True, 'data': rows, 'meta': {
+            'total': len(self.transactions), 'page': page, 'perPage': per_page, 'pageCount': page_count,
+        }})
+
+
+class GatewayMixin:
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gateway = ThreadingHTTPServer(('127.0.0.1', 0), StandInPaystack)
+        cls.gateway.daemon_threads = True
+        threading.Thread(target=cls.gateway.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.gateway.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.gateway.shutdown()
+        cls.gateway.server_close()
+        super().tearDownClass()
+
+
+class TestPaystackClient(GatewayMixin, SimpleTestCase):
+
+    def setUp(self):
+        StandInPaystack.connections.clear()
+        self.client = PaystackClient('sk_test', base_url=self.base_url, timeout=(1, 0.3))
+        self.addCleanup(self.client.close)
+
+    def test_calls_share_one_keep_alive_connection(self):
+        self.client.initialize_transaction('a@example.com', 1000, 'ref-1', 'http://portal/verify')
+        self.client.verify_transaction('ref-1')
+        self.client.verify_transaction('ref-2')
+        self.assertEqual(len(StandInPaystack.connections), 1)
+
+    def test_slow_gateway_times_out(self):
+        started = time.monotonic()
+        with self.assertRaises(PaystackUnavailable):
+            self.client.verify_transaction('slow')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_refusal_carries_status_and_details(self):
+        with self.assertRaises(PaystackError) as raised:
+            self.client.initialize_transaction('a@example.com', 0, 'ref-1', 'http://portal/verify')
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual(raised.exception.details['message'], 'Invalid amount')
+
+
+class TestAsyncPaymentViews(GatewayMixin, LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        StandInPaystack.charges = {}
+        patcher = override_settings(PAYSTACK_BASE_URL=self.base_url)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+
+    async def test_initiate_redirects_to_checkout(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('initiate_payment', args=[self.profile.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('https://checkout.paystack.test/'))
+        payment = await Payment.objects.aget(user=self.user)
+        self.assertEqual((payment.trans_status, str(payment.price)), ('pending', '10.00'))
+
+    async def verify(self, reference, **params):
+        with patch('usermanager.views.fulfil_paystack_payment.delay') as fulfil:
+            response = await self.async_client.get(reverse('verify_payment'), dict(params, reference=reference))
+        return response, fulfil
+
+    async def test_verify_grants_what_the_transaction_paid_for(self):
+        expensive = await Profile.objects.acreate(name='plan-50', price='50.00')
+        StandInPaystack.charges['ref-1'] = {'metadata': {'user_id': str(self.user.pk), 'profile_id': str(self.profile.pk)}}
+        # Tampering with the callback URL changes nothing
+        response, fulfil = await self.verify('ref-1', user_id=self.user.pk, profile_id=expensive.pk)
+        self.assertRedirects(response, reverse('payment_success'), fetch_redirect_response=False)
+        fulfil.assert_called_once_with('ref-1', str(self.user.pk), str(self.profile.pk), 1000)
+
+        response, fulfil = await self.verify('declined')
+        self.assertRedirects(response, reverse('payment_failed'), fetch_redirect_response=False)
+        fulfil.assert_not_called()
+
+    async def test_verify_refuses_short_payments(self):
+        StandInPaystack.charges['short'] = {
+            'amount': 500, 'metadata': {'user_id': str(self.user.pk), 'profile_id': str(self.profile.pk)},
+        }
+        response, fulfil = await self.verify('short')
+        self.assertRedirects(response, reverse('payment_failed'), fetch_redirect_response=False)
+        # Still handed on, so the task records the charge as flagged
+        fulfil.assert_called_once_with('short', str(self.user.pk), str(self.profile.pk), 500)
@@ -0,0 +1,99 @@
+# mpi_src/usermanager/tests/test_pruning.py
+
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from usermanager.models import Payment, PendingPush, Profile, Session, TrafficRollup, User, UserProfile
+from usermanager.pruning import prune, delete_user_in_chunks, estimate, _checkpoint_key
+from usermanager.tests.base import LocalServicesTestCase
+
+RETENTION = {'traffic': 30, 'daily_usage': 365, 'payments': 30}
+
+
+@override_settings(PRUNE_RETENTION_DAYS=RETENTION, PRUNE_CHUNK_SIZE=2, PRUNE_CHUNK_SLEEP=0)
+class TestPruning(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+        self.user_profile = UserProfile.objects.create(user=self.user, profile=self.profile)
+        self.now = timezone.now()
+
+    def session(self, session_id, days_ago):
+        started = self.now - timedelta(days=days_ago)
+        return Session.objects.create(
+            session_id=session_id, user=self.user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=10, upload=1,
+            status='stop', started=started, ended=started + timedelta(hours=1),
+        )
+
+    def payment(self, status, days_ago):
+        return Payment.objects.create(
+            user=self.user, user_profile=self.user_profile, copy_from='auto', trans_status=status,
+            trans_start=self.now - timedelta(days=days_ago), price='10.00',
+        )
+
+    def test_deletes_only_rows_past_retention(self):
+        for i in range(5):
+            self.payment('failed', 60)
+        recent = self.payment('failed', 5)
+        kept_payment = self.payment('completed', 60)
+        self.session('old', 60)
+        PendingPush.objects.create(router='r1', model='user', object_id=uuid.uuid4(), action='update')
+        PendingPush.objects.create(router='r1', model='user', object_id=self.user.pk, action='update')
+
+        self.assertEqual(estimate(now=self.now)['payments'], (5, 3))
+
+        result = prune(now=self.now)
+
+        self.assertEqual(result['payments'], 5)
+        self.assertNotIn('sessions', result)  # archival's job
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(set(Payment.objects.all()), {recent, kept_payment})
+        self.assertEqual(PendingPush.objects.get().object_id, self.user.pk)
+
+    def test_interrupted_run_resumes_with_its_cutoff(self):
+        for i in range(5):
+            self.payment('failed', 60)
+        self.payment('failed', 20)
+        calls = []
+
+        def flaky_sleep(_):
+            calls.append(1)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+
+        with patch('usermanager.pruning.time.sleep', flaky_sleep), self.assertRaises(KeyboardInterrupt):
+            prune(['payments'], now=self.now, pause=1)
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertIsNotNone(cache.get(_checkpoint_key('payments')))
+
+        # Resumed later, the run still stops at its own cutoff
+        self.assertEqual(prune(['payments'], now=self.now + timedelta(days=15)), {'payments': 1})
+        self.assertIsNone(cache.get(_checkpoint_key('payments')))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_heavy_user_is_deleted_in_chunks(self):
+        for i in range(5):
+            self.session(f's-{i}', 1)
+        self.payment('completed', 1)
+        for i in range(3):
+            TrafficRollup.objects.create(user=self.user, date=(self.now - timedelta(days=i + 10)).date(), download=1)
+        deleted = delete_user_in_chunks(self.user)
+        self.assertEqual((deleted['Session'], deleted['TrafficRollup']), (5, 3))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_command_dry_run_deletes_nothing(self):
+        self.payment('failed', 60)
+        out = StringIO()
+        call_command('prune_usermanager', '--dry-run', '--only', 'payments', stdout=out)
+        self.assertIn('payments: 1 rows in 1 chunks', out.getvalue())
+        self.assertEqual(Payment.objects.count(), 1)
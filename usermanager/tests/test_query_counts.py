@@ -0,0 +1,95 @@
+# mpi_src/usermanager/tests/test_query_counts.py
+
+import uuid
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from usermanager.models import DailyUsage, Payment, PendingPush, Profile, Session, User, UserProfile, UserStats
+from usermanager.tests.base import LocalServicesTestCase
+
+
+# Queries per page, whatever the number of rows. Raise one only with a reason.
+VIEW_BUDGETS = {
+    'user_detail': 7,  # snapshot rebuild; a cached hit is 2
+    'user_profile_list': 3,
+    'payment_list': 3,
+    'session_list': 5,
+}
+ADMIN_BUDGETS = {
+    'user': 6,
+    'profile': 5,
+    'userprofile': 5,
+    'payment': 5,
+    'session': 9,
+    'pendingpush': 6,
+    'dailyusage': 8,
+    'userstats': 5,
+}
+
+
+class TestQueryBudgets(LocalServicesTestCase):
+    """An N+1 on any list page shows up as a query count that grows with the rows."""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='root', is_superuser=True, is_staff=True)
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+        self.client.force_login(self.admin)
+        self.created = 0
+
+    def add_rows(self, count):
+        """``count`` more rows in every table, each under its own user."""
+        start, self.created = self.created, self.created + count
+        now = timezone.now()
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(start, self.created))
+        user_profiles = UserProfile.objects.bulk_create(
+            UserProfile(user=self.admin if i % 2 else user, profile=self.profile, state='running-active')
+            for i, user in enumerate(users)
+        )
+        Payment.objects.bulk_create(
+            Payment(user=self.admin, user_profile=user_profile, profile=self.profile, copy_from='auto',
+                    trans_status='completed', trans_start=now, price='10.00')
+            for user_profile in user_profiles
+        )
+        Session.objects.bulk_create(
+            Session(session_id=f's{start + i}', user=self.admin if i % 2 else user, nas_port_id='1',
+                    nas_port_type='wireless', calling_station_id='AA:BB', user_address='10.5.50.2',
+                    download=1, upload=1, status='start', started=now)
+            for i, user in enumerate(users)
+        )
+        DailyUsage.objects.bulk_create(
+            DailyUsage(user=user, date=date(2024, 1, 1) + timedelta(days=start + i)) for i, user in enumerate(users)
+        )
+        UserStats.objects.bulk_create(UserStats(user=user) for user in users)
+        PendingPush.objects.bulk_create(
+            PendingPush(router='r1', model='user', object_id=uuid.uuid4(), action='update') for _ in users
+        )
+
+    def count_queries(self, url):
+        cache.clear()  # measure the dashboard's cache miss
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assertBudgets(self, pages):
+        self.add_rows(10)
+        small = {name: self.count_queries(url) for name, (url, _) in pages.items()}
+        self.add_rows(990)
+        for name, (url, budget) in pages.items():
+            with self.subTest(page=name):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, small[name], 'query count grows with rows: N+1')
+                self.assertLessEqual(queries, budget)
+
+    def test_views(self):
+        self.assertBudgets({name: (reverse(name), budget) for name, budget in VIEW_BUDGETS.items()})
+
+    def test_admin_changelists(self):
+        self.assertBudgets({
+            name: (reverse(f'admin:usermanager_{name}_changelist'), budget) for name, budget in ADMIN_BUDGETS.items()
+        })
@@ -0,0 +1,53 @@
+# mpi_src/usermanager/tests/test_query_plans.py
+
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+
+from usermanager.models import Payment, Session, User, UserProfile
+from usermanager.dashboard import dashboard_querysets
+from usermanager.pagination import encode_cursor, keyset_queryset
+from usermanager.views import PaymentListView, SessionListView, UserProfileListView
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plan assertions are written against SQLite EXPLAIN QUERY PLAN')
+class TestHotQueryPlans(TestCase):
+    """The dashboard and list queries must be answered from an index, never a table scan."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotRegex(plan, r'\bSCAN usermanager_')
+        self.assertNotIn('TEMP B-TREE', plan)  # the index also gives the ordering
+
+    def test_dashboard_queries(self):
+        context = dashboard_querysets(self.user.pk)
+        self.assertUsesIndex(context['active_sessions'], 'session_user_open_idx')
+        self.assertUsesIndex(context['running_active_profiles'], 'userprofile_user_state_idx')
+        self.assertUsesIndex(context['recent_user_profiles'], 'userprofile_user_end_idx')
+        self.assertUsesIndex(context['recent_user_payments'], 'payment_user_trans_end_idx')
+
+    def test_list_views(self):
+        for view_class, index_name in (
+            (PaymentListView, 'payment_user_trans_start_idx'),
+            (SessionListView, 'session_user_started_idx'),
+            (UserProfileListView, 'userprofile_user_created_idx'),
+        ):
+            with self.subTest(view=view_class.__name__):
+                view = view_class()
+                view.setup(self.request)
+                # any page after the first: the cursor bounds the same index range
+                cursor = encode_cursor([timezone.now(), 1])
+                _, queryset = keyset_queryset(view.get_queryset(), view.keyset_ordering, cursor)
+                self.assertUsesIndex(queryset[:50], index_name)
+
+    def test_admin_status_filter(self):
+        queryset = Payment.objects.filter(trans_status='pending')
+        self.assertUsesIndex(queryset, 'payment_status_trans_end_idx')
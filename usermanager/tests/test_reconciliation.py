@@ -0,0 +1,84 @@
+# mpi_src/usermanager/tests/test_reconciliation.py
+
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, User, UserProfile, UserStats
+from usermanager.payments import record_pending_payment
+from usermanager.paystack_client import PaystackClient
+from usermanager.reconciliation import CHECKPOINT_KEY, reconcile_payments
+from usermanager.tests.test_paystack_client import GatewayMixin, StandInPaystack
+from usermanager.tests.base import LocalServicesTestCase
+
+
+class TestReconciliation(GatewayMixin, LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        # Checkouts below were quoted 10.00; the plan has been repriced since
+        self.profile = Profile.objects.create(name='plan-10', price='12.00')
+        self.user_profile = UserProfile.objects.create(user=self.user, profile=self.profile)
+        metadata = {'user_id': str(self.user.pk), 'profile_id': str(self.profile.pk)}
+        StandInPaystack.pages_served = []
+        StandInPaystack.transactions = [
+            {'reference': 'lost', 'status': 'success', 'amount': 1200, 'metadata': metadata},
+            {'reference': 'pending-paid', 'status': 'success', 'amount': 1000, 'metadata': metadata},
+            {'reference': 'pending-failed', 'status': 'failed', 'amount': 1000, 'metadata': metadata},
+            {'reference': 'short', 'status': 'success', 'amount': 500, 'metadata': metadata},
+            {'reference': 'underpaid', 'status': 'success', 'amount': 100, 'metadata': metadata},
+            {'reference': 'foreign', 'status': 'success', 'amount': 1000, 'metadata': ''},
+            {'reference': 'done', 'status': 'success', 'amount': 1000, 'metadata': metadata},
+            {'reference': 'abandoned', 'status': 'abandoned', 'amount': 1200, 'metadata': metadata},
+        ]
+        for reference in ('pending-paid', 'pending-failed', 'short'):
+            record_pending_payment(reference, self.user, Profile(pk=self.profile.pk, price=Decimal('10.00')))
+        Payment.objects.create(
+            user=self.user, user_profile=self.user_profile, profile=self.profile, copy_from='auto',
+            method='ONLINE', trans_start=timezone.now(), trans_status='completed', price='10.00',
+            paystack_reference='done',
+        )
+        self.client = PaystackClient('sk_test', base_url=self.base_url)
+        self.addCleanup(self.client.close)
+
+    def reconcile(self, **kwargs):
+        return reconcile_payments(client=self.client, per_page=2, pause=0, **kwargs)
+
+    def status(self, reference):
+        return Payment.objects.get(paystack_reference=reference).trans_status
+
+    def test_pages_are_matched_and_settled(self):
+        with patch('usermanager.tasks.create_user_profile_in_mikrotik.delay') as push, \
+                self.captureOnCommitCallbacks(execute=True):
+            result = self.reconcile()
+
+        self.assertEqual(StandInPaystack.pages_served, [1, 2, 3, 4])
+        self.assertEqual(result, {'seen': 8, 'fulfilled': 1, 'completed': 1, 'failed': 1, 'flagged': 2, 'unmatched': 1})
+        self.assertEqual(self.status('lost'), 'completed')
+        # Checked against the quoted price, and granted
+        paid = Payment.objects.get(paystack_reference='pending-paid')
+        self.assertEqual((paid.trans_status, paid.price), ('completed', Decimal('10.00')))
+        self.assertIsNotNone(paid.user_profile_id)
+        self.assertEqual(push.call_count, 2)
+        self.assertEqual(self.status('pending-failed'), 'failed')
+        self.assertEqual(self.status('short'), 'flagged')
+        self.assertIn('charged 500', Payment.objects.get(paystack_reference='short').user_message)
+        self.assertEqual(self.status('underpaid'), 'flagged')
+        self.assertFalse(Payment.objects.filter(paystack_reference__in=['foreign', 'abandoned']).exists())
+        self.assertEqual(str(UserStats.objects.get(user=self.user).total_paid), '32.00')
+
+        # Everything is settled or flagged now: a second run changes nothing
+        self.assertEqual(self.reconcile(), {'seen': 8, 'unmatched': 1})
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        with patch('usermanager.reconciliation.time.sleep', side_effect=KeyboardInterrupt), \
+                self.assertRaises(KeyboardInterrupt):
+            reconcile_payments(client=self.client, per_page=2, pause=1)
+        self.assertEqual(cache.get(CHECKPOINT_KEY)['page'], 2)
+
+        self.assertEqual(self.reconcile()['seen'], 6)
+        self.assertEqual(StandInPaystack.pages_served, [1, 2, 3, 4])
+        self.assertIsNone(cache.get(CHECKPOINT_KEY))
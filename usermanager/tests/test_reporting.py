@@ -0,0 +1,117 @@
+# mpi_src/usermanager/tests/test_reporting.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from usermanager.models import (
+    ClosedDay, DailyUsage, Payment, Profile, RevenueRollup, Session, TrafficRollup, User, UserProfile,
+)
+from usermanager.reporting import (
+    add_ended_session, close_periods, first_open_day, revenue_per_plan, top_users_by_traffic,
+)
+from usermanager.tests.base import LocalServicesTestCase
+
+
+@override_settings(REPORT_CLOSE_AFTER_DAYS=3)
+class TestReporting(LocalServicesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.make_aware(datetime(2026, 3, 10, 12))
+        self.today = timezone.localdate(self.now)
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.plans = {
+            name: Profile.objects.create(name=name, price=price) for name, price in (('plan-10', '10.00'), ('plan-20', '20.00'))
+        }
+        for days_ago, user, plan in ((6, self.alice, 'plan-10'), (6, self.bob, 'plan-10'),
+                                     (5, self.alice, 'plan-20'), (1, self.bob, 'plan-20')):
+            self.payment(user, plan, days_ago)
+        self.payment(self.bob, 'plan-10', 1, status='pending')
+        for i, (days_ago, user, traffic) in enumerate(((6, self.alice, 100), (5, self.bob, 300), (1, self.alice, 50))):
+            self.session(f's-{i}', user, days_ago, traffic)
+        DailyUsage.objects.create(user=self.alice, date=self.today - timedelta(days=6), download=1000, sessions=2)
+
+    def payment(self, user, plan, days_ago, status='completed'):
+        profile = self.plans[plan]
+        user_profile, _ = UserProfile.objects.get_or_create(user=user, profile=profile)
+        moment = self.now - timedelta(days=days_ago)
+        return Payment.objects.create(
+            user=user, user_profile=user_profile, profile=profile, copy_from='auto', trans_status=status,
+            trans_start=moment, trans_end=moment, price=profile.price,
+        )
+
+    def session(self, session_id, user, days_ago, traffic):
+        started = self.now - timedelta(days=days_ago)
+        return Session.objects.create(
+            session_id=session_id, user=user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=traffic, upload=0,
+            status='stop', started=started, ended=started + timedelta(hours=1),
+        )
+
+    def week(self):
+        return self.today - timedelta(days=6), self.today
+
+    def test_closing_materialises_days_past_the_grace_period(self):
+        live_revenue, live_top = revenue_per_plan(*self.week()), top_users_by_traffic(*self.week())
+
+        self.assertEqual(close_periods(now=self.now), 3)  # 6 to 4 days ago
+        self.assertEqual(first_open_day(), self.today - timedelta(days=3))
+        self.assertEqual(close_periods(now=self.now), 0)
+        self.assertEqual(RevenueRollup.objects.get(date=self.today - timedelta(days=6)).payments, 2)
+        self.assertEqual(TrafficRollup.objects.get(user=self.alice).download, 1100)  # both session tiers
+
+        cache.clear()
+        self.assertEqual(revenue_per_plan(*self.week()), live_revenue)
+        self.assertEqual(top_users_by_traffic(*self.week()), live_top)
+
+    def test_reports(self):
+        revenue = [(row['date'], row['plan'], row['payments'], row['revenue']) for row in revenue_per_plan(*self.week())]
+        self.assertEqual(revenue, [
+            (self.today - timedelta(days=6), 'plan-10', 2, Decimal('20.00')),
+            (self.today - timedelta(days=5), 'plan-20', 1, Decimal('20.00')),
+            (self.today - timedelta(days=1), 'plan-20', 1, Decimal('20.00')),
+        ])
+        top = top_users_by_traffic(*self.week(), limit=1)
+        self.assertEqual([(row['username'], row['traffic'], row['sessions']) for row in top], [('alice', 1150, 4)])
+
+    def test_closed_days_are_read_from_rollups(self):
+        close_periods(now=self.now)
+        closed_week = (self.today - timedelta(days=6), self.today - timedelta(days=4))
+        with CaptureQueriesContext(connection) as queries:
+            revenue_per_plan(*closed_week)
+            top_users_by_traffic(*closed_week)
+        self.assertFalse([q for q in queries if 'usermanager_payment' in q['sql'] or 'usermanager_session' in q['sql']])
+
+    def test_new_payments_invalidate_the_cache(self):
+        close_periods(now=self.now)
+        before = sum(row['revenue'] for row in revenue_per_plan(*self.week()))
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.filter(trans_status='pending').update(trans_end=self.now)
+            payment = Payment.objects.get(trans_status='pending')
+            payment.trans_status = 'completed'
+            payment.save()
+        self.assertEqual(sum(row['revenue'] for row in revenue_per_plan(*self.week())), before + Decimal('10.00'))
+        self.assertEqual(ClosedDay.objects.count(), 3)
+
+    def test_session_running_at_close_is_added_when_it_ends(self):
+        running = self.session('s-running', self.bob, 6, 40)
+        Session.objects.filter(pk=running.pk).update(status='start', ended=None, is_open=True)
+        close_periods(now=self.now)
+        day = self.today - timedelta(days=6)
+        self.assertFalse(TrafficRollup.objects.filter(user=self.bob, date=day).exists())
+
+        running.refresh_from_db()
+        running.download, running.status, running.ended = 70, 'stop', self.now
+        running.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(add_ended_session(running))
+        rollup = TrafficRollup.objects.get(user=self.bob, date=day)
+        self.assertEqual((rollup.download, rollup.sessions), (70, 1))
+        self.assertEqual({row['username']: row['traffic'] for row in top_users_by_traffic(day, day)}['bob'], 70)
@@ -0,0 +1,77 @@
+# mpi_src/usermanager/tests/test_routeros.py
+
+import json
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from usermanager.routeros import (
+    parse_duration, format_duration, parse_datetime, format_datetime, RouterSession, RouterUser,
+)
+
+
+class TestDurations(SimpleTestCase):
+
+    def test_parses_router_duration_formats(self):
+        cases = {
+            '1w2d3h4m5s': timedelta(weeks=1, days=2, hours=3, minutes=4, seconds=5),
+            '30d 00:00:00': timedelta(days=30),
+            '2d03:04:05': timedelta(days=2, hours=3, minutes=4, seconds=5),
+            '00:05:10': timedelta(minutes=5, seconds=10),
+            '4m30s250ms': timedelta(minutes=4, seconds=30, milliseconds=250),
+        }
+        for raw, expected in cases.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_duration(raw), expected)
+
+    def test_unlimited_and_garbage_are_none(self):
+        for raw in (None, '', 'unlimited', 'soon'):
+            with self.subTest(raw=raw):
+                self.assertIsNone(parse_duration(raw))
+
+    def test_format_round_trips(self):
+        value = timedelta(weeks=1, days=2, hours=3, minutes=4, seconds=5)
+        self.assertEqual(format_duration(value), '1w2d3h4m5s')
+        self.assertEqual(parse_duration(format_duration(value)), value)
+        self.assertEqual(format_duration(timedelta(0)), '0s')
+
+
+class TestDatetimes(SimpleTestCase):
+
+    def test_parses_iso_and_legacy_dates(self):
+        expected = timezone.make_aware(datetime(2024, 10, 5, 12, 0, 0))
+        self.assertEqual(parse_datetime('2024-10-05 12:00:00'), expected)
+        self.assertEqual(parse_datetime('oct/05/2024 12:00:00'), expected)
+
+    def test_unlimited_is_none(self):
+        self.assertIsNone(parse_datetime('unlimited'))
+        self.assertIsNone(format_datetime(None))
+
+    def test_format_round_trips(self):
+        value = timezone.make_aware(datetime(2024, 10, 5, 12, 0, 0))
+        self.assertEqual(format_datetime(value), '2024-10-05 12:00:00')
+        self.assertEqual(parse_datetime(format_datetime(value)), value)
+
+
+class TestRecords(SimpleTestCase):
+
+    def test_sessions_decode_while_parsing(self):
+        payload = json.dumps([
+            {'.id': '*1', 'acct-session-id': 'a1', 'user': 'alice', 'nas-port-type': 'wireless-802.11',
+             'download': '1200', 'upload': '300', 'uptime': '1h2m', 'status': 'start,interim',
+             'started': '2024-10-05 12:00:00', 'ended': '', 'calling-station-id': 'AA:BB', 'unused': 'x'},
+            {'.id': '*2', 'acct-session-id': 'a2', 'user': 'bob', 'nas-port-type': 'wireless-802.11'},
+        ])
+        first, second = json.loads(payload, object_hook=RouterSession.from_router)
+
+        self.assertEqual((first.download, first.upload), (1200, 300))
+        self.assertEqual(first.uptime, timedelta(hours=1, minutes=2))
+        self.assertEqual(first.started, timezone.make_aware(datetime(2024, 10, 5, 12, 0, 0)))
+        self.assertIsNone(first.ended)
+        self.assertEqual((second.download, second.uptime, second.status), (0, timedelta(0), None))
+        self.assertIs(first.nas_port_type, second.nas_port_type)  # interned, one copy
+
+    def test_user_flags_are_typed(self):
+        user = RouterUser.from_router({'.id': '*7', 'name': 'alice', 'disabled': 'true', 'shared-users': '2'})
+        self.assertEqual((user.id, user.disabled, user.shared_users, user.group), ('*7', True, 2, ''))
@@ -0,0 +1,101 @@
+# mpi_src/usermanager/tests/test_stats.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from usermanager.models import Payment, Profile, Session, User, UserProfile, UserStats
+from usermanager.stats import apply_payment, apply_session_update, recompute_user_stats
+from usermanager.usage import archive_sessions
+
+
+class TestUserStats(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.now = timezone.now()
+
+    def sync(self, session_id, download, upload, ended=None, started=None):
+        """What sync_sessions does for one router row."""
+        previous = Session.objects.filter(session_id=session_id).values('download', 'upload', 'is_open').first()
+        session, _ = Session.objects.update_or_create(session_id=session_id, defaults={
+            'user': self.user, 'nas_port_id': '1', 'nas_port_type': 'wireless',
+            'calling_station_id': 'AA:BB', 'user_address': '10.5.50.2', 'status': 'start',
+            'download': download, 'upload': upload, 'started': started or self.now, 'ended': ended,
+        })
+        apply_session_update(session, previous)
+        return session
+
+    def pay(self, price):
+        profile, _ = Profile.objects.get_or_create(name='plan-10', defaults={'price': price})
+        user_profile, _ = UserProfile.objects.get_or_create(user=self.user, profile=profile)
+        payment = Payment.objects.create(
+            user=self.user, user_profile=user_profile, profile=profile, copy_from='auto',
+            method='ONLINE', trans_start=timezone.now(), trans_status='completed', price=price,
+        )
+        apply_payment(payment)
+        return payment
+
+    def test_sync_deltas_keep_counters_current(self):
+        self.sync('s1', 100, 10)
+        self.sync('s1', 300, 30)
+        self.sync('s2', 50, 5)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.lifetime_bytes, stats.cycle_bytes, stats.active_sessions), (385, 385, 2))
+
+        self.sync('s1', 400, 40, ended=self.now)
+        stats.refresh_from_db()
+        self.assertEqual((stats.lifetime_bytes, stats.active_sessions), (495, 1))
+
+    def test_payment_starts_a_new_cycle(self):
+        self.sync('s1', 100, 10)
+        self.pay(Decimal('10.00'))
+        self.pay(Decimal('5.00'))
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.cycle_bytes, stats.lifetime_bytes), (0, 110))
+        self.assertEqual((stats.total_paid, stats.last_payment_amount), (Decimal('15.00'), Decimal('5.00')))
+
+    def test_recompute_corrects_drift(self):
+        self.sync('s1', 100, 10)
+        self.sync('s2', 100, 10)
+        expected = UserStats.objects.values('lifetime_bytes', 'active_sessions', 'total_paid').get()
+        UserStats.objects.update(lifetime_bytes=1, active_sessions=7, total_paid=99)
+
+        self.assertEqual(recompute_user_stats(), 1)
+
+        self.assertEqual(UserStats.objects.values('lifetime_bytes', 'active_sessions', 'total_paid').get(), expected)
+        self.assertIsNotNone(UserStats.objects.get().recomputed)
+
+    def test_recompute_includes_archived_usage(self):
+        self.sync('s1', 100, 10, ended=self.now - timedelta(days=200))
+        archive_sessions()
+        recompute_user_stats([self.user.pk])
+        self.assertEqual(UserStats.objects.get().lifetime_bytes, 110)
+
+    def test_recompute_takes_the_last_payment_as_paid(self):
+        self.sync('s1', 100, 10)
+        slow = self.pay(Decimal('10.00'))
+        quick = self.pay(Decimal('5.00'))
+        # The first payment started earlier but settled last, so it started the current cycle
+        Payment.objects.filter(pk=slow.pk).update(trans_end=quick.trans_start + timedelta(minutes=5))
+        slow.refresh_from_db()
+        apply_payment(slow)
+        applied = UserStats.objects.values('last_payment_at', 'last_payment_amount', 'cycle_start').get()
+
+        recompute_user_stats([self.user.pk])
+        self.assertEqual(UserStats.objects.values('last_payment_at', 'last_payment_amount', 'cycle_start').get(), applied)
+
+    def test_incremental_cycle_matches_recompute(self):
+        self.sync('s1', 100, 10)
+        payment = self.pay(Decimal('10.00'))
+        # The open session from before the payment keeps counting; a new one starts
+        self.sync('s1', 200, 20)
+        self.sync('s2', 50, 5, started=payment.trans_start + timedelta(minutes=1))
+        self.sync('s2', 80, 8, started=payment.trans_start + timedelta(minutes=1))
+        incremental = UserStats.objects.values('cycle_start', 'cycle_bytes', 'lifetime_bytes').get()
+        self.assertEqual(incremental['cycle_bytes'], 88)
+
+        recompute_user_stats([self.user.pk])
+        self.assertEqual(UserStats.objects.values('cycle_start', 'cycle_bytes', 'lifetime_bytes').get(), incremental)
@@ -0,0 +1,45 @@
+# mpi_src/usermanager/tests/test_status_columns.py
+
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from usermanager.models import Profile, Session, User, UserProfile
+from usermanager.sync_state import apply_router_state
+
+
+class TestMaterialisedStatus(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.profile = Profile.objects.create(name='plan-10', price='10.00')
+
+    def session(self, status, ended=None):
+        return Session.objects.create(
+            session_id=f'{status}-{ended}', user=self.user, nas_port_id='1', nas_port_type='wireless',
+            calling_station_id='AA:BB', user_address='10.5.50.2', download=0, upload=0,
+            status=status, started=timezone.now(), ended=ended,
+        )
+
+    def test_session_is_open_follows_status_flags_and_end(self):
+        self.assertTrue(self.session('start,interim').is_open)
+        self.assertFalse(self.session('start,interim,stop').is_open)
+        self.assertFalse(self.session('close-acked').is_open)
+        self.assertFalse(self.session('start', ended=timezone.now()).is_open)
+        self.assertEqual(Session.objects.filter(is_open=True).count(), 1)
+
+    def test_update_fields_keep_is_open_in_step(self):
+        session = self.session('start')
+        session.status = 'start,stop'
+        session.save(update_fields=['status'])
+        self.assertFalse(Session.objects.get(pk=session.pk).is_open)
+
+    def test_lifecycle_is_set_on_save_and_on_sync(self):
+        user_profile = UserProfile.objects.create(user=self.user, profile=self.profile, mikrotik_id='*1', state='used')
+        self.assertEqual(user_profile.lifecycle, UserProfile.Lifecycle.TIME_ELAPSED)
+        self.assertEqual(user_profile.get_state(), 'Time Elapsed')
+
+        UserProfile.objects.update(synced_version=F('local_version'))
+        apply_router_state(UserProfile, lookup={'mikrotik_id': '*1'}, values={'state': 'running', 'end_time': None})
+        self.assertEqual(UserProfile.objects.get().lifecycle, UserProfile.Lifecycle.DATA_EXHAUSTED)
+        self.assertEqual(UserProfile.objects.filter(lifecycle=UserProfile.Lifecycle.ACTIVE).count(), 0)
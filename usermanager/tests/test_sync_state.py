@@ -0,0 +1,92 @@
+# mpi_src/usermanager/tests/test_sync_state.py
+
+from django.core.cache import cache
+
+from usermanager.models import Profile, User
+from usermanager.sync_state import (
+    apply_router_state, mark_pushed, CREATED, UPDATED, UNCHANGED, KEPT_LOCAL,
+)
+from usermanager.tasks import requeue_if_pending
+from usermanager.tests.base import LocalServicesTestCase
+
+
+def router_values(price='10.00', validity='30d 00:00:00'):
+    return {
+        'name_for_users': 'Plan-10',
+        'price': price,
+        'starts_when': 'assigned',
+        'validity': validity,
+        'override_shared_users': 'off',
+    }
+
+
+def pushes(callbacks):
+    """The on-commit callbacks that enqueue a router push (profile saves also refresh the plan catalogue)."""
+    return [callback for callback in callbacks if callback.__qualname__.startswith('trigger_mikrotik_tasks.')]
+
+
+class TestConflictResolution(LocalServicesTestCase):
+
+    def pull(self, **kwargs):
+        return apply_router_state(
+            Profile, lookup={'name': 'plan-10'}, values=router_values(**kwargs), extra={'mikrotik_id': '*1'},
+        )
+
+    def test_pull_creates_row_without_pushing_it_back(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile, outcome = self.pull()
+        self.assertEqual(outcome, CREATED)
+        self.assertEqual(pushes(callbacks), [])
+        self.assertFalse(profile.has_local_changes)
+
+    def test_same_router_state_writes_nothing(self):
+        self.pull()
+        with self.assertNumQueries(1):  # the lookup only
+            _, outcome = self.pull(price='10')
+        self.assertEqual(outcome, UNCHANGED)
+
+    def test_router_change_is_applied(self):
+        self.pull()
+        profile, outcome = self.pull(validity='7d 00:00:00')
+        self.assertEqual(outcome, UPDATED)
+        self.assertEqual(profile.validity, '7d 00:00:00')
+        self.assertEqual(Profile.objects.get().validity, '7d 00:00:00')
+
+    def test_pending_local_edit_wins_and_converges_after_push(self):
+        profile, _ = self.pull()
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile.validity = '1d 00:00:00'
+            profile.save()
+        self.assertEqual(len(pushes(callbacks)), 1)  # the update push
+        self.assertTrue(profile.has_local_changes)
+
+        # A pull must not overwrite the edit, whether or not the router changed meanwhile.
+        _, outcome = self.pull()
+        self.assertEqual(outcome, UNCHANGED)
+        _, outcome = self.pull(validity='7d 00:00:00')
+        self.assertEqual(outcome, KEPT_LOCAL)
+        self.assertEqual(Profile.objects.get().validity, '1d 00:00:00')
+
+        # Once pushed, the router reports our own state back and nothing is written.
+        mark_pushed(profile, profile.local_version)
+        _, outcome = self.pull(validity='1d 00:00:00')
+        self.assertEqual(outcome, UNCHANGED)
+        self.assertFalse(Profile.objects.get().has_local_changes)
+
+    def test_non_router_field_save_does_not_push(self):
+        user = User.objects.create(username='alice')
+        version = user.local_version
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.save(update_fields=['last_login'])
+        self.assertEqual(pushes(callbacks), [])
+        self.assertEqual(User.objects.get().local_version, version)
+
+    def test_pending_push_is_requeued_once(self):
+        cache.clear()
+        profile, _ = self.pull()
+        profile.validity = '1d 00:00:00'
+        profile.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            for _ in range(3):  # three sync cycles while the push is still queued
+                requeue_if_pending(Profile.objects.get())
+        self.assertEqual(len(pushes(callbacks)), 1)
@@ -0,0 +1,105 @@
+# mpi_src/usermanager/tests/test_traffic.py
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import MagicMock
+
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from usermanager.models import Session, TrafficSeries, User
+from usermanager.routeros import RouterSession
+from usermanager.tasks import sync_sessions
+from usermanager.traffic import record_sample, downsample_traffic, bandwidth_series, decode
+from usermanager.tests.base import LocalServicesTestCase
+
+START = datetime(2024, 10, 5, 10, 0, tzinfo=dt_timezone.utc)
+
+
+@override_settings(TRAFFIC_RAW_RETENTION_HOURS=1, TRAFFIC_5M_RETENTION_DAYS=1)
+class TestTrafficSeries(LocalServicesTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.session = Session.objects.create(
+            session_id='s1', user=self.user, nas_ip_address='10.0.0.1', nas_port_id='1',
+            nas_port_type='wireless', calling_station_id='AA:BB', user_address='10.5.50.2',
+            download=0, upload=0, status='start', started=START,
+        )
+
+    def sample_every_30s(self, minutes, per_sample=1000):
+        """Simulate sync runs: counters grow by ``per_sample`` bytes every 30 seconds."""
+        for i in range(1, minutes * 2 + 1):
+            self.session.download += per_sample
+            self.session.upload += per_sample // 10
+            record_sample(self.session, at=START + timedelta(seconds=30 * i))
+
+    def test_samples_are_delta_encoded_in_one_row_per_hour(self):
+        self.sample_every_30s(90)
+        rows = list(TrafficSeries.objects.order_by('bucket'))
+        self.assertEqual([row.bucket for row in rows], [START, START + timedelta(hours=1)])
+        self.assertEqual(set(rows[0].samples['t']), {30})
+        self.assertEqual(set(rows[0].samples['d']) | set(rows[1].samples['d']), {1000})
+        self.assertEqual(sum(d for _, d, _ in decode(rows[0]) + decode(rows[1])), 180 * 1000)
+
+    def test_counter_reset_counts_new_traffic(self):
+        self.sample_every_30s(1)
+        self.session.download, self.session.upload = 300, 30
+        record_sample(self.session, at=START + timedelta(minutes=5))
+        self.assertEqual(TrafficSeries.objects.get().samples['d'], [1000, 1000, 300])
+
+    def test_downsampling_keeps_totals(self):
+        self.sample_every_30s(180)
+        before = bandwidth_series(user=self.user, step=3600)
+
+        downsample_traffic(now=START + timedelta(days=3))
+
+        self.assertFalse(TrafficSeries.objects.exclude(resolution=TrafficSeries.HOURLY).exists())
+        hourly = TrafficSeries.objects.get()
+        self.assertEqual(hourly.bucket, START.replace(hour=0))
+        self.assertEqual(len(hourly.samples['t']), 3)
+        self.assertEqual(bandwidth_series(user=self.user, step=3600), before)
+        self.assertEqual(sum(d for _, d, _ in before), 360 * 1000)
+
+    def test_partial_downsampling_leaves_recent_raw_rows(self):
+        self.sample_every_30s(150)
+        total = sum(d for _, d, _ in bandwidth_series(user=self.user))
+
+        downsample_traffic(now=START + timedelta(hours=3, minutes=30))
+
+        self.assertEqual(
+            set(TrafficSeries.objects.values_list('resolution', flat=True)),
+            {TrafficSeries.RAW, TrafficSeries.FIVE_MINUTES},
+        )
+        self.assertEqual(sum(d for _, d, _ in bandwidth_series(user=self.user)), total)
+        self.assertEqual(sum(d for _, d, _ in bandwidth_series(nas_ip_address='10.0.0.1')), total)
+
+    def test_sync_samples_only_open_sessions_that_moved(self):
+        ended = timezone.now()
+        manager = MagicMock()
+        for download, status in ((1000, 'start'), (1000, 'start'), (1500, 'stop'), (1500, 'stop')):
+            manager.get_sessions.return_value = [RouterSession(
+                '*1', 's1', 'alice', '10.0.0.1', '1', 'wireless', 'AA:BB', '10.5.50.2', download, 10,
+                timedelta(minutes=30), status, START, ended if status == 'stop' else None, None, None,
+            )]
+            sync_sessions(manager)
+
+        samples = [d for row in TrafficSeries.objects.all() for d in row.samples['d']]
+        self.assertEqual(samples, [1000, 500])  # the repeats and the listed closed session add nothing
+
+    def test_graph_reads_are_indexed(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan assertions are written against SQLite')
+        for queryset, index in (
+            (TrafficSeries.objects.filter(user=self.user, bucket__gte=START), 'traffic_user_bucket_idx'),
+            (TrafficSeries.objects.filter(nas_ip_address='10.0.0.1', bucket__gte=START), 'traffic_nas_bucket_idx'),
+        ):
+            self.assertIn(f'USING INDEX {index}', queryset.explain())
+
+    @override_settings(PRUNE_RETENTION_DAYS={'traffic': 30})
+    def test_graph_window_is_bounded_by_retention(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('bandwidth'), {'hours': 30 * 24}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('bandwidth'), {'hours': 30 * 24 + 1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('bandwidth'), {'hours': 0}).status_code, 400)
@@ -0,0 +1,88 @@
+# mpi_src/usermanager/tests/test_usage.py
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from usermanager.models import DailyUsage, Session, User, UserStats
+from usermanager.stats import recompute_user_stats
+from usermanager.tasks import sync_sessions
+from usermanager.usage import archive_sessions, daily_usage, usage_totals
+from usermanager.tests.base import LocalServicesTestCase
+
+
+@override_settings(SESSION_RETENTION_DAYS=30)
+class TestSessionArchival(LocalServicesTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.now = timezone.now()
+
+    def session(self, session_id, days_ago, ended=True, nas='10.0.0.1', download=100, upload=10):
+        started = self.now - timedelta(days=days_ago)
+        return Session.objects.create(
+            session_id=session_id, user=self.user, nas_ip_address=nas, nas_port_id='1',
+            nas_port_type='wireless', calling_station_id='AA:BB', user_address='10.5.50.2',
+            download=download, upload=upload, uptime=timedelta(minutes=30), status='stop',
+            started=started, ended=started + timedelta(minutes=30) if ended else None,
+        )
+
+    def test_old_closed_sessions_are_rolled_up_and_deleted(self):
+        self.session('s1', 60)
+        self.session('s2', 60)
+        self.session('s3', 60, nas='10.0.0.2')
+        self.session('s4', 60, ended=False)  # still open: never archived
+        self.session('s5', 5)  # within retention
+
+        self.assertEqual(archive_sessions(chunk_size=2, now=self.now), 3)
+
+        self.assertEqual(set(Session.objects.values_list('session_id', flat=True)), {'s4', 's5'})
+        usage = DailyUsage.objects.get(user=self.user, nas_ip_address='10.0.0.1')
+        self.assertEqual((usage.download, usage.upload, usage.sessions), (200, 20, 2))
+        self.assertEqual(usage.uptime, timedelta(hours=1))
+        self.assertEqual(DailyUsage.objects.count(), 2)
+
+    def test_rerun_adds_to_existing_day(self):
+        self.session('s1', 60)
+        archive_sessions(now=self.now)
+        self.session('s2', 60)
+        archive_sessions(now=self.now)
+        self.assertEqual(DailyUsage.objects.get().sessions, 2)
+
+    def test_reads_combine_both_tiers(self):
+        self.session('s1', 60)
+        self.session('s2', 5)
+        before_days, before_totals = daily_usage(self.user), usage_totals(self.user)
+
+        archive_sessions(now=self.now)
+
+        self.assertEqual(daily_usage(self.user), before_days)
+        self.assertEqual(usage_totals(self.user), before_totals)
+        self.assertEqual(before_totals['traffic'], 220)
+        self.assertEqual(len(before_days), 2)
+
+    def test_sync_does_not_bring_archived_sessions_back(self):
+        old = self.session('s1', 60)
+        self.session('s2', 5)
+        archive_sessions(now=self.now)
+        # The router keeps listing the archived session
+        row = {
+            '.id': '*1', 'acct-session-id': 's1', 'user': 'alice', 'nas-port-id': '1', 'nas-port-type': 'wireless',
+            'calling-station-id': 'AA:BB', 'user-address': '10.5.50.2', 'download': '100', 'upload': '10',
+            'uptime': '30m', 'status': 'stop', 'started': old.started.isoformat(), 'ended': old.ended.isoformat(),
+        }
+        manager = MagicMock()
+        manager.get_sessions.side_effect = lambda decoder=None: [decoder(row) if decoder else row]
+        sync_sessions(manager)
+        # The manual sync runs the same code
+        with patch('usermanager.management.commands.sync_mikrotik.get_mikrotik_manager', return_value=manager):
+            call_command('sync_mikrotik', stdout=StringIO())
+
+        self.assertFalse(Session.objects.filter(session_id='s1').exists())
+        self.assertEqual(usage_totals(self.user)['traffic'], 220)
+        recompute_user_stats([self.user.pk])
+        self.assertEqual(UserStats.objects.get(user=self.user).lifetime_bytes, 220)
@@ -0,0 +1,198 @@
+# mpi_src/usermanager/traffic.py
+"""
+Per-session traffic history.
+
+Every session sync appends one counter sample to the session's raw ``TrafficSeries``
+row for the current hour. ``downsample_traffic`` later folds raw rows into 5-minute
+rows, and 5-minute rows into one hourly row per session per day, once they pass
+``TRAFFIC_RAW_RETENTION_HOURS`` and ``TRAFFIC_5M_RETENTION_DAYS``. Graphs read all
+resolutions for a user or NAS in one indexed range query.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from usermanager.models import TrafficSeries
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_CHUNK_SIZE = 500
+
+
+def _floor(moment, seconds):
+    """Start of the ``seconds``-long slot containing ``moment`` (UTC-aligned)."""
+    epoch = int(moment.timestamp())
+    return moment - timedelta(seconds=epoch % seconds, microseconds=moment.microsecond)
+
+
+def _slot_end(moment, seconds):
+    """End of the ``seconds``-long slot a sample taken at ``moment`` counts towards."""
+    return _floor(moment - timedelta(microseconds=1), seconds) + timedelta(seconds=seconds)
+
+
+def bucket_span(resolution):
+    """Seconds covered by one row at ``resolution``."""
+    return 86400 if resolution == TrafficSeries.HOURLY else 3600
+
+
+def decode(row):
+    """The row's samples as ``[(timestamp, download, upload), ...]``."""
+    samples = row.samples or {}
+    points, moment = [], row.bucket
+    for dt, down, up in zip(samples.get('t', []), samples.get('d', []), samples.get('u', [])):
+        moment += timedelta(seconds=dt)
+        points.append((moment, down, up))
+    return points
+
+
+def encode(points, bucket):
+    """Inverse of ``decode`` for time-ordered points inside one bucket."""
+    samples, previous = {'t': [], 'd': [], 'u': []}, bucket
+    for moment, down, up in points:
+        samples['t'].append(int((moment - previous).total_seconds()))
+        samples['d'].append(down)
+        samples['u'].append(up)
+        previous = moment
+    return samples
+
+
+def _previous_counters(session):
+    """Counters at the session's last stored sample, or zeros for a new session."""
+    row = (
+        TrafficSeries.objects.filter(session_id=session.session_id).exclude(last_at=None)
+        .order_by('-last_at').only('last_download', 'last_upload').first()
+    )
+    return (row.last_download, row.last_upload) if row else (0, 0)
+
+
+def record_sample(session, at=None):
+    """Append the session's current counters to its raw row for this hour."""
+    at = at or timezone.now()
+    bucket = _floor(at, 3600)
+    with transaction.atomic():
+        row = (
+            TrafficSeries.objects.select_for_update()
+            .filter(session_id=session.session_id, resolution=TrafficSeries.RAW, bucket=bucket)
+            .first()
+        )
+        if row is None:
+            last_download, last_upload = _previous_counters(session)
+            row = TrafficSeries(
+                session_id=session.session_id, user_id=session.user_id,
+                nas_ip_address=session.nas_ip_address or '', resolution=TrafficSeries.RAW,
+                bucket=bucket, samples=encode([], bucket),
+                last_download=last_download, last_upload=last_upload,
+            )
+        if row.last_at and at <= row.last_at:
+            return row  # already sampled at this moment
+
+        # A counter that went down was reset by the router: everything counted is new
+        down = session.download - row.last_download if session.download >= row.last_download else session.download
+        up = session.upload - row.last_upload if session.upload >= row.last_upload else session.upload
+
+        row.samples['t'].append(int((at - (row.last_at or bucket)).total_seconds()))
+        row.samples['d'].append(down)
+        row.samples['u'].append(up)
+        row.last_at, row.last_download, row.last_upload = at, session.download, session.upload
+        row.save()
+    return row
+
+
+def _add(slots, slot, down, up):
+    previous = slots.get(slot, (0, 0))
+    slots[slot] = (previous[0] + down, previous[1] + up)
+
+
+def _fold(rows, resolution):
+    """Merge time-ordered ``rows`` of one session into rows at the coarser ``resolution``."""
+    span = bucket_span(resolution)
+    targets = {}
+    for row in rows:
+        for moment, down, up in decode(row):
+            slot = _slot_end(moment, resolution)  # a coarse sample sits at the end of its slot
+            _add(targets.setdefault(_floor(slot - timedelta(microseconds=1), span), {}), slot, down, up)
+
+    latest = rows[-1]
+    for bucket, slots in targets.items():
+        target = TrafficSeries.objects.select_for_update().filter(
+            session_id=latest.session_id, resolution=resolution, bucket=bucket,
+        ).first() or TrafficSeries(
+            session_id=latest.session_id, user_id=latest.user_id, nas_ip_address=latest.nas_ip_address,
+            resolution=resolution, bucket=bucket,
+        )
+        for moment, down, up in decode(target):
+            _add(slots, moment, down, up)
+        target.samples = encode(sorted((moment, down, up) for moment, (down, up) in slots.items()), bucket)
+        # Keep the last counters, so a session resuming after its raw rows were folded
+        # still continues from the right value
+        if latest.last_at and (target.last_at is None or latest.last_at > target.last_at):
+            target.last_at, target.last_download, target.last_upload = (
+                latest.last_at, latest.last_download, latest.last_upload,
+            )
+        target.save()
+
+
+def _downsample(from_resolution, to_resolution, older_than):
+    folded = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                TrafficSeries.objects.select_for_update()
+                .filter(resolution=from_resolution, bucket__lt=older_than)
+                .order_by('session_id', 'bucket')[:DOWNSAMPLE_CHUNK_SIZE]
+            )
+            if not rows:
+                return folded
+            by_session = {}
+            for row in rows:
+                by_session.setdefault(row.session_id, []).append(row)
+            for session_rows in by_session.values():
+                _fold(session_rows, to_resolution)
+            TrafficSeries.objects.filter(pk__in=[row.pk for row in rows]).delete()
+        folded += len(rows)
+
+
+def downsample_traffic(now=None):
+    """Fold aged raw rows into 5-minute rows and aged 5-minute rows into hourly rows."""
+    now = now or timezone.now()
+    raw_age = timedelta(hours=getattr(settings, 'TRAFFIC_RAW_RETENTION_HOURS', 24))
+    five_minute_age = timedelta(days=getattr(settings, 'TRAFFIC_5M_RETENTION_DAYS', 7))
+    # Only whole buckets are folded, so a row still being appended to is never touched
+    raw = _downsample(TrafficSeries.RAW, TrafficSeries.FIVE_MINUTES, _floor(now - raw_age, 3600))
+    five_minute = _downsample(TrafficSeries.FIVE_MINUTES, TrafficSeries.HOURLY, _floor(now - five_minute_age, 3600))
+    if raw or five_minute:
+        logger.info(f"Downsampled {raw} raw and {five_minute} 5-minute traffic rows.")
+    return raw, five_minute
+
+
+def history_hours():
+    """How far back traffic history goes: the traffic prune's retention (a year if it is off)."""
+    days = getattr(settings, 'PRUNE_RETENTION_DAYS', {}).get('traffic')
+    return (days or 365) * 24
+
+
+def bandwidth_series(user=None, nas_ip_address=None, since=None, until=None, step=300):
+    """
+    Traffic of a user or a NAS as ``[(slot_end, download, upload), ...]`` in ``step``-second
+    slots (coarser where only coarser history is left), from one indexed range read.
+    """
+    rows = TrafficSeries.objects.all()
+    if user is not None:
+        rows = rows.filter(user=user)
+    if nas_ip_address is not None:
+        rows = rows.filter(nas_ip_address=nas_ip_address)
+    if since is not None:
+        rows = rows.filter(bucket__gte=_floor(since, 86400))  # an hourly row starts at midnight
+    if until is not None:
+        rows = rows.filter(bucket__lt=until)
+
+    slots = {}
+    for row in rows.only('bucket', 'samples', 'resolution').order_by('bucket'):
+        for moment, down, up in decode(row):
+            if (since and moment < since) or (until and moment >= until):
+                continue
+            _add(slots, _slot_end(moment, max(step, row.resolution)), down, up)
+    return [(moment, down, up) for moment, (down, up) in sorted(slots.items())]
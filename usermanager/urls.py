@@ -3,8 +3,8 @@
 from django.urls import path
 from .views import (
     SignUpView, SignInView, SignOutView, UserDetailView,
-    ProfileListView, UserProfileListView, PaymentListView, SessionListView,
-    InitiatePaymentView, VerifyPaymentView, payment_success, payment_failed
+    ProfileListView, UserProfileListView, PaymentListView, SessionListView, BandwidthView, ExportView, ApiView,
+    InitiatePaymentView, VerifyPaymentView, paystack_webhook, payment_success, payment_failed
 )
 
 urlpatterns = [
@@ -16,10 +16,19 @@ urlpatterns = [
     path('user-profiles/', UserProfileListView.as_view(), name='user_profile_list'),
     path('payments/', PaymentListView.as_view(), name='payment_list'),
     path('sessions/', SessionListView.as_view(), name='session_list'),
+    path('bandwidth/', BandwidthView.as_view(), name='bandwidth'),
+    path('export/<str:name>/', ExportView.as_view(), name='export'),
+
+    # Read-only JSON API with ETags
+    path('api/plans/', ApiView.as_view(resource='plans'), name='api_plans'),
+    path('api/plan/', ApiView.as_view(resource='plan'), name='api_current_plan'),
+    path('api/sessions/', ApiView.as_view(resource='sessions'), name='api_sessions'),
+    path('api/payments/', ApiView.as_view(resource='payments'), name='api_payments'),
 
     # Payment paths
     path('initiate-payment/<uuid:profile_id>/', InitiatePaymentView.as_view(), name='initiate_payment'),
     path('payment/verify/', VerifyPaymentView.as_view(), name='verify_payment'),
+    path('payment/webhook/', paystack_webhook, name='paystack_webhook'),
     path('payment/success/', payment_success, name='payment_success'),
     path('payment/failed/', payment_failed, name='payment_failed'),
 ]
@@ -0,0 +1,145 @@
+# mpi_src/usermanager/usage.py
+"""
+Tiered session storage.
+
+Raw ``Session`` rows are kept for ``SESSION_RETENTION_DAYS``. Closed sessions older than
+that are rolled up into ``DailyUsage`` (per user, day and NAS) and deleted in chunks, so
+per-user queries only ever touch recent history. The read helpers below combine both
+tiers, so callers do not need to know where a day's traffic currently lives.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from usermanager.models import DailyUsage, Session
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CHUNK_SIZE = 1000
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archive_cutoff(now=None):
+    """Closed sessions that ended before this have been rolled into DailyUsage by archival."""
+    return (now or timezone.now()) - timedelta(days=getattr(settings, 'SESSION_RETENTION_DAYS', 90))
+
+
+def archivable_sessions(now=None):
+    """Closed sessions that have aged out of the raw tier."""
+    return Session.objects.filter(ended__isnull=False, ended__lt=archive_cutoff(now))
+
+
+def session_rollup(sessions, *group):
+    """Sums of a session queryset per ``group`` (from user_id, day and nas)."""
+    return (
+        sessions.order_by()
+        .annotate(day=TruncDate('started'), nas=Coalesce('nas_ip_address', Value(''), output_field=CharField()))
+        .values(*group)
+        .annotate(
+            download_sum=Sum('download'), upload_sum=Sum('upload'),
+            session_count=Count('pk'), uptime_sum=Sum('uptime'),
+        )
+    )
+
+
+def roll_up_sessions(ids):
+    """Add the sessions ``ids`` to DailyUsage and delete them. Call inside a transaction."""
+    chunk = Session.objects.filter(pk__in=ids)
+    for row in session_rollup(chunk, 'user_id', 'day', 'nas'):
+        usage, _ = DailyUsage.objects.select_for_update().get_or_create(
+            user_id=row['user_id'], date=row['day'], nas_ip_address=row['nas'],
+        )
+        DailyUsage.objects.filter(pk=usage.pk).update(
+            download=F('download') + row['download_sum'],
+            upload=F('upload') + row['upload_sum'],
+            sessions=F('sessions') + row['session_count'],
+            uptime=F('uptime') + (row['uptime_sum'] or timedelta(0)),
+        )
+    return chunk.delete()[0]
+
+
+def archive_sessions(chunk_size=ARCHIVE_CHUNK_SIZE, now=None):
+    """
+    Roll archivable sessions into DailyUsage and delete them, one chunk per transaction,
+    so a large first run never holds a long write lock. Returns the number archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(archivable_sessions(now).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            roll_up_sessions(ids)
+        archived += len(ids)
+
+    if archived:
+        logger.info(f"Archived {archived} closed sessions into daily usage.")
+    return archived
+
+
+def daily_usage(user=None, since=None, until=None, username=None):
+    """
+    Per-day traffic from both tiers for ``since`` .. ``until`` (dates, inclusive), newest
+    first, as dicts with ``date``, ``download``, ``upload``, ``sessions`` and ``uptime``.
+    ``user=None`` (and no ``username``) covers everyone.
+    """
+    sessions = Session.objects.all()
+    archived = DailyUsage.objects.all()
+    if user is not None:
+        sessions = sessions.filter(user=user)
+        archived = archived.filter(user=user)
+    if username:
+        sessions = sessions.filter(user__username=username)
+        archived = archived.filter(user__username=username)
+    # Day bounds as datetimes, so the started index serves the range
+    if since is not None:
+        sessions = sessions.filter(started__gte=_day_start(since))
+        archived = archived.filter(date__gte=since)
+    if until is not None:
+        sessions = sessions.filter(started__lt=_day_start(until + timedelta(days=1)))
+        archived = archived.filter(date__lte=until)
+
+    days = {}
+
+    def add(day, download, upload, count, uptime):
+        entry = days.setdefault(day, {'date': day, 'download': 0, 'upload': 0, 'sessions': 0, 'uptime': timedelta(0)})
+        entry['download'] += download or 0
+        entry['upload'] += upload or 0
+        entry['sessions'] += count
+        entry['uptime'] += uptime or timedelta(0)
+
+    for row in archived.order_by().values('date').annotate(
+        d=Sum('download'), u=Sum('upload'), n=Sum('sessions'), t=Sum('uptime'),
+    ):
+        add(row['date'], row['d'], row['u'], row['n'], row['t'])
+    for row in session_rollup(sessions, 'day'):
+        add(row['day'], row['download_sum'], row['upload_sum'], row['session_count'], row['uptime_sum'])
+
+    return sorted(days.values(), key=lambda entry: entry['date'], reverse=True)
+
+
+def usage_totals(user=None):
+    """Lifetime download, upload, session count and uptime across both tiers."""
+    sessions = Session.objects.all()
+    archived = DailyUsage.objects.all()
+    if user is not None:
+        sessions = sessions.filter(user=user)
+        archived = archived.filter(user=user)
+
+    raw = sessions.aggregate(download=Sum('download'), upload=Sum('upload'), sessions=Count('pk'), uptime=Sum('uptime'))
+    old = archived.aggregate(download=Sum('download'), upload=Sum('upload'), sessions=Sum('sessions'), uptime=Sum('uptime'))
+    totals = {
+        key: (raw[key] or 0) + (old[key] or 0)
+        for key in ('download', 'upload', 'sessions')
+    }
+    totals['uptime'] = (raw['uptime'] or timedelta(0)) + (old['uptime'] or timedelta(0))
+    totals['traffic'] = totals['download'] + totals['upload']
+    return totals
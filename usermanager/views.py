@@ -2,24 +2,38 @@
 
 import uuid
 import logging
-import requests
-import paystack
 import datetime
 
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect
 from django.conf import settings
 from django.contrib.auth import login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, FormView, RedirectView, View
-from django.http import JsonResponse
-
-from .forms import SignUpForm, SignInForm
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from pydantic import ValidationError
+
+from .forms import SignUpForm, SignInForm, ListFilterForm
 from .models import User, Profile, UserProfile, Payment, Session
-from .mikrotik_userman import init_mikrotik_manager
-
-paystack.api_key = settings.PAYSTACK_SECRET_KEY
-mikrotik_manager = init_mikrotik_manager()
+from .db_routers import REPLICA, ReplicaReadMixin, pinned_to_primary, replica_configured
+from .pagination import KeysetPaginationMixin
+from .exports import EXPORTS, FORMATS, export_filename, stream_export
+from .api import RESOURCES as API_RESOURCES, resource_etag
+from .usage import daily_usage
+from .dashboard import get_snapshot
+from .catalogue import catalogue_modified, catalogue_version, get_plan, plan_catalogue
+from .paystack_client import PaystackError, get_async_paystack_client
+from .payments import charge_metadata, quoted_amount, record_pending_payment, signature_is_valid
+from .schemas import PaymentCallbackSchema
+from .tasks import fulfil_paystack_payment
+from .traffic import bandwidth_series, history_hours
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +63,7 @@ class SignOutView(LoginRequiredMixin, RedirectView):
         logout(request)  # Log the user out
         return super().get(request, *args, **kwargs)
 
-class UserDetailView(LoginRequiredMixin, DetailView):
+class UserDetailView(LoginRequiredMixin, ReplicaReadMixin, DetailView):
     model = User
     template_name = 'usermanager/user_detail.html'
     context_object_name = 'user_detail'
@@ -59,132 +73,256 @@ class UserDetailView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Profiles, payments, sessions and usage totals come from the cached snapshot
+        context.update(get_snapshot(self.request.user.pk))
+        return context
 
-        # Fetch the user profiles related to the current user
-        user_profiles = UserProfile.objects.filter(user=self.request.user)
-
-        # Filter profiles with state 'running-active'
-        running_active_profiles = user_profiles.filter(state='running-active')
-
-        # Sort profiles by 'end_time' and get the 5 most recent ones
-        recent_user_profiles = user_profiles.order_by('-end_time')[:5]       
-
-        # Fetch payments related to the user
-        user_payments = Payment.objects.filter(user=self.request.user)
-        recent_user_payments = user_payments.order_by('-trans_end')[:5]   
 
-        # Fetch user sessions
-        user_sessions = Session.objects.filter(user=self.request.user).order_by('-session_id')
-        active_sessions = user_sessions.filter(ended__isnull=True)
+def _plans_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None  # let LoginRequiredMixin redirect
+    # The page also shows who is signed in
+    return f'"plans-{catalogue_version()}-{request.user.pk}"'
 
-        context['recent_user_profiles'] = recent_user_profiles
-        context['user_sessions'] = user_sessions
-        context['recent_user_payments'] = recent_user_payments
-        context['active_sessions'] = active_sessions
-        context['running_active_profiles'] = running_active_profiles
 
-        return context
+def _plans_last_modified(request, *args, **kwargs):
+    return catalogue_modified() if request.user.is_authenticated else None
 
 
-class ProfileListView(LoginRequiredMixin, ListView):
+@method_decorator(cache_control(private=True, no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=_plans_etag, last_modified_func=_plans_last_modified), name='dispatch')
+class ProfileListView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     model = Profile
     template_name = 'usermanager/profile_list.html'
     context_object_name = 'profiles'
 
     def get_queryset(self):
-        # Fetch all profiles from Django model
-        return Profile.objects.all()
+        # Served from the cached plan catalogue; browsers revalidate with ETag/Last-Modified
+        return plan_catalogue()
+
+
+class FilteredListMixin:
+    """
+    Server-side ``ListFilterForm`` filters shared by the paginated lists: superusers see
+    everyone's rows (optionally one ``user``), others only their own, and ``since``/``until``
+    bound ``date_field``. Invalid filter values are ignored.
+    """
+    date_field = None
+
+    def get_filters(self):
+        self.filter_form = ListFilterForm(self.request.GET)
+        self.filter_form.is_valid()
+        return self.filter_form.cleaned_data
+
+    def filter_queryset(self, queryset, filters):
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(user=self.request.user)
+        elif filters.get('user'):
+            queryset = queryset.filter(user__username=filters['user'])
+        # Day bounds as datetimes, so the ordering index serves the range too
+        if filters.get('since'):
+            since = timezone.make_aware(datetime.datetime.combine(filters['since'], datetime.time.min))
+            queryset = queryset.filter(**{f'{self.date_field}__gte': since})
+        if filters.get('until'):
+            until = timezone.make_aware(datetime.datetime.combine(filters['until'], datetime.time.min))
+            queryset = queryset.filter(**{f'{self.date_field}__lt': until + datetime.timedelta(days=1)})
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['profiles'] = self.get_queryset()
+        context['filter_form'] = self.filter_form
         return context
 
 
-class UserProfileListView(LoginRequiredMixin, ListView):
+class UserProfileListView(LoginRequiredMixin, ReplicaReadMixin, KeysetPaginationMixin, FilteredListMixin, ListView):
     model = UserProfile
     template_name = 'usermanager/user_profile_list.html'
     context_object_name = 'user_profiles'
+    keyset_ordering = ('-created', '-id')
+    date_field = 'created'
 
     def get_queryset(self):
-        # Superusers see all user profiles, regular users see only their own
-        if self.request.user.is_superuser:
-            return UserProfile.objects.all()
-        return UserProfile.objects.filter(user=self.request.user)
+        # Rows show the user and plan names
+        user_profiles = self.filter_queryset(UserProfile.objects.select_related('user', 'profile'), self.get_filters())
+        lifecycle = self.request.GET.get('lifecycle')
+        if lifecycle in UserProfile.Lifecycle.values:
+            user_profiles = user_profiles.filter(lifecycle=lifecycle)
+        return user_profiles
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['user_profiles'] = self.get_queryset()
+        context['lifecycle_choices'] = UserProfile.Lifecycle.choices
         return context
 
 
-class PaymentListView(LoginRequiredMixin, ListView):
+class PaymentListView(LoginRequiredMixin, ReplicaReadMixin, KeysetPaginationMixin, FilteredListMixin, ListView):
     model = Payment
     template_name = 'usermanager/payment_list.html'
     context_object_name = 'payments'
+    # trans_end is NULL until a payment settles, so page by when it started
+    keyset_ordering = ('-trans_start', '-id')
+    date_field = 'trans_start'
 
     def get_queryset(self):
-        # Superusers see all user profiles, regular users see only their own
-        if self.request.user.is_superuser:
-            return Payment.objects.all()
-        return Payment.objects.filter(user=self.request.user)
-    
+        filters = self.get_filters()
+        # Rows show the plan and the user profile, whose __str__ reads its user and plan
+        payments = self.filter_queryset(
+            Payment.objects.select_related('profile', 'user_profile__user', 'user_profile__profile'), filters,
+        )
+        if filters.get('status') in dict(Payment.TRANS_STATUS_CHOICES):
+            payments = payments.filter(trans_status=filters['status'])
+        return payments
 
-class SessionListView(LoginRequiredMixin, ListView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['status_choices'] = Payment.TRANS_STATUS_CHOICES
+        return context
+
+
+class SessionListView(LoginRequiredMixin, ReplicaReadMixin, KeysetPaginationMixin, FilteredListMixin, ListView):
     template_name = 'usermanager/sessions.html'
     context_object_name = 'user_sessions'
+    keyset_ordering = ('-started', '-id')
+    date_field = 'started'
 
     def get_queryset(self):
-        # Superusers see all sessions; regular users see only their own
-        if self.request.user.is_superuser:
-            return Session.objects.all()
-        return Session.objects.filter(user=self.request.user)
+        filters = self.get_filters()
+        sessions = self.filter_queryset(Session.objects.all(), filters)  # rows show no relations
+        if filters.get('nas'):
+            sessions = sessions.filter(nas_ip_address=filters['nas'])
+        if filters.get('status') in ('open', 'closed'):
+            sessions = sessions.filter(is_open=filters['status'] == 'open')
+        return sessions
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['user_sessions'] = self.get_queryset()
+        # Per-day traffic across raw sessions and archived daily usage, for the same user and
+        # days as the list; without a ``since`` only the last SESSION_USAGE_DAYS
+        filters = self.filter_form.cleaned_data
+        until = filters.get('until')
+        since = filters.get('since') or (until or timezone.localdate()) - datetime.timedelta(
+            days=getattr(settings, 'SESSION_USAGE_DAYS', 30),
+        )
+        if self.request.user.is_superuser:
+            context['daily_usage'] = daily_usage(since=since, until=until, username=filters.get('user'))
+        else:
+            context['daily_usage'] = daily_usage(self.request.user, since=since, until=until)
         return context
 
 
+class BandwidthView(LoginRequiredMixin, ReplicaReadMixin, View):
+    """Bandwidth graph data: the user's traffic, or a NAS's traffic for superusers."""
+
+    def get(self, request):
+        try:
+            hours = int(request.GET.get('hours', 24))
+            step = max(int(request.GET.get('step', 300)), 60)
+        except ValueError:
+            return JsonResponse({'error': 'hours and step must be integers'}, status=400)
+        if not 0 < hours <= history_hours():
+            # Older samples are pruned; a larger window would only scan the whole table
+            return JsonResponse({'error': f'hours must be between 1 and {history_hours()}'}, status=400)
+
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)
+        nas_ip_address = request.GET.get('nas')
+        if nas_ip_address and request.user.is_superuser:
+            series = bandwidth_series(nas_ip_address=nas_ip_address, since=since, step=step)
+        else:
+            series = bandwidth_series(user=request.user, since=since, step=step)
+        return JsonResponse({
+            'step': step,
+            'series': [[moment.isoformat(), download, upload] for moment, download, upload in series],
+        })
+
+
+class ExportView(LoginRequiredMixin, View):
+    """
+    ``?format=csv|jsonl`` download of an export, streamed as it is read (``&gzip=1`` to
+    compress on the fly). Takes the list filters; non-superusers export only their own rows.
+    """
+
+    def get(self, request, name):
+        fmt = request.GET.get('format', 'csv')
+        if name not in EXPORTS or fmt not in FORMATS:
+            raise Http404('No such export')
+        compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+        form = ListFilterForm(request.GET)
+        if not form.is_valid():
+            # An ignored bad filter would export far more rows than were asked for
+            return JsonResponse({'errors': form.errors}, status=400)
+        filters = form.cleaned_data
+
+        queryset, username = EXPORTS[name].model.objects.all(), filters.get('user')
+        if not request.user.is_superuser:
+            queryset, username = queryset.filter(user=request.user), None
+        # The rows are read after this method returns, so the replica is picked explicitly
+        using = REPLICA if replica_configured() and not pinned_to_primary(request) else None
+
+        response = StreamingHttpResponse(
+            stream_export(name, fmt, compress, queryset=queryset, since=filters.get('since'),
+                          until=filters.get('until'), username=username, using=using),
+            content_type='application/gzip' if compress else FORMATS[fmt][0],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(name, fmt, compress)}"'
+        return response
+
+
+@method_decorator(cache_control(private=True, no_cache=True), name='dispatch')
+class ApiView(View):
+    """
+    Read-only JSON resource (see usermanager/api.py). Clients send back the ETag with
+    If-None-Match; an unchanged resource is answered 304 from its cached version alone.
+    """
+    resource = None
+
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'User not authenticated'}, status=401)
+        etag = resource_etag(self.resource, request.user.pk)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({self.resource: API_RESOURCES[self.resource](request.user.pk)})
+        response['ETag'] = etag
+        return response
+
+
 # Initialize payment with Paystack
 class InitiatePaymentView(View):
-    def get(self, request, profile_id):
+    async def get(self, request, profile_id):
         try:
-            profile = get_object_or_404(Profile, id=profile_id)
-            if not request.user.is_authenticated:
+            profile = await sync_to_async(get_plan)(profile_id)
+            if profile is None:
+                raise Http404('No such plan')
+            user = await request.auser()
+            if not user.is_authenticated:
                 return JsonResponse({'error': 'User not authenticated'}, status=401)
 
-            if not request.user.email:
+            if not user.email:
                 return JsonResponse({'error': 'Email is required'}, status=400)
 
             # Generate a unique transaction reference using a UUID
             payment_reference = str(uuid.uuid4())
-
-            payment_data = {
-                "email": request.user.email,
-                "amount": int(profile.price * 100),  # Amount in kobo
-                "reference": payment_reference,
-                "callback_url": request.build_absolute_uri(reverse('verify_payment')) + f"?user_id={request.user.id}&profile_id={profile.id}"
-            }
-
-            headers = {
-                "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-                "Content-Type": "application/json"
-            }
+            # Paystack appends ?reference=...; whom to credit travels in the metadata
+            callback_url = request.build_absolute_uri(reverse('verify_payment'))
 
             logger.debug(f"Initiating payment with reference: {payment_reference}")
 
-            # Send request to Paystack to initialize payment
-            response = requests.post('https://api.paystack.co/transaction/initialize', json=payment_data, headers=headers)
-
-            if response.status_code == 200:
-                response_data = response.json()
-                payment_url = response_data['data']['authorization_url']
-                return redirect(payment_url)
-            else:
-                logger.error(f"Paystack response: {response.json()}")
-                return JsonResponse({'error': 'Payment initiation failed', 'details': response.json()}, status=response.status_code)
-
+            # Ask Paystack for a checkout page; the event loop serves other requests meanwhile
+            data = await get_async_paystack_client().initialize_transaction(
+                email=user.email,
+                amount=int(profile.price * 100),  # Amount in pesewas
+                reference=payment_reference,
+                callback_url=callback_url,
+                # Lets the webhook fulfil the payment without the customer's redirect
+                metadata={'user_id': str(user.id), 'profile_id': str(profile.id)},
+            )
+            # The price quoted now is what the charge is checked against, whatever the plan costs later
+            await sync_to_async(record_pending_payment)(payment_reference, user, profile)
+            return redirect(data['authorization_url'])
+
+        except PaystackError as e:
+            logger.error(f"Paystack response: {e.details}")
+            return JsonResponse({'error': 'Payment initiation failed', 'details': e.details}, status=e.status)
         except Exception as e:
             logger.error(f"Error during payment initiation: {e}", exc_info=True)
             return JsonResponse({'error': 'An error occurred during payment initiation'}, status=500)
@@ -192,67 +330,40 @@ class InitiatePaymentView(View):
 
 # Verify payment and update Payment with Paystack
 class VerifyPaymentView(View):
-    def get(self, request):
+    async def get(self, request):
         reference = request.GET.get('reference')
-        user_id = request.GET.get('user_id')
-        profile_id = request.GET.get('profile_id')
-
-        if not reference or not user_id or not profile_id:
-            return JsonResponse({'error': 'Reference, user ID, and profile ID are required'}, status=400)
-
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
+        if not reference:
+            return JsonResponse({'error': 'Reference is required'}, status=400)
 
         try:
             logger.debug(f"Received reference: {reference}")
 
             # Verify the payment via Paystack API
-            response = requests.get(f'https://api.paystack.co/transaction/verify/{reference}', headers=headers)
-            response.raise_for_status()  # Raise an HTTPError for bad responses
-            response_data = response.json()
-
-            if response_data.get('data', {}).get('status') == 'success':
-                # Validate UUID format
-                def is_valid_uuid(val):
-                    try:
-                        uuid.UUID(str(val))  # Ensure it's converted to string
-                        return True
-                    except ValueError:
-                        return False
-
-                if not is_valid_uuid(user_id) or not is_valid_uuid(profile_id):
-                    return JsonResponse({'error': 'User ID or Profile ID is not a valid UUID'}, status=400)
-
-                # Now safely query the Profile and User models
-                profile = get_object_or_404(Profile, id=profile_id)
-                user = get_object_or_404(User, id=user_id)
-
-                user_profile, created = UserProfile.objects.get_or_create(user=user, profile=profile)
-
-                # Create a payment entry
-                payment = Payment.objects.create(
-                    user=user,
-                    user_profile=user_profile,
-                    profile=profile,
-                    method="ONLINE",
-                    trans_start=datetime.datetime.now(),
-                    trans_status="completed",
-                    price=response_data['data']['amount'] / 100,
-                    paystack_reference=reference
-                )
-
-                from usermanager.tasks import create_user_profile_in_mikrotik
-                create_user_profile_in_mikrotik.delay(user_profile.id)
-
-                return redirect('payment_success')
-
-            else:
-                logger.warning(f"Payment verification failed for reference: {reference}. Status: {response_data.get('data', {}).get('status')}")
+            data = await get_async_paystack_client().verify_transaction(reference)
+
+            if data.get('status') != 'success':
+                logger.warning(f"Payment verification failed for reference: {reference}. Status: {data.get('status')}")
+                return redirect('payment_failed')
+
+            # Who paid for what comes from the verified transaction, never from the URL
+            metadata = charge_metadata(data)
+            profile = await sync_to_async(get_plan)(metadata.get('profile_id')) if metadata.get('user_id') else None
+            if profile is None:
+                logger.error(f"Payment {reference} does not pay for a portal plan: {metadata}")
                 return redirect('payment_failed')
 
-        except requests.RequestException as e:
+            quoted = await sync_to_async(quoted_amount)(reference, profile)
+            # The webhook usually got here first; fulfilment is idempotent either way, and
+            # it records a charge that does not match the quoted price as flagged
+            await sync_to_async(fulfil_paystack_payment.delay)(
+                reference, metadata['user_id'], str(profile.pk), data['amount'],
+            )
+            if data.get('amount') != quoted:
+                logger.error(f"Payment {reference} charged {data.get('amount')}, not the quoted price of {profile.name}")
+                return redirect('payment_failed')
+            return redirect('payment_success')
+
+        except PaystackError as e:
             logger.error(f"Error verifying payment with Paystack: {e}", exc_info=True)
             return JsonResponse({'error': 'Payment verification failed'}, status=500)
         except Exception as e:
@@ -260,6 +371,35 @@ class VerifyPaymentView(View):
             return JsonResponse({'error': 'An unexpected error occurred'}, status=500)
 
 
+# Paystack webhook: authenticate, validate and hand off; Paystack retries anything but 2xx
+@csrf_exempt
+@require_POST
+def paystack_webhook(request):
+    if not signature_is_valid(settings.PAYSTACK_SECRET_KEY, request.body, request.headers.get('x-paystack-signature')):
+        logger.warning("Rejected Paystack webhook with a bad signature")
+        return JsonResponse({'error': 'Invalid signature'}, status=401)
+
+    try:
+        event = PaymentCallbackSchema.model_validate_json(request.body)
+    except ValidationError as e:
+        logger.warning(f"Malformed Paystack webhook: {e}")
+        return JsonResponse({'error': 'Malformed event'}, status=400)
+
+    if event.event != 'charge.success':
+        return JsonResponse({'status': 'ignored'})
+
+    reference = event.data.get('reference')
+    metadata = charge_metadata(event.data)
+    if not reference or not metadata.get('user_id') or not metadata.get('profile_id'):
+        # Not one of ours (e.g. a charge started outside the portal); nothing to grant
+        logger.warning(f"Paystack charge {reference} has no portal metadata")
+        return JsonResponse({'status': 'ignored'})
+
+    # The task flags charges that do not match the quoted price
+    fulfil_paystack_payment.delay(reference, metadata['user_id'], metadata['profile_id'], event.data.get('amount', 0))
+    return JsonResponse({'status': 'queued'})
+
+
 # Payment success view
 def payment_success(request):
     return render(request, 'usermanager/payment_success.html')